@@ -0,0 +1,313 @@
+"""Offline benchmark for image and audio conversions.
+
+Erzeugt synthetische Testdateien, schickt jedes Quell→Ziel-Paar über den
+Flask-Test-Client durch /api/convert und gibt Latenz (p50/p95), Durchsatz
+und die Speicherspitze des gesamten Laufs als JSON aus. Kein laufender
+Server nötig.
+
+    python backend/benchmark.py --output bench.json
+    python backend/benchmark.py --compare bench.json --threshold 0.2
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Der Cache würde ab der zweiten Wiederholung nur noch Treffer messen
+os.environ.setdefault('CACHE_MAX_BYTES', '0')
+# Alle Anfragen kommen vom selben Client und würden sonst vom Rate-Limit gebremst
+os.environ.setdefault('ADMISSION_RATE_PER_MINUTE', '0')
+
+import PIL
+from PIL import Image
+
+import app as app_module
+from shiftfile.audio import FFMPEG_FORMATS, find_ffmpeg
+from shiftfile.images import DEFAULT_PROFILE, ENCODER_PROFILES
+
+IMAGE_MODES = ('RGB', 'RGBA', 'LA', 'P')
+IMAGE_SOURCES = sorted(app_module.ALLOWED_IMAGE_EXTENSIONS - {'jpeg'})
+IMAGE_TARGETS = sorted(set(app_module.FORMAT_MAPPING) - {'jpeg'})
+AUDIO_FORMATS = sorted(app_module.ALLOWED_AUDIO_EXTENSIONS & set(FFMPEG_FORMATS))
+
+# Modi, die ein Quellformat nicht speichern kann, werden vorher umgewandelt
+SOURCE_MODE_FALLBACK = {
+    'jpg': {'RGBA': 'RGB', 'LA': 'L', 'P': 'RGB'},
+    'bmp': {'RGBA': 'RGB', 'LA': 'L'},
+    'gif': {'RGB': 'P', 'RGBA': 'P', 'LA': 'L'},
+}
+PILLOW_SOURCE_FORMATS = {'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP', 'gif': 'GIF',
+                         'tiff': 'TIFF', 'bmp': 'BMP', 'ico': 'ICO'}
+
+
+def synthetic_image(mode, size):
+    """Return a deterministic test image with gradients and noise"""
+    width = height = size
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 48)
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.ROTATE_90)))
+    if mode == 'RGBA':
+        image.putalpha(gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))
+    elif mode == 'LA':
+        image = image.convert('L')
+        image.putalpha(gradient)
+    elif mode == 'P':
+        image = image.quantize(colors=256)
+    return image
+
+
+def encode_image(image, source_format):
+    """Encode ``image`` as ``source_format``; returns (bytes, stored mode)"""
+    mode = SOURCE_MODE_FALLBACK.get(source_format, {}).get(image.mode)
+    if mode == 'P':
+        image = image.convert('RGB').quantize(colors=256)
+    elif mode:
+        image = image.convert(mode)
+    if source_format == 'ico':
+        # ICO speichert höchstens 256x256
+        image = image.copy()
+        image.thumbnail((256, 256))
+    buffer = io.BytesIO()
+    image.save(buffer, format=PILLOW_SOURCE_FORMATS[source_format])
+    return buffer.getvalue(), image.mode
+
+
+def synthetic_audio(ffmpeg, source_format, seconds, directory):
+    """Render a stereo test tone with ``ffmpeg -f lavfi``; returns the file bytes"""
+    muxer, codec, _ = FFMPEG_FORMATS[source_format]
+    path = os.path.join(directory, f'bench.{source_format}')
+    subprocess.run([
+        ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={seconds}',
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:sample_rate=44100:amplitude=0.1:duration={seconds}',
+        '-filter_complex', '[0:a][1:a]join=inputs=2:channel_layout=stereo',
+        '-c:a', codec, '-f', muxer, path
+    ], check=True, capture_output=True)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_kb(who=resource.RUSAGE_SELF):
+    """Peak resident set size of the process (or its children) so far"""
+    usage = resource.getrusage(who).ru_maxrss
+    # macOS meldet Bytes, Linux Kilobytes
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def run_case(client, case, data, iterations, warmup):
+    """Convert ``data`` ``warmup + iterations`` times and summarise the timings"""
+    timings = []
+    output_bytes = 0
+    errors = []
+    for i in range(warmup + iterations):
+        start = time.perf_counter()
+        form = {'file': (io.BytesIO(data), f"bench.{case['source']}"), 'format': case['target']}
+        if case.get('profile'):
+            form['profile'] = case['profile']
+        response = client.post('/api/convert', data=form, content_type='multipart/form-data')
+        body = response.get_data()
+        elapsed = time.perf_counter() - start
+        response.close()
+        if response.status_code != 200:
+            errors.append(response.get_json(silent=True) or response.status)
+            continue
+        if i >= warmup:
+            timings.append(elapsed)
+            output_bytes = len(body)
+
+    result = dict(case, input_bytes=len(data), output_bytes=output_bytes,
+                  iterations=len(timings), errors=len(errors))
+    if errors:
+        result['error'] = str(errors[0])
+    if timings:
+        total = sum(timings)
+        result.update(
+            p50_ms=round(percentile(timings, 0.50) * 1000, 3),
+            p95_ms=round(percentile(timings, 0.95) * 1000, 3),
+            mean_ms=round(total / len(timings) * 1000, 3),
+            files_per_second=round(len(timings) / total, 2),
+            input_mb_per_second=round(len(data) * len(timings) / total / (1024 * 1024), 2),
+        )
+    return result
+
+
+def image_cases(sizes, modes, sources, targets, profiles):
+    for size in sizes:
+        for mode in modes:
+            image = synthetic_image(mode, size)
+            for source in sources:
+                data, stored_mode = encode_image(image, source)
+                for target in targets:
+                    for profile in profiles:
+                        yield {'kind': 'image', 'source': source, 'target': target,
+                               'mode': stored_mode, 'size': size, 'profile': profile}, data
+
+
+def audio_cases(ffmpeg, seconds, sources, targets, directory):
+    for source in sources:
+        data = synthetic_audio(ffmpeg, source, seconds, directory)
+        for target in targets:
+            yield {'kind': 'audio', 'source': source, 'target': target, 'seconds': seconds}, data
+
+
+def run_benchmark(sizes=(256, 1024), modes=IMAGE_MODES, image_sources=IMAGE_SOURCES,
+                  image_targets=IMAGE_TARGETS, audio_formats=AUDIO_FORMATS, audio_seconds=10,
+                  profiles=(DEFAULT_PROFILE,), iterations=5, warmup=1, audio=True, progress=None):
+    """Run every configured conversion pair and return the report as a dict"""
+    app_module.app.config['TESTING'] = True
+    client = app_module.app.test_client()
+    ffmpeg = find_ffmpeg() if audio else None
+    results = []
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix='shiftfile-bench-') as directory:
+        cases = image_cases(sizes, modes, image_sources, image_targets, profiles)
+        if ffmpeg:
+            cases = _chain(cases, audio_cases(ffmpeg, audio_seconds, audio_formats, audio_formats, directory))
+        for case, data in cases:
+            result = run_case(client, case, data, iterations, warmup)
+            results.append(result)
+            if progress:
+                progress(result)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pillow': PIL.__version__,
+            'ffmpeg': ffmpeg,
+            'audio_engine': app_module.services.audio_engine.name,
+            'cache_enabled': app_module.conversion_cache.enabled,
+            'iterations': iterations,
+            'warmup': warmup,
+        },
+        'summary': {
+            'cases': len(results),
+            'failed_cases': sum(1 for r in results if r['errors']),
+            'wall_seconds': round(time.perf_counter() - started, 3),
+            # ru_maxrss ist das Maximum über die ganze Prozesslaufzeit, pro Fall
+            # gemessen würde es nur den bisherigen Höchststand wiederholen
+            'peak_rss_kb': peak_rss_kb(),
+            'peak_rss_children_kb': peak_rss_kb(resource.RUSAGE_CHILDREN),
+        },
+        'results': results,
+    }
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+CASE_FIELDS = ('kind', 'source', 'target', 'mode', 'size', 'profile', 'seconds')
+
+
+def case_key(result):
+    return tuple(str(result.get(k)) for k in CASE_FIELDS)
+
+
+def compare(baseline, current, threshold):
+    """Return cases whose p50 grew by more than ``threshold`` (0.2 = 20%)"""
+    previous = {case_key(r): r for r in baseline['results'] if 'p50_ms' in r}
+    regressions = []
+    for result in current['results']:
+        before = previous.get(case_key(result))
+        if not before or 'p50_ms' not in result:
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0
+        if change > threshold:
+            regressions.append({
+                'case': dict(zip(CASE_FIELDS, case_key(result))),
+                'before_p50_ms': before['p50_ms'],
+                'after_p50_ms': result['p50_ms'],
+                'change': round(change, 3),
+            })
+    return regressions
+
+
+def _csv(value):
+    return [item.strip().lower() for item in value.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline-Benchmark für ShiftFile-Konvertierungen')
+    parser.add_argument('--sizes', default='256,1024', help='Bildkanten in Pixeln, kommagetrennt')
+    parser.add_argument('--modes', default=','.join(IMAGE_MODES), help='Bildmodi (RGB,RGBA,LA,P)')
+    parser.add_argument('--image-sources', default=','.join(IMAGE_SOURCES))
+    parser.add_argument('--image-targets', default=','.join(IMAGE_TARGETS))
+    parser.add_argument('--profiles', default=DEFAULT_PROFILE,
+                        help=f"Encoder-Profile für Bilder ({','.join(ENCODER_PROFILES)})")
+    parser.add_argument('--audio-formats', default=','.join(AUDIO_FORMATS))
+    parser.add_argument('--audio-seconds', type=float, default=10)
+    parser.add_argument('--no-audio', action='store_true', help='Audio-Fälle überspringen')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--output', help='JSON-Bericht in diese Datei schreiben (Standard: stdout)')
+    parser.add_argument('--compare', help='Vorherigen Bericht als Vergleichsbasis verwenden')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Erlaubter p50-Anstieg beim Vergleich (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    # Request-Logs der App würden die JSON-Ausgabe überdecken
+    logging.getLogger().setLevel(logging.WARNING)
+
+    def progress(result):
+        status = f"{result['p50_ms']:.1f}ms" if 'p50_ms' in result else f"FEHLER {result.get('error')}"
+        if result['kind'] == 'image':
+            label = f"{result['mode']} {result['size']}px {result['profile']}"
+        else:
+            label = f"{result['seconds']}s"
+        print(f"{result['source']:>5} -> {result['target']:<5} {label:<20} {status}", file=sys.stderr)
+
+    report = run_benchmark(
+        sizes=[int(size) for size in _csv(args.sizes)],
+        modes=[mode.upper() for mode in _csv(args.modes)],
+        image_sources=_csv(args.image_sources),
+        image_targets=_csv(args.image_targets),
+        profiles=_csv(args.profiles),
+        audio_formats=_csv(args.audio_formats),
+        audio_seconds=args.audio_seconds,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        audio=not args.no_audio,
+        progress=progress,
+    )
+    if report['meta']['ffmpeg'] is None and not args.no_audio:
+        print('FFmpeg nicht gefunden, Audio-Fälle übersprungen', file=sys.stderr)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = compare(json.load(f), report, args.threshold)
+        for regression in report['regressions']:
+            print(f"Regression: {regression['case']} {regression['before_p50_ms']}ms -> "
+                  f"{regression['after_p50_ms']}ms", file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
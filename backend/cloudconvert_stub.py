@@ -0,0 +1,195 @@
+"""Lokaler Stub der CloudConvert-API v2 für Tests und Entwicklung.
+
+Bildet nur ab, was shiftfile.cloudconvert_client benutzt: Jobs anlegen und
+abfragen, Upload-Formulare, Export-URLs. Die "Konvertierung" stellt dem
+Inhalt das Zielformat voran; Dateien mit dem Inhalt ``FAIL`` lassen ihren
+convert-Task fehlschlagen, der Upload von ``REJECT`` wird abgelehnt. Der Server spricht HTTP/1.1 mit Keep-Alive und
+zählt die angenommenen Verbindungen (der Werkzeug-Dev-Server schließt jede
+Verbindung, daher ein eigener Handler vor dem Flask-Testclient).
+
+    python backend/cloudconvert_stub.py --port 8765
+    CLOUDCONVERT_API_KEY=test CLOUDCONVERT_API_URL=http://127.0.0.1:8765/v2 AUDIO_ENGINE=cloudconvert ...
+"""
+import argparse
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import Flask, jsonify, request
+
+
+class StubCloudConvert:
+    """In-memory CloudConvert API; ``delay`` seconds of processing after the last upload"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.jobs = {}
+        self.deleted = []
+        self.requests = 0
+        self.connections = 0
+        self.base_url = ''
+        self._files = {}
+        self._lock = threading.Lock()
+        self.app = self._build_app()
+
+    def _build_app(self):
+        app = Flask(__name__)
+
+        @app.before_request
+        def count():
+            with self._lock:
+                self.requests += 1
+
+        @app.route('/v2/jobs', methods=['POST'])
+        def create_job():
+            if not request.headers.get('Authorization', '').startswith('Bearer '):
+                return jsonify({'message': 'Unauthenticated.'}), 401
+            job_id = uuid.uuid4().hex
+            tasks = []
+            for name, spec in request.get_json()['tasks'].items():
+                task = {'id': uuid.uuid4().hex, 'name': name, 'job_id': job_id, 'operation': spec['operation'],
+                        'status': 'waiting', 'message': None, 'result': None, 'spec': spec}
+                if spec['operation'] == 'import/upload':
+                    task['result'] = {'form': {'url': f'{self.base_url}/upload/{job_id}/{name}',
+                                               'parameters': {'key': task['id']}}}
+                tasks.append(task)
+            job = {'id': job_id, 'tag': request.get_json().get('tag'), 'status': 'waiting', 'tasks': tasks,
+                   'uploaded_at': None}
+            with self._lock:
+                self.jobs[job_id] = job
+            return jsonify({'data': self._public(job)}), 201
+
+        @app.route('/v2/jobs/<job_id>', methods=['DELETE'])
+        def delete_job(job_id):
+            with self._lock:
+                if self.jobs.pop(job_id, None) is None:
+                    return jsonify({'message': 'Job not found'}), 404
+                self.deleted.append(job_id)
+            return '', 204
+
+        @app.route('/v2/jobs/<job_id>')
+        def get_job(job_id):
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    return jsonify({'message': 'Job not found'}), 404
+                self._process(job)
+                return jsonify({'data': self._public(job)})
+
+        @app.route('/upload/<job_id>/<name>', methods=['POST'])
+        def upload(job_id, name):
+            data = request.files['file'].read()
+            if data == b'REJECT':
+                return 'rejected', 422
+            with self._lock:
+                job = self.jobs[job_id]
+                task = next(t for t in job['tasks'] if t['name'] == name)
+                if request.form.get('key') != task['id']:
+                    return 'invalid key', 403
+                task['status'] = 'finished'
+                task['data'] = data
+                if all(t['status'] == 'finished' for t in job['tasks'] if t['operation'] == 'import/upload'):
+                    job['status'] = 'processing'
+                    job['uploaded_at'] = time.monotonic()
+            return '', 201
+
+        @app.route('/files/<file_id>')
+        def download(file_id):
+            with self._lock:
+                data = self._files.get(file_id)
+            if data is None:
+                return 'not found', 404
+            return data, 200, {'Content-Type': 'application/octet-stream'}
+
+        return app
+
+    def _process(self, job):
+        if job['status'] != 'processing' or time.monotonic() - job['uploaded_at'] < self.delay:
+            return
+        tasks = {task['name']: task for task in job['tasks']}
+        for task in job['tasks']:
+            if task['operation'] != 'convert':
+                continue
+            data = tasks[task['spec']['input'][0]]['data']
+            if data == b'FAIL':
+                task.update(status='error', message='Conversion failed')
+                continue
+            task['status'] = 'finished'
+            task['data'] = task['spec']['output_format'].encode() + b':' + data
+        for task in job['tasks']:
+            if task['operation'] != 'export/url':
+                continue
+            source = tasks[task['spec']['input'][0]]
+            if source['status'] != 'finished':
+                task.update(status='error', message='Input task failed')
+                continue
+            file_id = uuid.uuid4().hex
+            self._files[file_id] = source['data']
+            task['status'] = 'finished'
+            task['result'] = {'files': [{'filename': f'{file_id}.out', 'url': f'{self.base_url}/files/{file_id}'}]}
+        failed = any(task['status'] == 'error' for task in job['tasks'])
+        job['status'] = 'error' if failed else 'finished'
+
+    @staticmethod
+    def _public(job):
+        return {
+            'id': job['id'], 'tag': job['tag'], 'status': job['status'],
+            'tasks': [{key: value for key, value in task.items() if key not in ('spec', 'data')}
+                      for task in job['tasks']]
+        }
+
+    def serve(self, host='127.0.0.1', port=0):
+        """Start the server in a daemon thread; returns the API URL (``.../v2``)"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def handle_request(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                response = stub.app.test_client().open(self.path, method=self.command, data=body,
+                                                       headers=list(self.headers.items()))
+                data = response.get_data()
+                self.send_response(response.status_code)
+                for key, value in response.headers.items():
+                    if key.lower() not in ('content-length', 'connection'):
+                        self.send_header(key, value)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_DELETE = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f'http://{host}:{self._server.server_port}'
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f'{self.base_url}/v2'
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lokaler Stub der CloudConvert-API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.5, help='Verarbeitungszeit pro Job in Sekunden')
+    args = parser.parse_args(argv)
+
+    stub = StubCloudConvert(delay=args.delay)
+    print(f"CloudConvert-Stub unter {stub.serve(port=args.port)}")
+    threading.Event().wait()
+
+
+if __name__ == '__main__':
+    main()
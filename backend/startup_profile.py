@@ -0,0 +1,81 @@
+"""Import-time breakdown for the entry points.
+
+Startet den Einstiegspunkt in einem frischen Interpreter mit
+``python -X importtime``, summiert die Importzeiten je Top-Level-Paket und
+gibt die teuersten als JSON aus. Optional wird danach /api/warmup
+aufgerufen, um die Kosten der ersten Konvertierung sichtbar zu machen.
+
+    python backend/startup_profile.py
+    python backend/startup_profile.py --entry backend/app.py --top 15 --warmup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ENTRY = os.path.join(BASE_DIR, 'api', 'index.py')
+
+WARMUP_SNIPPET = (
+    "import json; print('STARTUP ' + json.dumps(app.test_client().get('/api/warmup').get_json()))"
+)
+
+
+def parse_importtime(stderr):
+    """Return ``[(module, self_us, cumulative_us, depth)]`` from ``-X importtime`` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def breakdown(rows, top=10):
+    """Sum the self time per top-level package, most expensive first"""
+    packages = defaultdict(int)
+    for module, self_us, _, _ in rows:
+        packages[module.split('.', 1)[0]] += self_us
+    total = sum(packages.values())
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        'total_ms': round(total / 1000, 2),
+        'packages': [
+            {'package': name, 'ms': round(us / 1000, 2), 'share': round(us / total, 3) if total else 0}
+            for name, us in ranked
+        ]
+    }
+
+
+def profile_entry(entry, top=10, warmup=False):
+    entry = os.path.abspath(entry)
+    module = os.path.splitext(os.path.basename(entry))[0]
+    code = f"import sys; sys.path.insert(0, {os.path.dirname(entry)!r}); from {module} import app"
+    if warmup:
+        code += '; ' + WARMUP_SNIPPET
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=BASE_DIR, capture_output=True, text=True, check=True)
+
+    report = {'entry': os.path.relpath(entry, BASE_DIR), **breakdown(parse_importtime(result.stderr), top)}
+    for line in result.stdout.splitlines():
+        if line.startswith('STARTUP '):
+            report['runtime'] = json.loads(line[len('STARTUP '):])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importzeiten eines ShiftFile-Einstiegspunkts')
+    parser.add_argument('--entry', default=DEFAULT_ENTRY, help='Einstiegspunkt (Standard: api/index.py)')
+    parser.add_argument('--top', type=int, default=10, help='Anzahl der aufgeführten Pakete')
+    parser.add_argument('--warmup', action='store_true', help='Danach /api/warmup aufrufen und mit ausgeben')
+    args = parser.parse_args(argv)
+
+    print(json.dumps(profile_entry(args.entry, args.top, args.warmup), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,51 @@
 import os
 import requests
-from PIL import Image
+from PIL import Image, ImageChops
 import io
+import json
 import logging
 import unittest
-from app import app, TEMP_DIR
-from werkzeug.datastructures import FileStorage
+import hashlib
+import hmac
+import signal
+import asyncio
+import subprocess
+import sys
+import struct
+import tempfile
+import time
+import uuid
+import wave
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+# Die Tests feuern viele Anfragen von derselben Adresse; das Rate-Limit wird einzeln getestet
+os.environ.setdefault('ADMISSION_RATE_PER_MINUTE', '0')
+# Eigenes Temp-Verzeichnis samt Cache je Lauf, damit kein Ergebnis eines früheren Laufs antwortet
+TEST_TEMP = tempfile.TemporaryDirectory(prefix='shiftfile-test-', ignore_cleanup_errors=True)
+os.environ.setdefault('TEMP_DIR', TEST_TEMP.name)
+import app as app_module
+from app import app, TEMP_DIR, conversion_cache
+from shiftfile.admission import AdmissionController
+from shiftfile.asgi import AsgiBridge
+from shiftfile.audio import (
+    AudioEngineError, CloudConvertEngine, FallbackEngine, FFmpegEngine, find_ffmpeg, parse_audio_settings,
+    passthrough_mode
+)
+from shiftfile.cache import ConversionCache
+from shiftfile.effects import ArrayReader, PCMBuffer, apply_effects, numpy_available, peak_bytes, use_numpy
+from shiftfile.janitor import TempJanitor
+from shiftfile.jobs import JobManager
+from shiftfile.logs import configure_logging, request_id, stop_logging
+from shiftfile.streams import spooled_buffer
+from shiftfile import batch
+from shiftfile import progress
+from shiftfile import tiles
+from shiftfile.convert import convert_image
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.test import encode_multipart
+from cloudconvert_stub import StubCloudConvert
 
 SERVER_URL = "http://127.0.0.1:5000"
 TEST_DIR = "test_files"
@@ -139,6 +179,22 @@ class TestImageConverter(unittest.TestCase):
         self.assertEqual(optimized_img.format, "PNG")
         self.assertEqual(optimized_img.mode, "RGBA")
 
+    def test_image_conversion_stays_in_memory(self):
+        """Test, dass Bildkonvertierungen keine Temp-Dateien anlegen"""
+        before = set(os.listdir(TEMP_DIR))
+        buffer = io.BytesIO()
+        Image.new('RGB', (80, 60), (7, 99, 201)).save(buffer, format='PNG')
+        buffer.seek(0)
+
+        response = self.client.post('/api/convert',
+                                  data={'format': 'gif', 'file': (buffer, 'memory.png')},
+                                  content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        new_files = set(os.listdir(TEMP_DIR)) - before
+        self.assertFalse([f for f in new_files if f.startswith(('input_', 'output_'))])
+
     def test_invalid_format(self):
         """Test mit ungültigem Zielformat"""
         data = {}
@@ -180,6 +236,1383 @@ class TestImageConverter(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn('Nicht unterstütztes Dateiformat', response.json['error'])
 
+class TestConversionCache(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def _post_image(self, color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), color).save(buffer, format='PNG')
+        buffer.seek(0)
+        return self.client.post('/api/convert',
+                                data={'format': 'webp', 'file': (buffer, 'cache.png')},
+                                content_type='multipart/form-data')
+
+    def test_repeated_conversion_is_served_from_cache(self):
+        """Test, dass identische Uploads aus dem Cache bedient werden"""
+        first = self._post_image((12, 34, 56))
+        hits_before = conversion_cache.stats()['hits']
+        second = self._post_image((12, 34, 56))
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(conversion_cache.stats()['hits'], hits_before + 1)
+
+    def test_lru_eviction(self):
+        """Test der größenbegrenzten LRU-Verdrängung"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ConversionCache(os.path.join(tmp, 'cache'), max_bytes=250)
+            source = os.path.join(tmp, 'source')
+            with open(source, 'wb') as f:
+                f.write(b'x' * 100)
+
+            keys = [cache.make_key(str(i), 'png') for i in range(3)]
+            cache.put(keys[0], 'png', source)
+            cache.put(keys[1], 'png', source)
+            self.assertIsNotNone(cache.get(keys[0], 'png'))
+            cache.put(keys[2], 'png', source)
+
+            self.assertIsNotNone(cache.get(keys[0], 'png'))
+            self.assertIsNone(cache.get(keys[1], 'png'))
+            self.assertLessEqual(cache.stats()['bytes'], 250)
+
+class TestReducedDecoding(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        buffer = io.BytesIO()
+        Image.linear_gradient('L').resize((2048, 1536)).convert('RGB').save(buffer, format='JPEG')
+        self.jpeg_bytes = buffer.getvalue()
+        self.jpeg = io.BytesIO(self.jpeg_bytes)
+
+    def test_max_width_keeps_aspect_ratio(self):
+        """Test der Verkleinerung über max_width"""
+        response = self.client.post('/api/convert',
+                                    data={'format': 'png', 'max_width': '200', 'file': (self.jpeg, 'big.jpg')},
+                                    content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(response.data)).size, (200, 150))
+
+    def test_ico_from_large_jpeg_keeps_all_sizes(self):
+        """Test, dass ICO aus großen JPEGs weiterhin alle Icon-Größen enthält"""
+        response = self.client.post('/api/convert',
+                                    data={'format': 'ico', 'file': (self.jpeg, 'big.jpg')},
+                                    content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        reference = io.BytesIO()
+        Image.open(io.BytesIO(self.jpeg_bytes)).save(reference, format='ICO', sizes=[(16, 16), (32, 32), (48, 48), (64, 64)])
+        icon = Image.open(io.BytesIO(response.data))
+        self.assertEqual(icon.info['sizes'], Image.open(reference).info['sizes'])
+
+    def test_invalid_max_width(self):
+        """Test mit ungültiger Zielgröße"""
+        response = self.client.post('/api/convert',
+                                    data={'format': 'png', 'max_width': '-5', 'file': (self.jpeg, 'big.jpg')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+
+class StubAudioEngine:
+    """Audio-Engine für Offline-Tests, kopiert die Eingabe unverändert"""
+    name = 'stub'
+
+    def __init__(self):
+        self.calls = []
+
+    def available(self):
+        return True
+
+    def unavailable_reason(self):
+        return ''
+
+    def convert(self, input_path, output_path, target_format, settings):
+        self.calls.append((target_format, settings))
+        with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+            dst.write(src.read())
+
+class TestAudioEngine(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_audio_conversion_uses_configured_engine(self):
+        """Test der Audiokonvertierung über eine austauschbare Engine"""
+        engine = StubAudioEngine()
+        with mock.patch.object(app_module.services, 'audio_engine', engine):
+            response = self.client.post('/api/convert',
+                                        data={'format': 'mp3', 'mono': 'true', 'bitrate': '128',
+                                              'file': (io.BytesIO(os.urandom(64)), 'clip.wav')},
+                                        content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(engine.calls), 1)
+        target_format, settings = engine.calls[0]
+        self.assertEqual(target_format, 'mp3')
+        self.assertEqual(settings['channels'], 1)
+        self.assertEqual(settings['bitrate'], '128')
+
+    def test_ffmpeg_command(self):
+        """Test der FFmpeg-Kommandozeile für Effekte und Bitrate"""
+        engine = FFmpegEngine(binary='ffmpeg')
+        settings = parse_audio_settings({'volume': '3', 'fadeIn': '2', 'fadeOut': '1',
+                                         'mono': 'true', 'bitrate': '256'})
+        command = engine.build_command('in.wav', 'out.mp3', 'mp3', settings, duration=10.0)
+
+        self.assertEqual(command[command.index('-af') + 1],
+                         'volume=3.0dB,afade=t=in:st=0:d=2.0,afade=t=out:st=9.0:d=1.0')
+        self.assertEqual(command[command.index('-ac') + 1], '1')
+        self.assertEqual(command[command.index('-b:a') + 1], '256k')
+        self.assertEqual(command[-3:], ['-f', 'mp3', 'out.mp3'])
+
+    def test_ffmpeg_filter_graph_for_effects(self):
+        """Test des Filtergraphen für Geschwindigkeit, Fades und Normalisierung"""
+        engine = FFmpegEngine(binary='ffmpeg')
+        settings = parse_audio_settings({'speed': '2.0', 'fadeOut': '1', 'normalize': 'true'})
+        filters = engine.build_filters(settings, duration=10.0, sample_rate=48000)
+
+        self.assertEqual(filters, ['asetrate=96000', 'aresample=48000',
+                                   'afade=t=out:st=4.0:d=1.0', 'loudnorm', 'aresample=48000'])
+
+        command = engine.build_command('pipe:0', 'pipe:1', 'm4a', settings)
+        self.assertIn('frag_keyframe+empty_moov', command)
+
+    def test_fallback_engine_streams_and_probes_with_ffmpeg(self):
+        """Test, dass /api/process-audio und /api/probe mit AUDIO_FALLBACK_ENGINE die FFmpeg-Engine nutzen"""
+        engine = FallbackEngine(FFmpegEngine(binary='ffmpeg'), CloudConvertEngine(api_key='test'))
+
+        def convert_stream(source, destination, target_format, settings, input_format=None):
+            destination.write(b'processed:' + source.read())
+
+        with mock.patch.object(app_module.services, 'audio_engine', engine), \
+                mock.patch.object(FFmpegEngine, 'available', return_value=True), \
+                mock.patch.object(FFmpegEngine, 'convert_stream', side_effect=convert_stream), \
+                mock.patch.object(FFmpegEngine, 'describe_stream',
+                                  return_value={'codec': 'opus', 'duration': 1.5}) as describe:
+            processed = self.client.post('/api/process-audio',
+                                         data={'format': 'ogg', 'file': (io.BytesIO(b'audio'), 'clip.ogg')},
+                                         content_type='multipart/form-data')
+            probed = self.client.post('/api/probe', data={'file': (io.BytesIO(b'kein Header'), 'clip.ogg')},
+                                      content_type='multipart/form-data')
+
+        self.assertEqual(processed.status_code, 200)
+        self.assertEqual(processed.data, b'processed:audio')
+        self.assertEqual(probed.status_code, 200)
+        self.assertEqual((probed.json['codec'], probed.json['source']), ('opus', 'ffmpeg'))
+        describe.assert_called_once()
+
+class TestBatchConversion(unittest.TestCase):
+    # Anfragen mit buffered=True: erst das Schließen der Antwort gibt die Plätze in der Zulassung frei
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_batch_returns_zip(self):
+        """Test der Batch-Konvertierung mehrerer Bilder als ZIP"""
+        files = []
+        for i in range(4):
+            buffer = io.BytesIO()
+            Image.new('RGB', (50, 50), (i * 60, 0, 0)).save(buffer, format='PNG')
+            buffer.seek(0)
+            files.append((buffer, 'batch.png'))
+
+        response = self.client.post('/api/convert/batch',
+                                    data={'format': 'jpg', 'files': files},
+                                    content_type='multipart/form-data', buffered=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(response.data))
+        self.assertEqual(sorted(archive.namelist()),
+                         ['batch.jpg', 'batch_1.jpg', 'batch_2.jpg', 'batch_3.jpg'])
+        self.assertEqual(Image.open(io.BytesIO(archive.read('batch.jpg'))).format, 'JPEG')
+
+    def _metric(self, line):
+        for sample in self.client.get('/api/metrics').get_data(as_text=True).splitlines():
+            if sample.startswith(line + ' '):
+                return float(sample.split(' ')[-1])
+        return 0.0
+
+    def test_batch_metrics_recorded_in_parent(self):
+        """Test, dass Zähler und Stufenzeiten der Pool-Worker im App-Prozess ankommen"""
+        success = 'shiftfile_conversions_total{source="bmp",target="gif",status="success"}'
+        error = 'shiftfile_conversions_total{source="bmp",target="gif",status="error"}'
+        encode = 'shiftfile_stage_seconds_count{stage="encode",source="bmp",target="gif"}'
+        before = [self._metric(line) for line in (success, error, encode)]
+
+        files = []
+        for i in range(2):
+            buffer = io.BytesIO()
+            Image.new('RGB', (30, 20), (0, i * 90, 0)).save(buffer, format='BMP')
+            files.append((io.BytesIO(buffer.getvalue()), f'metrics{i}.bmp'))
+        files.append((io.BytesIO(b'kein Bild'), 'broken.bmp'))
+        response = self.client.post('/api/convert/batch', data={'format': 'gif', 'files': files},
+                                    content_type='multipart/form-data', buffered=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('errors.json', zipfile.ZipFile(io.BytesIO(response.data)).namelist())
+
+        after = [self._metric(line) for line in (success, error, encode)]
+        self.assertEqual([b - a for a, b in zip(before, after)], [2, 1, 2])
+
+    def test_batch_recovers_from_killed_worker(self):
+        """Test, dass nach einem abgestürzten Worker ein neuer Pool die Batches übernimmt"""
+        pool = batch.get_pool()
+        if not isinstance(pool, ProcessPoolExecutor):
+            self.skipTest('Kein Prozess-Pool verfügbar')
+        pool.submit(int).result()
+        os.kill(next(iter(pool._processes)), signal.SIGKILL)
+        with self.assertRaises(BrokenProcessPool):
+            pool.submit(int).result(timeout=10)
+
+        for attempt in range(2):
+            buffer = io.BytesIO()
+            Image.new('RGB', (20, 20), (attempt * 90, 0, 0)).save(buffer, format='PNG')
+            response = self.client.post('/api/convert/batch',
+                                        data={'format': 'bmp', 'files': [(io.BytesIO(buffer.getvalue()), 'a.png')]},
+                                        content_type='multipart/form-data', buffered=True)
+            self.assertEqual(zipfile.ZipFile(io.BytesIO(response.data)).namelist(), ['a.bmp'])
+        self.assertIsNot(batch.get_pool(), pool)
+
+    def test_batch_rejects_audio_target(self):
+        """Test der Batch-Konvertierung mit Audio-Zielformat"""
+        response = self.client.post('/api/convert/batch',
+                                    data={'format': 'mp3', 'files': [(io.BytesIO(b'x'), 'a.png')]},
+                                    content_type='multipart/form-data', buffered=True)
+        self.assertEqual(response.status_code, 400)
+
+class TestChunkedUpload(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        buffer = io.BytesIO()
+        Image.effect_noise((200, 200), 64).convert('RGB').save(buffer, format='PNG')
+        self.data = buffer.getvalue()
+
+    def _start(self):
+        response = self.client.post('/api/uploads', json={
+            'filename': 'chunked.png',
+            'size': len(self.data),
+            'sha256': hashlib.sha256(self.data).hexdigest()
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json['id']
+
+    def test_chunks_out_of_order(self):
+        """Test eines Chunk-Uploads in beliebiger Reihenfolge mit Konvertierung"""
+        upload_id = self._start()
+        chunk_size = len(self.data) // 3 + 1
+        offsets = list(range(0, len(self.data), chunk_size))
+        for offset in reversed(offsets):
+            chunk = self.data[offset:offset + chunk_size]
+            response = self.client.put(f'/api/uploads/{upload_id}?offset={offset}', data=chunk,
+                                       headers={'X-Chunk-Sha256': hashlib.sha256(chunk).hexdigest()})
+            self.assertEqual(response.status_code, 200)
+
+        status = self.client.get(f'/api/uploads/{upload_id}').json
+        self.assertTrue(status['complete'])
+
+        response = self.client.post(f'/api/uploads/{upload_id}/complete', data={'format': 'jpg'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(response.data)).format, 'JPEG')
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}').status_code, 404)
+
+    def test_incomplete_and_corrupt_chunks(self):
+        """Test unvollständiger Uploads und falscher Chunk-Prüfsummen"""
+        upload_id = self._start()
+        response = self.client.put(f'/api/uploads/{upload_id}?offset=0', data=self.data[:100],
+                                   headers={'X-Chunk-Sha256': '0' * 64})
+        self.assertEqual(response.status_code, 422)
+
+        response = self.client.post(f'/api/uploads/{upload_id}/complete', data={'format': 'jpg'})
+        self.assertEqual(response.status_code, 409)
+
+class TestConversionJobs(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def _wait_for(self, job_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.client.get(f'/api/jobs/{job_id}').json
+            if job['status'] in ('done', 'error'):
+                return job
+            time.sleep(0.05)
+        self.fail(f'Job {job_id} wurde nicht rechtzeitig fertig')
+
+    def test_image_job_roundtrip(self):
+        """Test eines asynchronen Bild-Jobs mit Abholung des Ergebnisses"""
+        buffer = io.BytesIO()
+        Image.new('RGBA', (40, 40), (0, 128, 255, 200)).save(buffer, format='PNG')
+        buffer.seek(0)
+
+        response = self.client.post('/api/jobs',
+                                    data={'format': 'jpg', 'file': (buffer, 'job.png')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json['status'], 'queued')
+
+        job = self._wait_for(response.json['id'])
+        self.assertEqual(job['status'], 'done')
+
+        result = self.client.get(f"/api/jobs/{job['id']}/result")
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(result.data)).format, 'JPEG')
+
+    def test_status_poll_does_not_sweep(self):
+        """Test, dass Abfragen und neue Jobs nicht alle Jobs durchgehen und Abgelaufenes trotzdem verschwindet"""
+        def convert(input_path, output_path):
+            with open(output_path, 'wb') as f:
+                f.write(b'fertig')
+
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = JobManager(directory, ttl=60)
+            with mock.patch.object(jobs, 'cleanup') as cleanup:
+                job = jobs.submit(FileStorage(io.BytesIO(b'x'), 'a.png'), '.png', 'jpg', 'converted_a.png', convert)
+                deadline = time.time() + 10
+                while jobs.get(job['id'])['status'] != 'done':
+                    self.assertLess(time.time(), deadline)
+                    time.sleep(0.02)
+            cleanup.assert_not_called()
+
+            with mock.patch('shiftfile.jobs.time.time', return_value=time.time() + 120):
+                self.assertIsNone(jobs.get(job['id']))
+                jobs.cleanup()
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_unknown_job(self):
+        """Test mit unbekannter Job-ID"""
+        self.assertEqual(self.client.get('/api/jobs/doesnotexist').status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/0123456789abcdef0123456789abcdef/result').status_code, 404)
+
+class TestAnimatedImages(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        frames = []
+        for i in range(6):
+            frame = Image.new('RGB', (48, 32), 'white')
+            frame.paste((255, 40 * i, 0), (i * 6, 4, i * 6 + 12, 16))
+            frames.append(frame)
+        self.durations = [40, 60, 80, 100, 120, 140]
+        buffer = io.BytesIO()
+        frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:],
+                       duration=self.durations, loop=0)
+        self.gif_bytes = buffer.getvalue()
+
+    def _convert(self, target_format):
+        response = self.client.post('/api/convert', data={
+            'file': (io.BytesIO(self.gif_bytes), 'anim.gif'),
+            'format': target_format
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        return Image.open(io.BytesIO(response.data))
+
+    def _frames(self, img):
+        for index in range(img.n_frames):
+            img.seek(index)
+            img.load()
+            yield img
+
+    def test_gif_to_webp_keeps_frames(self):
+        """Test, dass GIF nach WebP alle Frames, Dauern und Loop behält"""
+        result = self._convert('webp')
+        self.assertEqual(result.n_frames, 6)
+        self.assertEqual([f.info['duration'] for f in self._frames(result)], self.durations)
+        self.assertEqual(result.info['loop'], 0)
+
+    def test_gif_to_gif_uses_shared_palette(self):
+        """Test, dass GIF nach GIF pixelgenau bleibt"""
+        result = self._convert('gif')
+        source = Image.open(io.BytesIO(self.gif_bytes))
+        self.assertEqual(result.info['loop'], 0)
+        for expected, actual in zip(self._frames(source), self._frames(result)):
+            self.assertEqual(actual.info['duration'], expected.info['duration'])
+            self.assertIsNone(ImageChops.difference(expected.convert('RGB'), actual.convert('RGB')).getbbox())
+
+    def test_webp_without_streaming_encoder(self):
+        """Test, dass WebP-Animationen ohne geprüfte Pillow-Version über save_all entstehen"""
+        output = io.BytesIO()
+        with mock.patch('shiftfile.animation.streaming_webp', return_value=False):
+            convert_image(io.BytesIO(self.gif_bytes), output, 'webp')
+        result = Image.open(io.BytesIO(output.getvalue()))
+        self.assertEqual([f.info['duration'] for f in self._frames(result)], self.durations)
+        self.assertEqual(result.info['loop'], 0)
+
+    def test_webp_to_gif_keeps_frame_durations(self):
+        """Test, dass WebP nach GIF jedem Frame seine eigene Dauer lässt"""
+        webp = self._convert('webp')
+        buffer = io.BytesIO()
+        frames = [frame.convert('RGB') for frame in self._frames(webp)]
+        frames[0].save(buffer, format='WEBP', save_all=True, append_images=frames[1:],
+                       duration=[50, 60, 70, 80, 90, 100], loop=0, lossless=True)
+        response = self.client.post('/api/convert', data={
+            'file': (io.BytesIO(buffer.getvalue()), 'anim.webp'),
+            'format': 'gif'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        result = Image.open(io.BytesIO(response.data))
+        self.assertEqual([f.info['duration'] for f in self._frames(result)], [50, 60, 70, 80, 90, 100])
+
+class TestEncoderProfiles(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (96, 96), os.urandom(96 * 96 * 3)).save(buffer, format='PNG')
+        self.png_bytes = buffer.getvalue()
+
+    def _convert(self, profile, target_format='jpg'):
+        return self.client.post('/api/convert', data={
+            'file': (io.BytesIO(self.png_bytes), 'profile.png'),
+            'format': target_format,
+            'profile': profile
+        }, content_type='multipart/form-data')
+
+    def test_profile_selects_encoder_settings(self):
+        """Test, dass das Profil die JPEG-Parameter und die Antwort-Header bestimmt"""
+        fast = self._convert('fast')
+        smallest = self._convert('smallest')
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(smallest.status_code, 200)
+
+        self.assertNotIn('progressive', Image.open(io.BytesIO(fast.data)).info)
+        self.assertTrue(Image.open(io.BytesIO(smallest.data)).info.get('progressive'))
+        self.assertEqual(smallest.headers['X-Encoder-Profile'], 'smallest')
+        self.assertEqual(int(smallest.headers['X-Output-Size']), len(smallest.data))
+        self.assertGreaterEqual(float(smallest.headers['X-Encode-Time-Ms']), 0)
+        self.assertNotEqual(fast.headers['ETag'], smallest.headers['ETag'])
+
+    def test_unknown_profile(self):
+        """Test mit unbekanntem Profil"""
+        response = self._convert('tiny')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Profil', response.json['error'])
+
+class TestStreamingResponses(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_result_supports_range_and_etag(self):
+        """Test von Range- und If-None-Match-Anfragen auf ein Konvertierungsergebnis"""
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', (64, 64), os.urandom(64 * 64 * 3)).save(buffer, format='PNG')
+        response = self.client.post('/api/convert', data={
+            'file': (io.BytesIO(buffer.getvalue()), 'range.png'),
+            'format': 'bmp'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        full = response.data
+        etag = response.headers['ETag']
+        location = response.headers['Content-Location']
+
+        partial = self.client.get(location, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.data, full[10:20])
+        self.assertEqual(partial.headers['Content-Range'], f'bytes 10-19/{len(full)}')
+        self.assertIn('converted_range.png', partial.headers['Content-Disposition'])
+
+        unchanged = self.client.get(location, headers={'If-None-Match': etag})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(self.client.get('/api/results/' + '0' * 64 + '/bmp').status_code, 404)
+
+    def test_output_deleted_after_response_closed(self):
+        """Test, dass die Ausgabedatei erst nach dem Senden gelöscht wird"""
+        outputs = []
+
+        class RecordingEngine(StubAudioEngine):
+            def convert(self, input_path, output_path, target_format, settings):
+                super().convert(input_path, output_path, target_format, settings)
+                outputs.append(output_path)
+
+        payload = os.urandom(4096)
+        with mock.patch.object(app_module.services, 'audio_engine', RecordingEngine()):
+            response = self.client.post('/api/convert', data={
+                'file': (io.BytesIO(payload), 'stream.wav'),
+                'format': 'mp3'
+            }, content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(outputs[0]))
+        self.assertEqual(response.data, payload)
+        response.close()
+        self.assertFalse(os.path.exists(outputs[0]))
+
+    def test_output_buffer_closed_when_conversion_fails(self):
+        """Test, dass der Spool-Puffer der Ausgabe auch bei einem Fehler geschlossen wird"""
+        buffers = []
+
+        def recording_buffer(*args, **kwargs):
+            buffers.append(spooled_buffer(*args, **kwargs))
+            return buffers[-1]
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (16, 16), 'red').save(buffer, format='PNG')
+        with mock.patch('shiftfile.web.spooled_buffer', recording_buffer), \
+                mock.patch('shiftfile.web.convert_image', side_effect=OSError('Dekodierung fehlgeschlagen')):
+            response = self.client.post('/api/convert', data={
+                'file': (io.BytesIO(buffer.getvalue()), 'broken.png'),
+                'format': 'bmp'
+            }, content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(buffers), 1)
+        self.assertTrue(buffers[0].closed)
+
+class TestSharedCore(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_formats_without_codec_imports(self):
+        """Test, dass /api/formats im Vercel-Einstiegspunkt weder Pillow noch pydub lädt"""
+        script = (
+            "import json, sys; sys.path.insert(0, 'api'); import index; "
+            "response = index.app.test_client().get('/api/formats'); "
+            "print(json.dumps({'formats': response.json, "
+            "'loaded': sorted(m for m in ('PIL.Image', 'pydub') if m in sys.modules)}))"
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=app_module.BASE_DIR,
+                                capture_output=True, text=True, check=True)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(report['loaded'], [])
+        self.assertEqual(report['formats'], self.client.get('/api/formats').json)
+        self.assertIn('tiff', report['formats']['image'])
+        self.assertTrue({'aac', 'wma'} <= set(report['formats']['audio']))
+
+    def test_modes_converted_for_encoder(self):
+        """Test, dass Palette- und Graustufen-Alpha-Bilder nach JPEG bzw. BMP konvertiert werden"""
+        for mode, target_format in (('P', 'jpg'), ('LA', 'bmp')):
+            buffer = io.BytesIO()
+            Image.new(mode, (16, 16)).save(buffer, format='PNG')
+            buffer.seek(0)
+            response = self.client.post('/api/convert', data={
+                'file': (buffer, f'{mode.lower()}.png'),
+                'format': target_format
+            }, content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 200, response.data)
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_warmup_runs_once(self):
+        """Test, dass /api/warmup die Codecs nur beim ersten Aufruf initialisiert"""
+        first = self.client.get('/api/warmup')
+        second = self.client.post('/api/warmup')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([step['phase'] for step in first.json['warmup']], ['pillow', 'animation', 'audio_engine'])
+        self.assertFalse(second.json['cold'])
+        self.assertEqual(second.json['warmup'], first.json['warmup'])
+        self.assertIn('services', [phase['phase'] for phase in second.json['startup']])
+
+    def test_ffmpeg_lookup_is_cached(self):
+        """Test, dass ein gefundenes FFmpeg-Binary für den Prozess gemerkt wird"""
+        with tempfile.TemporaryDirectory() as directory:
+            binary = os.path.join(directory, 'ffmpeg')
+            with open(binary, 'w') as f:
+                f.write('#!/bin/sh\n')
+            os.chmod(binary, 0o755)
+            try:
+                with mock.patch.dict(os.environ, {'FFMPEG_BINARY': directory}):
+                    self.assertEqual(find_ffmpeg(refresh=True), binary)
+                self.assertEqual(find_ffmpeg(), binary)
+                self.assertEqual(FFmpegEngine().binary, binary)
+            finally:
+                find_ffmpeg(refresh=True)
+
+class TestAdmissionControl(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def _convert(self, filename, data, target_format, address='127.0.0.1', token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        return self.client.post('/api/convert', data={
+            'format': target_format,
+            'file': (io.BytesIO(data), filename)
+        }, content_type='multipart/form-data', headers=headers, environ_base={'REMOTE_ADDR': address})
+
+    def _png(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), color='green').save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def test_token_bucket_per_client(self):
+        """Test, dass jeder Client nur seinen eigenen Token-Bucket aufbraucht, auch mit wechselnden Tokens"""
+        admission = AdmissionController(rate=1 / 60, burst=1)
+        with mock.patch.object(app_module.services, 'admission', admission):
+            self.assertEqual(self._convert('a.png', self._png(), 'jpg', token='alice').status_code, 200)
+            limited = self._convert('a.png', self._png(), 'jpg', token='bob')
+            other = self._convert('a.png', self._png(), 'jpg', address='10.0.0.2')
+
+        self.assertEqual(limited.status_code, 429)
+        self.assertGreaterEqual(int(limited.headers['Retry-After']), 1)
+        self.assertEqual(other.status_code, 200)
+
+    def test_audio_load_does_not_block_images(self):
+        """Test, dass ein voller Audio-Pool mit 429 antwortet, Bilder aber weiterlaufen"""
+        admission = AdmissionController(audio_active=1, audio_queue=0, rate=0)
+        ticket = admission.acquire('audio')
+        try:
+            with mock.patch.object(app_module.services, 'admission', admission):
+                audio = self._convert('a.wav', b'RIFF', 'mp3')
+                image = self._convert('a.png', self._png(), 'jpg')
+        finally:
+            admission.release(ticket)
+
+        self.assertEqual(audio.status_code, 429)
+        self.assertIn('Retry-After', audio.headers)
+        self.assertEqual(image.status_code, 200)
+        self.assertEqual(admission.stats()['total']['active'], 0)
+
+    def test_full_pool_rejects_before_reading_upload(self):
+        """Test, dass ein voller Pool abweist, bevor der Upload eingelesen wird"""
+        admission = AdmissionController(audio_active=1, audio_queue=0, rate=0)
+        ticket = admission.acquire('audio')
+        wav = b'RIFF' + os.urandom(256 * 1024)
+        try:
+            with mock.patch.object(app_module.services, 'admission', admission), \
+                    mock.patch('shiftfile.streams.spooled_buffer', wraps=spooled_buffer) as spooled:
+                converted = self._convert('a.wav', wav, 'mp3')
+                processed = self.client.post('/api/process-audio', data={'file': (io.BytesIO(wav), 'a.wav')},
+                                             content_type='multipart/form-data')
+        finally:
+            admission.release(ticket)
+
+        self.assertEqual((converted.status_code, processed.status_code), (429, 429))
+        spooled.assert_not_called()
+
+    def test_batch_admitted_per_worker_before_reading_uploads(self):
+        """Test, dass ein Batch vor dem Einlesen zugelassen wird und je laufender Datei einen Platz belegt"""
+        files = lambda: [(io.BytesIO(self._png()), f'{i}.png') for i in range(3)]
+        admission = AdmissionController(image_active=1, image_queue=0, rate=0)
+        ticket = admission.acquire('image')
+        try:
+            with mock.patch.object(app_module.services, 'admission', admission), \
+                    mock.patch('shiftfile.streams.spooled_buffer', wraps=spooled_buffer) as spooled:
+                rejected = self.client.post('/api/convert/batch', data={'format': 'bmp', 'files': files()},
+                                            content_type='multipart/form-data')
+        finally:
+            admission.release(ticket)
+        self.assertEqual(rejected.status_code, 429)
+        spooled.assert_not_called()
+
+        admission = AdmissionController(max_active=6, image_active=5, rate=0)
+        with mock.patch.object(app_module.services, 'admission', admission), \
+                mock.patch('shiftfile.web.BATCH_WORKERS', 2):
+            response = self.client.post('/api/convert/batch', data={'format': 'bmp', 'files': files()},
+                                        content_type='multipart/form-data', buffered=False)
+            self.assertEqual(admission.stats()['image']['active'], 2)
+            self.assertEqual(len(zipfile.ZipFile(io.BytesIO(response.get_data())).namelist()), 3)
+            response.close()
+        self.assertEqual(admission.stats()['total']['active'], 0)
+
+    def test_jobs_take_admission_slots(self):
+        """Test, dass Hintergrund-Jobs einen Platz in der Zulassung brauchen"""
+        admission = AdmissionController(image_active=1, image_queue=0, rate=0)
+        ticket = admission.acquire('image')
+        try:
+            with mock.patch.object(app_module.services, 'admission', admission):
+                response = self.client.post('/api/jobs', data={'format': 'jpg', 'file': (io.BytesIO(self._png()), 'job.png')},
+                                            content_type='multipart/form-data')
+                self.assertEqual(response.status_code, 202)
+                deadline = time.time() + 10
+                while self.client.get(f"/api/jobs/{response.json['id']}").json['status'] not in ('done', 'error'):
+                    self.assertLess(time.time(), deadline)
+                    time.sleep(0.05)
+        finally:
+            admission.release(ticket)
+        job = self.client.get(f"/api/jobs/{response.json['id']}").json
+        self.assertEqual(job['status'], 'error')
+        self.assertIn('Zu viele Konvertierungen', job['error'])
+
+class TestTempJanitor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _file(self, name, size, age):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_removes_stale_request_files(self):
+        """Test, dass nur alte Anfrage-Dateien gelöscht werden"""
+        stale_input = self._file('input_old.png', 10, age=7200)
+        stale_spool = self._file('spool_abc123', 10, age=7200)
+        fresh_output = self._file('output_new.jpg', 10, age=5)
+        foreign = self._file('notes.txt', 10, age=7200)
+        # Temp-Dateien anderer Bibliotheken im selben Verzeichnis bleiben liegen
+        foreign_tmp = self._file('tmpabc123.jpg', 10, age=7200)
+
+        usage = TempJanitor(self.directory, max_bytes=0, max_age=3600, interval=0).sweep()
+        self.assertFalse(os.path.exists(stale_input))
+        self.assertFalse(os.path.exists(stale_spool))
+        self.assertTrue(os.path.exists(fresh_output))
+        self.assertTrue(os.path.exists(foreign))
+        self.assertTrue(os.path.exists(foreign_tmp))
+        self.assertEqual(usage['bytes'], 30)
+        self.assertEqual(usage['removed_files'], 2)
+
+        stats = app.test_client().get('/api/temp/stats')
+        self.assertEqual(stats.status_code, 200)
+        self.assertIn('max_bytes', stats.json)
+
+    def test_quota_removes_oldest_then_cache(self):
+        """Test, dass über dem Limit erst die ältesten Dateien und dann Cache-Einträge entfernt werden"""
+        cache = ConversionCache(os.path.join(self.directory, 'cache'), 1000)
+        for name in ('a', 'b'):
+            source = self._file(f'source_{name}', 300, age=0)
+            cache.put(name * 64, 'png', source)
+            os.remove(source)
+        oldest = self._file('output_1.bin', 400, age=600)
+        newer = self._file('output_2.bin', 400, age=300)
+        running = self._file('output_3.bin', 400, age=1)
+
+        janitor = TempJanitor(self.directory, max_bytes=900, max_age=3600, min_age=60, interval=0, cache=cache)
+        usage = janitor.sweep()
+        self.assertFalse(os.path.exists(oldest))
+        self.assertFalse(os.path.exists(newer))
+        self.assertTrue(os.path.exists(running))
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertLessEqual(usage['bytes'], 900)
+
+class TestProbe(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.wav = io.BytesIO()
+        with wave.open(self.wav, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(22050)
+            w.writeframes(b'\x00\x00' * 22050 * 2)
+
+    def _probe(self, data, filename):
+        return self.client.post('/api/probe', data={'file': (io.BytesIO(data), filename)},
+                                content_type='multipart/form-data')
+
+    def test_probe_reads_headers(self):
+        """Test, dass /api/probe Audio- und Bild-Metadaten aus den Headern liefert"""
+        audio = self._probe(self.wav.getvalue(), 'tone.wav')
+        self.assertEqual(audio.status_code, 200)
+        self.assertEqual(audio.json['codec'], 'pcm_s16le')
+        self.assertEqual(audio.json['sample_rate'], 22050)
+        self.assertEqual(audio.json['channels'], 1)
+        self.assertAlmostEqual(audio.json['duration'], 2.0)
+        self.assertEqual(audio.json['source'], 'header')
+
+        buffer = io.BytesIO()
+        Image.new('LA', (40, 30)).save(buffer, format='PNG')
+        image = self._probe(buffer.getvalue(), 'alpha.png')
+        self.assertEqual((image.json['width'], image.json['height'], image.json['mode']), (40, 30, 'LA'))
+        self.assertTrue(image.json['has_alpha'])
+
+        self.assertEqual(self._probe(b'kein Audio', 'broken.mp3').status_code, 422)
+
+    def test_probe_of_file_head_uses_declared_size(self):
+        """Test, dass /api/probe mit dem Dateianfang und der Gesamtgröße auskommt"""
+        data = self.wav.getvalue()
+        response = self.client.post('/api/probe', data={'file': (io.BytesIO(data[:4096]), 'tone.wav'),
+                                                        'size': str(len(data))},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.json['duration'], 2.0)
+        self.assertEqual(response.json['size'], len(data))
+
+    def test_engine_probe_skips_ffmpeg_for_known_headers(self):
+        """Test, dass die Engine die Dauer für fadeOut aus dem Header statt per FFmpeg liest"""
+        with tempfile.NamedTemporaryFile(suffix='.wav') as f:
+            f.write(self.wav.getvalue())
+            f.flush()
+            with mock.patch('shiftfile.audio.subprocess.run') as run:
+                info = FFmpegEngine(binary='ffmpeg').probe(f.name)
+        run.assert_not_called()
+        self.assertEqual(info, {'duration': 2.0, 'sample_rate': 22050})
+
+class TestPassthrough(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_same_image_format_is_copied(self):
+        """Test, dass jpeg -> jpg die Bytes unverändert zurückgibt statt neu zu kodieren"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'red').save(buffer, format='JPEG', quality=75)
+        source = buffer.getvalue()
+
+        copied = self.client.post('/api/convert', data={'format': 'jpg', 'file': (io.BytesIO(source), 'photo.jpeg')},
+                                  content_type='multipart/form-data')
+        self.assertEqual(copied.status_code, 200)
+        self.assertEqual(copied.headers['X-Passthrough'], 'copy')
+        self.assertEqual(copied.data, source)
+
+        # Verkleinern oder das Profil 'smallest' erzwingen eine Neukodierung
+        for extra in ({'max_width': '32'}, {'profile': 'smallest'}):
+            encoded = self.client.post('/api/convert',
+                                       data={'format': 'jpg', **extra, 'file': (io.BytesIO(source), 'photo.jpeg')},
+                                       content_type='multipart/form-data')
+            self.assertEqual(encoded.status_code, 200)
+            self.assertNotIn('X-Passthrough', encoded.headers)
+
+    def test_audio_copy_and_remux(self):
+        """Test der Passthrough-Entscheidung für Audio und des Kopierens ohne FFmpeg"""
+        mp3 = {'codec': 'mp3', 'container': 'mp3', 'channels': 2, 'bitrate': 128}
+        aac = {'codec': 'aac', 'container': 'mp4', 'channels': 2, 'bitrate': 128}
+        self.assertEqual(passthrough_mode(mp3, 'mp3', parse_audio_settings({'bitrate': '192'})), 'copy')
+        self.assertIsNone(passthrough_mode(mp3, 'mp3', parse_audio_settings({'bitrate': '64'})))
+        self.assertIsNone(passthrough_mode(mp3, 'mp3', parse_audio_settings({'bitrate': '192', 'mono': 'true'})))
+        self.assertIsNone(passthrough_mode(mp3, 'ogg', parse_audio_settings({'bitrate': '192'})))
+        self.assertEqual(passthrough_mode(aac, 'aac', parse_audio_settings({'bitrate': '192'})), 'remux')
+
+        engine = FFmpegEngine(binary='ffmpeg')
+        command = engine.build_command('in.m4a', 'out.aac', 'aac', parse_audio_settings({}), copy=True)
+        self.assertEqual(command[command.index('-c:a') + 1], 'copy')
+        self.assertNotIn('-b:a', command)
+
+        wav = io.BytesIO()
+        with wave.open(wav, 'wb') as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            w.writeframes(b'\x01\x00' * 4410)
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'in.wav')
+            target = os.path.join(directory, 'out.wav')
+            with open(source, 'wb') as f:
+                f.write(wav.getvalue())
+            with mock.patch('shiftfile.audio.subprocess.run') as run:
+                mode = engine.convert(source, target, 'wav', parse_audio_settings({}))
+            run.assert_not_called()
+            self.assertEqual(mode, 'copy')
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), wav.getvalue())
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        # configure_logging() ersetzt die Konfiguration der App; danach wiederherstellen
+        self.addCleanup(configure_logging)
+
+    def test_request_id_and_json_lines(self):
+        """Test der Korrelations-ID im Header und in den JSON-Log-Zeilen"""
+        echoed = self.client.get('/api/formats', headers={'X-Request-ID': 'client-42'})
+        self.assertEqual(echoed.headers['X-Request-ID'], 'client-42')
+        replaced = self.client.get('/api/formats', headers={'X-Request-ID': 'kein gültiger Wert'})
+        self.assertRegex(replaced.headers['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+        output = io.StringIO()
+        logger = logging.getLogger('shiftfile.test_logging')
+        logger.propagate = False
+        configure_logging(fmt='json', logger=logger, stream=output, use_queue=True)
+        token = request_id.set('req-1')
+        try:
+            logger.info('Konvertierung fertig', extra={'target': 'png'})
+        finally:
+            request_id.reset(token)
+        stop_logging()  # leert die Queue
+
+        entry = json.loads(output.getvalue())
+        self.assertEqual((entry['message'], entry['request_id'], entry['target']),
+                         ('Konvertierung fertig', 'req-1', 'png'))
+
+    def test_sampling_and_rotation(self):
+        """Test, dass Sampling nur Erfolgs-Logs verwirft und die Log-Datei rotiert"""
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'shiftfile.log')
+            logger = logging.getLogger('shiftfile.test_rotation')
+            logger.propagate = False
+            configure_logging(logger=logger, log_file=log_file, max_bytes=300, backup_count=1,
+                              sample_rate=0.0, use_queue=False, stream=io.StringIO())
+            token = request_id.set('req-2')
+            try:
+                for i in range(5):
+                    logger.info(f'Erfolg {i}')
+                    logger.warning(f'Warnung {i} ' + 'x' * 40)
+            finally:
+                request_id.reset(token)
+            stop_logging()
+
+            self.assertTrue(os.path.exists(log_file + '.1'))
+            with open(log_file, encoding='utf-8') as f, open(log_file + '.1', encoding='utf-8') as g:
+                written = f.read() + g.read()
+            self.assertNotIn('Erfolg', written)
+            self.assertIn('Warnung 4', written)
+
+class TestCloudConvertClient(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.stub = StubCloudConvert(delay=0.01)
+        self.api_url = self.stub.serve()
+        self.addCleanup(self.stub.shutdown)
+
+    def test_concurrent_conversions_share_one_job(self):
+        """Test, dass gleichzeitige Konvertierungen einen Job und wenige Verbindungen nutzen"""
+        engine = CloudConvertEngine(api_key='test', api_url=self.api_url)
+        engine.batch_window = 0.2
+
+        with tempfile.TemporaryDirectory() as directory:
+            def convert(index):
+                source = os.path.join(directory, f'clip{index}.wav')
+                target = os.path.join(directory, f'clip{index}.mp3')
+                with open(source, 'wb') as f:
+                    f.write(b'FAIL' if index == 3 else f'audio {index}'.encode())
+                try:
+                    engine.convert(source, target, 'mp3', {})
+                except Exception as e:
+                    return e
+                with open(target, 'rb') as f:
+                    return f.read()
+
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                results = list(pool.map(convert, range(5)))
+
+        self.assertEqual(len(self.stub.jobs), 1)
+        self.assertEqual(results[0], b'mp3:audio 0')
+        self.assertEqual(results[4], b'mp3:audio 4')
+        # Ein fehlgeschlagener Task betrifft nur seine eigene Datei
+        self.assertIsInstance(results[3], AudioEngineError)
+        self.assertIn('convert', str(results[3]))
+        self.assertLess(self.stub.connections, self.stub.requests)
+
+    def test_failed_upload_only_fails_its_file(self):
+        """Test, dass ein fehlgeschlagener Upload nur seine eigene Datei betrifft"""
+        engine = CloudConvertEngine(api_key='test', api_url=self.api_url)
+        engine.batch_window = 0.2
+
+        with tempfile.TemporaryDirectory() as directory:
+            def convert(index):
+                source = os.path.join(directory, f'clip{index}.wav')
+                target = os.path.join(directory, f'clip{index}.mp3')
+                with open(source, 'wb') as f:
+                    f.write(b'REJECT' if index == 1 else f'audio {index}'.encode())
+                try:
+                    engine.convert(source, target, 'mp3', {})
+                except Exception as e:
+                    return e
+                with open(target, 'rb') as f:
+                    return f.read()
+
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(convert, range(4)))
+
+        self.assertIsInstance(results[1], AudioEngineError)
+        self.assertEqual([results[0], results[2], results[3]], [b'mp3:audio 0', b'mp3:audio 2', b'mp3:audio 3'])
+        # Der blockierte Job wird verworfen, die übrigen Dateien laufen in einem neuen
+        self.assertEqual(len(self.stub.deleted), 1)
+        self.assertEqual(len(self.stub.jobs), 1)
+
+    def test_webhook_wakes_waiting_job(self):
+        """Test der Webhook-Signaturprüfung und des Weckens wartender Jobs"""
+        engine = CloudConvertEngine(api_key='test', api_url=self.api_url, webhook_secret='geheim')
+        body = json.dumps({'event': 'job.finished', 'job': {'id': 'job-1'}}).encode()
+        signature = hmac.new(b'geheim', body, hashlib.sha256).hexdigest()
+
+        with mock.patch.object(app_module.services, 'audio_engine', engine), \
+                mock.patch.object(engine, 'notify') as notify:
+            forged = self.client.post('/api/cloudconvert/webhook', data=body,
+                                      headers={'CloudConvert-Signature': '0' * 64},
+                                      content_type='application/json')
+            accepted = self.client.post('/api/cloudconvert/webhook', data=body,
+                                        headers={'CloudConvert-Signature': signature},
+                                        content_type='application/json')
+
+        self.assertEqual(forged.status_code, 401)
+        self.assertEqual(accepted.status_code, 204)
+        notify.assert_called_once_with('job-1')
+        self.assertEqual(self.client.post('/api/cloudconvert/webhook', data=body).status_code, 404)
+
+@unittest.skipUnless(numpy_available(), 'NumPy nicht installiert')
+class TestAudioEffects(unittest.TestCase):
+    def test_effect_chain_on_arrays(self):
+        """Test der vektorisierten Effekte: Mono, Tempo, Fades und Normalisierung"""
+        import numpy as np
+
+        rate = 1000
+        samples = np.full((2 * rate, 2), 0.1, dtype=np.float32)
+        samples[:, 1] = 0.3
+        settings = parse_audio_settings({'mono': 'true', 'speed': '2.0', 'fadeIn': '0.1', 'fadeOut': '0.1',
+                                         'normalize': 'true'})
+        result = apply_effects(samples, rate, settings)
+
+        self.assertEqual(result.shape, (rate, 1))
+        self.assertEqual(result[0, 0], 0)
+        self.assertAlmostEqual(float(result[-1, 0]), 0, places=6)
+        rms = float(np.sqrt(np.mean(result ** 2)))
+        self.assertAlmostEqual(rms, 10 ** (-24 / 20), places=4)
+
+        loud = np.full((rate, 1), 0.001, dtype=np.float32)
+        loud[0] = 0.5
+        peak = apply_effects(loud, rate, parse_audio_settings({'normalize': 'true'}))
+        self.assertLessEqual(float(np.abs(peak).max()), 10 ** (-0.1 / 20) + 1e-6)
+
+    def test_numpy_routing_and_zero_copy_buffers(self):
+        """Test, wann die Effekte in NumPy laufen, und der kopierfreien PCM-Puffer"""
+        import numpy as np
+
+        header = {'sample_rate': 44100, 'channels': 2, 'duration': 60.0}
+        normalize = parse_audio_settings({'normalize': 'true'})
+        volume = parse_audio_settings({'volume': '3'})
+        self.assertTrue(use_numpy(normalize, header, mode='auto'))
+        self.assertFalse(use_numpy(volume, header, mode='auto'))
+        self.assertTrue(use_numpy(volume, header, mode='numpy'))
+        self.assertFalse(use_numpy(normalize, header, mode='ffmpeg'))
+        self.assertFalse(use_numpy(normalize, {**header, 'duration': 10 ** 6}, mode='auto'))
+        self.assertFalse(use_numpy(parse_audio_settings({}), header, mode='numpy'))
+        # Die Grenze gilt für den Spitzenverbrauch: Tempoänderungen brauchen Positions- und Zielarrays
+        faster = parse_audio_settings({'normalize': 'true', 'speed': '1.5'})
+        budget = peak_bytes(header, normalize)
+        with mock.patch('shiftfile.effects.MAX_BYTES', budget):
+            self.assertTrue(use_numpy(normalize, header, mode='auto'))
+            self.assertFalse(use_numpy(faster, header, mode='auto'))
+
+        pcm = PCMBuffer(5 * 4)
+        pcm.write(np.arange(4, dtype=np.float32).tobytes())
+        pcm.write(np.arange(4, 6, dtype=np.float32).tobytes())
+        view = pcm.samples(2)
+        self.assertEqual(view.shape, (3, 2))
+        self.assertEqual(view[2, 1], 5)
+        self.assertTrue(np.shares_memory(view, np.frombuffer(pcm.data, dtype=np.float32)))
+        self.assertEqual(ArrayReader(view).read(), pcm.data)
+
+class TestTiledImages(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        gradient = Image.linear_gradient('L').resize((300, 1000))
+        self.rgba = Image.merge('RGBA', (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT),
+                                         gradient.rotate(180), gradient.transpose(Image.FLIP_TOP_BOTTOM)))
+        # Budget für 128-Zeilen-Bänder bei 300 Pixeln Breite: das Bild wird in acht Bändern gelesen
+        self.budget = mock.patch.object(tiles, 'MEMORY_BUDGET', 300 * 4 * tiles.BAND_COPIES * 128)
+
+    def convert(self, data, target_format, max_size=None, tiled=True):
+        output = io.BytesIO()
+        with mock.patch.object(tiles, 'MEMORY_BUDGET', tiles.MEMORY_BUDGET if tiled else 10 ** 15):
+            convert_image(io.BytesIO(data), output, target_format, max_size)
+        image = Image.open(io.BytesIO(output.getvalue()))
+        image.load()
+        return image
+
+    def test_png_and_tiff_convert_in_bands(self):
+        """Test, dass große PNG- und TIFF-Quellen bandweise dasselbe Ergebnis liefern wie am Stück"""
+        sources = {}
+        for name, options in (('png', {}), ('tiff', {'compression': 'tiff_lzw'}),
+                              ('tiff', {'compression': 'tiff_adobe_deflate', 'tiled': True,
+                                        'tile_width': 64, 'tile_length': 64})):
+            buffer = io.BytesIO()
+            self.rgba.save(buffer, format=name.upper(), **options)
+            sources[f"{name}-{options.get('tiled', 'strips')}"] = buffer.getvalue()
+
+        with self.budget, mock.patch('shiftfile.convert.read_bands', wraps=tiles.read_bands) as read_bands:
+            for label, data in sources.items():
+                for target in {'png', 'tiff', 'bmp', 'jpg'} - {label.split('-')[0]}:
+                    with self.subTest(source=label, target=target):
+                        tiled = self.convert(data, target)
+                        whole = self.convert(data, target, tiled=False)
+                        self.assertEqual(tiled.size, (300, 1000))
+                        self.assertEqual(tiled.mode, whole.mode)
+                        self.assertIsNone(ImageChops.difference(tiled, whole).getbbox())
+            self.assertEqual(read_bands.call_count, 9)
+
+            small = self.convert(sources['png-strips'], 'webp', max_size=(60, None))
+            self.assertEqual(small.size, (60, 200))
+
+    def test_band_readable_images_pass_the_bomb_check(self):
+        """Test, dass nur bandweise lesbare Bilder über Pillows Pixelgrenze geöffnet werden"""
+        png, jpeg = io.BytesIO(), io.BytesIO()
+        self.rgba.save(png, format='PNG')
+        self.rgba.convert('RGB').save(jpeg, format='JPEG')
+
+        output = io.BytesIO()
+        with self.budget, mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100000):
+            with self.assertRaises(Image.DecompressionBombError):
+                Image.open(png)
+            convert_image(png, output, 'jpg')
+            with self.assertRaises(Image.DecompressionBombError):
+                convert_image(jpeg, io.BytesIO(), 'png')
+            with mock.patch.object(tiles, 'MAX_PIXELS', 100000):
+                with self.assertRaises(Image.DecompressionBombError):
+                    convert_image(png, io.BytesIO(), 'jpg')
+        self.assertEqual(Image.open(output).size, (300, 1000))
+
+    def test_jpeg_height_patched_in_sof_segment(self):
+        """Test, dass die Bildhöhe im SOF-Segment landet, auch wenn ein APP-Segment FF C0 enthält"""
+        encode = tiles._BandWriter._encode
+
+        def with_app_segment(band, pillow_format, **settings):
+            encoded = encode(band, pillow_format, **settings).getvalue()
+            payload = b'Exif\x00\x00\xff\xc0\x00\x11\x08\x00\x80'
+            segment = b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+            return io.BytesIO(encoded[:2] + segment + encoded[2:])
+
+        png = io.BytesIO()
+        self.rgba.save(png, format='PNG')
+        with self.budget, mock.patch.object(tiles._JpegWriter, '_encode', staticmethod(with_app_segment)):
+            tiled = self.convert(png.getvalue(), 'jpg')
+        whole = self.convert(png.getvalue(), 'jpg', tiled=False)
+        self.assertEqual(tiled.size, (300, 1000))
+        self.assertIsNone(ImageChops.difference(tiled, whole).getbbox())
+
+class TestProgressEvents(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.progress_id = uuid.uuid4().hex
+
+    def events(self, **headers):
+        response = self.client.get(f'/api/convert/{self.progress_id}/events', headers=headers)
+        blocks = [dict(line.split(': ', 1) for line in block.splitlines())
+                  for block in response.get_data(as_text=True).split('\n\n') if block.startswith('id:')]
+        return response, [(block['id'], block['event'], json.loads(block['data'])) for block in blocks]
+
+    def test_conversion_events_over_sse(self):
+        """Test der SSE-Ereignisse einer Konvertierung und des Fortsetzens per Last-Event-ID"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'teal').save(buffer, format='PNG')
+        buffer.seek(0)
+        converted = self.client.post('/api/convert', data={'format': 'webp', 'file': (buffer, 'progress.png')},
+                                     content_type='multipart/form-data', headers={'X-Progress-ID': self.progress_id})
+        self.assertEqual(converted.status_code, 200)
+
+        response, events = self.events()
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        names = [name for _, name, _ in events]
+        self.assertEqual((names[0], names[-1]), ('upload', 'ready'))
+        self.assertIn('encode', [data['stage'] for _, name, data in events if name == 'stage'])
+        self.assertEqual(events[0][2]['filename'], 'progress.png')
+        self.assertEqual(events[-1][2]['cache'], 'MISS')
+
+        # Ab der letzten ID kommt nichts mehr; 204 beendet das Wiederverbinden
+        self.assertEqual(self.events(**{'Last-Event-ID': events[-1][0]})[0].status_code, 204)
+        _, resumed = self.events(**{'Last-Event-ID': events[0][0]})
+        self.assertEqual(resumed, events[1:])
+
+        self.assertEqual(self.client.get('/api/convert/zu-kurz/events').status_code, 404)
+        # Ohne X-Progress-ID wird nichts geschrieben
+        self.client.get('/api/formats')
+        self.assertFalse(os.path.exists(app_module.services.progress.path(uuid.uuid4().hex)))
+
+    @unittest.skipUnless(find_ffmpeg(), 'FFmpeg nicht installiert')
+    def test_ffmpeg_progress_percent(self):
+        """Test der Prozentmeldungen aus ffmpeg -progress, gedrosselt und aufsteigend bis 100"""
+        wav = io.BytesIO()
+        with wave.open(wav, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(22050)
+            w.writeframes(os.urandom(22050 * 2 * 3))
+        wav.seek(0)
+        store = app_module.services.progress
+        token = progress.current.set(store.channel(self.progress_id))
+        try:
+            FFmpegEngine().convert_stream(wav, io.BytesIO(), 'mp3', parse_audio_settings({}), input_format='wav')
+        finally:
+            progress.current.reset(token)
+
+        events, finished = store.read(self.progress_id)
+        self.assertFalse(finished)
+        percents = [data['percent'] for _, name, data in events if name == 'progress']
+        self.assertEqual(percents[-1], 100)
+        self.assertEqual(percents, sorted(set(percents)))
+        self.assertEqual({data['stage'] for _, name, data in events if name == 'progress'}, {'encode'})
+
+class TestAsgiBridge(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.bridge = AsgiBridge(app, threads=2)
+        self.addCleanup(self.bridge.executor.shutdown)
+
+    async def request(self, method, path, body=b'', headers=(), chunks=1, release=None):
+        """Send one request through the bridge; the body arrives in ``chunks`` parts, the last after ``release``"""
+        path, _, query = path.partition('?')
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(), 'http_version': '1.1',
+                 'headers': [(name.encode(), value.encode()) for name, value in headers],
+                 'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000)}
+        size = -(-len(body) // chunks) if body else 0
+        parts = [body[i:i + size] for i in range(0, len(body), size)] if body else [b'']
+        messages = [{'type': 'http.request', 'body': part, 'more_body': i < len(parts) - 1}
+                    for i, part in enumerate(parts)]
+        sent = []
+
+        async def receive():
+            if len(messages) == 1 and release is not None:
+                await release.wait()
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await self.bridge(scope, receive, send)
+        # Jede Antwort endet mit einem Body ohne more_body, sonst wäre sie abgeschnitten
+        self.assertEqual(sent[-1]['type'], 'http.response.body')
+        self.assertFalse(sent[-1].get('more_body', False))
+        start = sent[0]
+        headers = {name.decode(): value.decode() for name, value in start['headers']}
+        return start['status'], headers, b''.join(m.get('body', b'') for m in sent[1:])
+
+    def test_same_routes_over_asgi(self):
+        """Test, dass Konvertierung, Ergebnis-Download und Fehler über ASGI dieselben Antworten liefern"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'navy').save(buffer, format='PNG')
+        boundary, body = encode_multipart({'format': 'jpg', 'file': FileStorage(io.BytesIO(buffer.getvalue()),
+                                                                                 'asgi.png')})
+        multipart = [('content-type', f'multipart/form-data; boundary={boundary}'),
+                     ('content-length', str(len(body)))]
+
+        async def scenario():
+            converted = await self.request('POST', '/api/convert', body, multipart, chunks=7)
+            result = await self.request('GET', converted[1]['content-location'])
+            too_large = await self.request('POST', '/api/convert', b'', [
+                ('content-type', f'multipart/form-data; boundary={boundary}'),
+                ('content-length', str(app.config['MAX_CONTENT_LENGTH'] + 1))])
+            return converted, result, too_large
+
+        (status, headers, data), result, too_large = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['x-cache'], 'MISS')
+        self.assertEqual(Image.open(io.BytesIO(data)).format, 'JPEG')
+        self.assertEqual(int(headers['content-length']), len(data))
+        self.assertEqual(result[0], 200)
+        self.assertEqual(result[2], data)
+        self.assertEqual(too_large[0], 413)
+
+    def test_batch_zip_streams_over_asgi(self):
+        """Test, dass der ZIP-Stream der Batch-Konvertierung mit Request-Kontext vollständig ankommt"""
+        fields = MultiDict([('format', 'png')])
+        for i in range(3):
+            buffer = io.BytesIO()
+            Image.new('RGB', (40, 30), (i * 80, 20, 0)).save(buffer, format='JPEG')
+            fields.add('files', FileStorage(io.BytesIO(buffer.getvalue()), f'batch{i}.jpg'))
+        boundary, body = encode_multipart(fields)
+
+        status, headers, data = asyncio.run(self.request('POST', '/api/convert/batch', body, [
+            ('content-type', f'multipart/form-data; boundary={boundary}'), ('content-length', str(len(body)))]))
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        self.assertEqual(sorted(archive.namelist()), ['batch0.png', 'batch1.png', 'batch2.png'])
+        self.assertEqual(Image.open(io.BytesIO(archive.read('batch2.png'))).size, (40, 30))
+
+    def test_slow_uploads_do_not_hold_threads(self):
+        """Test, dass wartende Uploads keinen der zwei Threads belegen und Abbrüche Flask nie erreichen"""
+        body = json.dumps({'filename': 'gross.mp3', 'size': 1024}).encode()
+
+        async def scenario():
+            gate = asyncio.Event()
+            uploads = [asyncio.create_task(self.request('POST', '/api/uploads', body, [
+                ('content-type', 'application/json')], chunks=4, release=gate)) for _ in range(20)]
+            await asyncio.sleep(0.05)
+            # 20 halbe Uploads und trotzdem antwortet /api/formats sofort
+            formats = await asyncio.wait_for(self.request('GET', '/api/formats'), timeout=5)
+            self.assertFalse(any(task.done() for task in uploads))
+            gate.set()
+            return formats, await asyncio.gather(*uploads)
+
+        with mock.patch.object(app, 'wsgi_app', wraps=app.wsgi_app) as wsgi_app:
+            formats, uploads = asyncio.run(scenario())
+            self.assertEqual(wsgi_app.call_count, 21)
+        self.assertEqual(formats[0], 200)
+        self.assertIn('png', json.loads(formats[2])['image'])
+        self.assertEqual({status for status, _, _ in uploads}, {201})
+
+        sent = []
+
+        async def disconnect():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        with mock.patch.object(app, 'wsgi_app') as wsgi_app:
+            asyncio.run(self.bridge({'type': 'http', 'method': 'POST', 'path': '/api/convert', 'headers': []},
+                                    disconnect, send))
+        wsgi_app.assert_not_called()
+        self.assertEqual(sent, [])
+
+    def test_progress_listeners_wait_on_event_loop(self):
+        """Test, dass offene SSE-Zuhörer keinen der zwei Threads belegen und bei neuen Ereignissen aufwachen"""
+        store = app_module.services.progress
+        progress_ids = [uuid.uuid4().hex for _ in range(4)]
+        for progress_id in progress_ids:
+            store.append(progress_id, 'upload', {'filename': 'warten.png'})
+
+        async def scenario():
+            listeners = [asyncio.create_task(self.request('GET', f'/api/convert/{progress_id}/events'))
+                         for progress_id in progress_ids]
+            await asyncio.sleep(0.2)
+            formats = await asyncio.wait_for(self.request('GET', '/api/formats'), timeout=5)
+            self.assertFalse(any(task.done() for task in listeners))
+            for progress_id in progress_ids:
+                store.append(progress_id, 'ready', {'cache': 'MISS'})
+            return formats, await asyncio.wait_for(asyncio.gather(*listeners), timeout=5)
+
+        with mock.patch.object(store, 'stream_seconds', 30):
+            formats, listeners = asyncio.run(scenario())
+        self.assertEqual(formats[0], 200)
+        for status, headers, data in listeners:
+            self.assertEqual(status, 200)
+            self.assertEqual(headers['content-type'], 'text/event-stream; charset=utf-8')
+            names = [line.split(': ', 1)[1] for line in data.decode().splitlines() if line.startswith('event:')]
+            self.assertEqual(names, ['upload', 'ready'])
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def test_stage_timings_exported(self):
+        """Test, dass Konvertierungen Stufen-Timings und Zähler erzeugen"""
+        buffer = io.BytesIO()
+        # Zufällige Pixel, damit kein Cache-Treffer die Stufen überspringt
+        Image.frombytes('RGB', (64, 64), os.urandom(64 * 64 * 3)).save(buffer, format='PNG')
+        response = self.client.post('/api/convert', data={
+            'file': (io.BytesIO(buffer.getvalue()), 'metrics.png'),
+            'format': 'webp'
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        metrics = self.client.get('/api/metrics')
+        self.assertEqual(metrics.status_code, 200)
+        body = metrics.get_data(as_text=True)
+        for stage in ('upload', 'decode', 'encode', 'send'):
+            self.assertIn(f'shiftfile_stage_seconds_bucket{{stage="{stage}"', body)
+        self.assertIn('shiftfile_conversions_total{source="png",target="webp"', body)
+        self.assertIn('shiftfile_bytes_in_total', body)
+
+class TestBenchmark(unittest.TestCase):
+    def test_report_structure(self):
+        """Test eines Mini-Benchmarks inklusive Regressionsvergleich"""
+        import benchmark
+        report = benchmark.run_benchmark(sizes=[32], modes=['RGB', 'P'], image_sources=['png'],
+                                         image_targets=['webp'], iterations=2, warmup=0, audio=False)
+        self.assertEqual(report['summary']['cases'], 2)
+        for result in report['results']:
+            self.assertEqual(result['errors'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreater(result['files_per_second'], 0)
+        self.assertGreater(report['summary']['peak_rss_kb'], 0)
+        self.assertNotIn('peak_rss_kb', report['results'][0])
+
+        slower = {'results': [dict(r, p50_ms=r['p50_ms'] * 2) for r in report['results']]}
+        self.assertEqual(len(benchmark.compare(report, slower, 0.2)), 2)
+        self.assertEqual(benchmark.compare(slower, report, 0.2), [])
+
 if __name__ == "__main__":
     print("Starte Tests...")
     
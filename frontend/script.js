@@ -1,9 +1,18 @@
 // Aktualisiere die API-Endpunkte
 const API_ENDPOINTS = {
     FORMATS: '/api/formats',
-    CONVERT: '/api/convert'
+    CONVERT: '/api/convert',
+    UPLOADS: '/api/uploads',
+    PROBE: '/api/probe'
 };
 
+// Dateien ab dieser Größe werden in Chunks hochgeladen (Vercel-Limit: 4.5MB pro Request)
+const CHUNKED_UPLOAD_THRESHOLD = 4 * 1024 * 1024;
+// /api/probe bekommt nur den Dateianfang, so viel wie der Server nach Headern durchsucht
+const PROBE_BYTES = 64 * 1024;
+const PARALLEL_CHUNKS = 4;
+const CHUNK_RETRIES = 3;
+
 document.addEventListener('DOMContentLoaded', () => {
     const elements = {
         dropZone: document.getElementById('dropZone'),
@@ -112,9 +121,132 @@ document.addEventListener('DOMContentLoaded', () => {
 
     elements.dropZone.addEventListener('click', () => elements.fileInput.click());
 
+    async function sha256Hex(data) {
+        // crypto.subtle gibt es nur in sicheren Kontexten (HTTPS/localhost)
+        if (!window.crypto || !window.crypto.subtle) return null;
+        const digest = await window.crypto.subtle.digest('SHA-256', data);
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function uploadChunk(uploadId, file, offset, chunkSize) {
+        const chunk = await file.slice(offset, offset + chunkSize).arrayBuffer();
+        const checksum = await sha256Hex(chunk);
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        if (checksum) headers['X-Chunk-Sha256'] = checksum;
+
+        for (let attempt = 1; attempt <= CHUNK_RETRIES; attempt++) {
+            let response = null;
+            try {
+                response = await fetch(`${API_ENDPOINTS.UPLOADS}/${uploadId}?offset=${offset}`, {
+                    method: 'PUT',
+                    headers,
+                    body: chunk
+                });
+            } catch (error) {
+                // Verbindungsabbruch: Chunk erneut senden
+                if (attempt === CHUNK_RETRIES) throw error;
+            }
+
+            if (response && response.ok) return;
+            // Serverfehler und fehlerhafte Prüfsummen werden wiederholt, alles andere nicht
+            const retryable = !response || response.status >= 500 || response.status === 422;
+            if (response && (!retryable || attempt === CHUNK_RETRIES)) {
+                const errorData = await response.json().catch(() => ({}));
+                throw new Error(errorData.error || 'Chunk-Upload fehlgeschlagen');
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * attempt));
+        }
+    }
+
+    async function startOrResumeUpload(file) {
+        // Nach einem Abbruch wird der bestehende Upload fortgesetzt
+        const resumeKey = `shiftfile-upload:${file.name}:${file.size}:${file.lastModified}`;
+        const previousId = sessionStorage.getItem(resumeKey);
+        if (previousId) {
+            const statusResponse = await fetch(`${API_ENDPOINTS.UPLOADS}/${previousId}`);
+            if (statusResponse.ok) return { upload: await statusResponse.json(), resumeKey };
+        }
+
+        const initResponse = await fetch(API_ENDPOINTS.UPLOADS, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        if (!initResponse.ok) {
+            const errorData = await initResponse.json();
+            throw new Error(errorData.error || 'Upload konnte nicht gestartet werden');
+        }
+        const upload = await initResponse.json();
+        sessionStorage.setItem(resumeKey, upload.id);
+        return { upload, resumeKey };
+    }
+
+    function progressId() {
+        // crypto.randomUUID gibt es nur in sicheren Kontexten (HTTPS/localhost)
+        if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+        if (window.crypto && window.crypto.getRandomValues) {
+            return Array.from(window.crypto.getRandomValues(new Uint8Array(16)),
+                b => b.toString(16).padStart(2, '0')).join('');
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    // Fortschritt der Konvertierung per Server-Sent Events; füllt die zweite Hälfte des Balkens
+    function watchProgress() {
+        const none = { headers: {}, close: () => {} };
+        // Ohne EventSource läuft die Konvertierung einfach ohne Fortschrittsanzeige
+        if (!window.EventSource) return none;
+        try {
+            const id = progressId();
+            const events = new EventSource(`${API_ENDPOINTS.CONVERT}/${id}/events`);
+            events.addEventListener('progress', (event) => {
+                const { percent } = JSON.parse(event.data);
+                elements.progressBar.style.width = `${50 + Math.round(percent / 2)}%`;
+            });
+            for (const name of ['ready', 'error']) {
+                events.addEventListener(name, () => events.close());
+            }
+            return { headers: { 'X-Progress-ID': id }, close: () => events.close() };
+        } catch (error) {
+            console.warn('Fortschrittsanzeige nicht verfügbar:', error);
+            return none;
+        }
+    }
+
+    async function uploadInChunks(file, formData, headers) {
+        const { upload, resumeKey } = await startOrResumeUpload(file);
+        const isReceived = (offset) => upload.received.some(
+            ([start, end]) => start <= offset && Math.min(offset + upload.chunk_size, file.size) <= end
+        );
+
+        const offsets = [];
+        for (let offset = 0; offset < file.size; offset += upload.chunk_size) {
+            if (!isReceived(offset)) offsets.push(offset);
+        }
+
+        // Chunks parallel hochladen, jeder Worker nimmt sich den nächsten freien Offset
+        const total = Math.ceil(file.size / upload.chunk_size);
+        let done = total - offsets.length;
+        const worker = async () => {
+            while (offsets.length) {
+                await uploadChunk(upload.id, file, offsets.shift(), upload.chunk_size);
+                done++;
+                elements.progressBar.style.width = `${Math.round(done / total * 50)}%`;
+            }
+        };
+        await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
+
+        const response = await fetch(`${API_ENDPOINTS.UPLOADS}/${upload.id}/complete`, {
+            method: 'POST',
+            headers,
+            body: formData
+        });
+        if (response.ok) sessionStorage.removeItem(resumeKey);
+        return response;
+    }
+
     async function convertFile(file) {
         const formData = new FormData();
-        formData.append('file', file);
         formData.append('format', elements.format.value);
 
         if (currentFileType === 'audio') {
@@ -132,12 +264,21 @@ document.addEventListener('DOMContentLoaded', () => {
 
         elements.progress.hidden = false;
         elements.progressBar.style.width = '50%';
+        let progress = null;
 
         try {
-            const response = await fetch(API_ENDPOINTS.CONVERT, {
-                method: 'POST',
-                body: formData
-            });
+            progress = watchProgress();
+            let response;
+            if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+                response = await uploadInChunks(file, formData, progress.headers);
+            } else {
+                formData.append('file', file);
+                response = await fetch(API_ENDPOINTS.CONVERT, {
+                    method: 'POST',
+                    headers: progress.headers,
+                    body: formData
+                });
+            }
 
             if (!response.ok) {
                 const errorData = await response.json();
@@ -155,6 +296,7 @@ document.addEventListener('DOMContentLoaded', () => {
             alert('Fehler bei der Konvertierung: ' + error.message);
             console.error('Error:', error);
         } finally {
+            if (progress) progress.close();
             setTimeout(() => {
                 elements.progress.hidden = true;
                 elements.progressBar.style.width = '0%';
@@ -200,6 +342,36 @@ document.addEventListener('DOMContentLoaded', () => {
         elements.fileSize.textContent = formatFileSize(file.size);
         elements.fileFormat.textContent = file.type.split('/')[1].toUpperCase();
         elements.result.hidden = true;
+        probeFile(file);
+    }
+
+    // Metadaten (Dauer, Abtastrate, Abmessungen) aus den Datei-Headern; große Dateien überspringen
+    async function probeFile(file) {
+        // Der Server liest nur die Header: der Dateianfang und die Größe reichen
+        const formData = new FormData();
+        formData.append('file', file.slice(0, PROBE_BYTES), file.name);
+        formData.append('size', file.size);
+        try {
+            const response = await fetch(API_ENDPOINTS.PROBE, { method: 'POST', body: formData });
+            if (!response.ok || currentFile !== file) return;
+            const info = await response.json();
+
+            const details = [info.codec.toUpperCase()];
+            if (info.kind === 'image') {
+                details.push(`${info.width}×${info.height}`);
+            } else {
+                if (info.duration) {
+                    const seconds = Math.round(info.duration);
+                    details.push(`${Math.floor(seconds / 60)}:${String(seconds % 60).padStart(2, '0')}`);
+                }
+                if (info.sample_rate) details.push(`${info.sample_rate / 1000} kHz`);
+                if (info.channels) details.push(info.channels === 1 ? 'Mono' : info.channels === 2 ? 'Stereo' : `${info.channels} Kanäle`);
+                if (info.bitrate) details.push(`${info.bitrate} kbps`);
+            }
+            elements.fileFormat.textContent = details.join(' · ');
+        } catch (error) {
+            console.warn('Probe fehlgeschlagen:', error);
+        }
     }
 
     // Hole unterstützte Formate vom Server
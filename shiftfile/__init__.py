@@ -0,0 +1 @@
+"""Gemeinsame Konvertierungs-Bausteine für backend/app.py und api/index.py."""
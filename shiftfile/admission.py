@@ -0,0 +1,199 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import ADMISSION_REJECTIONS, QUEUED
+
+# Gewicht der letzten Belegungsdauer im gleitenden Mittel (für Retry-After)
+HOLD_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is over its rate limit or a pool queue is full; carries Retry-After"""
+
+    def __init__(self, message, retry_after, status=429):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status = status
+
+
+class TokenBucket:
+    """Per-client token buckets refilled at ``rate`` tokens per second up to ``burst``"""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Take one token; returns 0 on success, otherwise the seconds until the next token"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                self._prune(now)
+                return 0
+            self._buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # Volle Buckets verhalten sich wie unbekannte Clients und können weg
+        if len(self._buckets) <= self.max_clients:
+            return
+        full = now - self.burst / self.rate
+        self._buckets = {client: state for client, state in self._buckets.items() if state[1] > full}
+
+
+class ConversionPool:
+    """Bounded slots for one kind of work, with a bounded wait queue in front.
+
+    Ist der Pool voll, warten höchstens ``max_queue`` Anfragen bis zu
+    ``queue_timeout`` Sekunden auf einen Platz; alle weiteren werden sofort
+    abgewiesen. Retry-After schätzt die Wartezeit aus der mittleren
+    Belegungsdauer.
+    """
+
+    def __init__(self, name, max_active, max_queue, queue_timeout):
+        self.name = name
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.mean_hold = 1.0
+        self._condition = threading.Condition()
+
+    def retry_after(self):
+        return self.mean_hold * (self.waiting + 1) / self.max_active
+
+    def acquire(self):
+        """Wait for a free slot; returns the acquisition time for release()"""
+        with self._condition:
+            if self.active >= self.max_active and self.waiting >= self.max_queue:
+                ADMISSION_REJECTIONS.inc(pool=self.name, reason='queue')
+                raise AdmissionRejected('Zu viele Konvertierungen, bitte später erneut versuchen',
+                                        self.retry_after())
+            self.waiting += 1
+            QUEUED.inc(pool=self.name)
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        ADMISSION_REJECTIONS.inc(pool=self.name, reason='timeout')
+                        raise AdmissionRejected('Zeitüberschreitung in der Warteschlange', self.retry_after())
+                    self._condition.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+                QUEUED.dec(pool=self.name)
+        return time.monotonic()
+
+    def try_acquire(self):
+        """Take a free slot without waiting; None if the pool is full or others are waiting"""
+        with self._condition:
+            if self.active >= self.max_active or self.waiting:
+                return None
+            self.active += 1
+        return time.monotonic()
+
+    def release(self, acquired=None):
+        with self._condition:
+            self.active -= 1
+            if acquired is not None:
+                held = time.monotonic() - acquired
+                self.mean_hold += HOLD_SMOOTHING * (held - self.mean_hold)
+            self._condition.notify()
+
+    def stats(self):
+        return {'active': self.active, 'waiting': self.waiting, 'max_active': self.max_active,
+                'max_queue': self.max_queue}
+
+
+class AdmissionController:
+    """Rate limits clients and schedules conversions into the image and audio pools.
+
+    Jede Konvertierung braucht einen Platz in ihrem Pool und im globalen
+    Pool. Audio belegt höchstens ``audio_active`` der ``max_active`` Plätze,
+    sodass kurze Bildkonvertierungen auch bei Audio-Last sofort laufen.
+    """
+
+    def __init__(self, max_active=6, image_active=5, audio_active=2, image_queue=16, audio_queue=4,
+                 queue_timeout=30, rate=2.0, burst=10):
+        self.total = ConversionPool('total', max_active, image_queue + audio_queue, queue_timeout)
+        self.pools = {
+            'image': ConversionPool('image', image_active, image_queue, queue_timeout),
+            'audio': ConversionPool('audio', audio_active, audio_queue, queue_timeout),
+        }
+        self.buckets = TokenBucket(rate, burst) if rate > 0 else None
+
+    def check_rate(self, client):
+        """Raise AdmissionRejected if ``client`` has used up its token bucket"""
+        if self.buckets is None:
+            return
+        wait = self.buckets.take(client)
+        if wait:
+            ADMISSION_REJECTIONS.inc(pool='client', reason='rate')
+            raise AdmissionRejected('Zu viele Anfragen, bitte später erneut versuchen', wait)
+
+    def acquire(self, kind):
+        """Take a slot in the ``kind`` pool and the global pool; returns a ticket for release()"""
+        pool = self.pools[kind]
+        acquired = pool.acquire()
+        try:
+            total_acquired = self.total.acquire()
+        except AdmissionRejected:
+            pool.release()
+            raise
+        return kind, acquired, total_acquired
+
+    def acquire_up_to(self, kind, count):
+        """Take one slot like acquire() plus up to ``count - 1`` that are free right now; returns the tickets
+
+        Für Arbeit, die sich auf mehrere Plätze verteilt (Batch): auf den
+        ersten wird gewartet, weitere belegt sie nur, wenn sie gerade frei
+        sind, sodass zwei Batches sich nicht gegenseitig blockieren.
+        """
+        tickets = [self.acquire(kind)]
+        pool = self.pools[kind]
+        while len(tickets) < count:
+            acquired = pool.try_acquire()
+            if acquired is None:
+                break
+            total_acquired = self.total.try_acquire()
+            if total_acquired is None:
+                pool.release()
+                break
+            tickets.append((kind, acquired, total_acquired))
+        return tickets
+
+    def release(self, ticket):
+        kind, acquired, total_acquired = ticket
+        self.total.release(total_acquired)
+        self.pools[kind].release(acquired)
+
+    @contextmanager
+    def slot(self, kind):
+        """Hold a slot in the ``kind`` pool and the global pool while the block runs"""
+        ticket = self.acquire(kind)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in {'total': self.total, **self.pools}.items()}
+
+
+def client_key(request):
+    """Identify the client by its address.
+
+    Ein ungeprüfter Bearer-Token taugt nicht als Schlüssel: mit einem neuen
+    Token pro Anfrage bekäme jeder Client beliebig viele Buckets.
+    """
+    return 'ip:' + (request.remote_addr or 'unknown')
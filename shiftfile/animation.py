@@ -0,0 +1,237 @@
+import PIL
+from PIL import GifImagePlugin, Image, ImageChops, ImageSequence, features
+
+from .progress import report_percent
+
+# Zielformate, die mehrere Frames speichern können
+ANIMATED_FORMATS = {'GIF', 'WEBP'}
+
+# Standard-Framedauer in ms, wenn die Quelle keine angibt
+DEFAULT_DURATION = 100
+
+# Im GIF-Ausgabepalette reservierter Index für transparente Pixel
+TRANSPARENT_INDEX = 255
+
+# Stichprobe für die gemeinsame GIF-Palette: Anzahl Frames und Kantenlänge
+PALETTE_SAMPLES = 16
+PALETTE_TILE = 128
+
+# Pillow-Hauptversionen, deren privater WebPAnimEncoder die in write_webp benutzte Signatur hat
+STREAMING_WEBP_PILLOW = {10}
+
+
+def is_animated(img):
+    return getattr(img, 'is_animated', False) and getattr(img, 'n_frames', 1) > 1
+
+
+def supports_animation(pillow_format):
+    if pillow_format == 'WEBP':
+        return features.check('webp_anim')
+    return pillow_format in ANIMATED_FORMATS
+
+
+def fit_size(size, max_size):
+    """Scale ``size`` down to fit ``max_size`` (width, height; either may be None)"""
+    if not max_size:
+        return size
+    width = max_size[0] or size[0]
+    height = max_size[1] or size[1]
+    if size[0] <= width and size[1] <= height:
+        return size
+    scale = min(width / size[0], height / size[1])
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def has_transparency(img):
+    return (
+        'transparency' in img.info
+        or img.mode in ('RGBA', 'LA', 'PA')
+        or (img.mode == 'P' and 'A' in img.palette.mode)
+    )
+
+
+def iter_frames(img, size=None):
+    """Yield ``(frame, duration_ms)`` one frame at a time.
+
+    ImageSequence dekodiert jeden Frame erst beim Weiterschalten; Pillow
+    setzt ihn dabei bereits auf die volle Leinwand zusammen. Frühere Frames
+    werden nicht aufbewahrt.
+    """
+    default_duration = img.info.get('duration') or DEFAULT_DURATION
+    total = getattr(img, 'n_frames', 1)
+    for index, frame in enumerate(ImageSequence.Iterator(img)):
+        rgba = frame.convert('RGBA')
+        # Pillows WebP-Decoder setzt die Dauer erst beim Laden des Frames
+        duration = frame.info.get('duration') or default_duration
+        if size and rgba.size != size:
+            rgba = rgba.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        yield rgba, duration
+        # Der Encoder hat den Frame übernommen, wenn er den nächsten anfordert
+        report_percent('encode', index + 1, total)
+
+
+def save_animated(img, destination, pillow_format, max_size=None, settings=None):
+    """Convert all frames of an animated image to GIF or WebP with bounded memory"""
+    size = fit_size(img.size, max_size)
+    loop = img.info.get('loop')
+    frames = iter_frames(img, size)
+    if pillow_format == 'GIF':
+        write_gif(frames, destination, size, loop, shared_palette(img), has_transparency(img))
+    else:
+        # WebP zählt 0 als Endlosschleife; GIFs ohne Loop-Block laufen genau einmal
+        write_webp(frames, destination, size, 1 if loop is None else loop, settings or {})
+
+
+def shared_palette(img, samples=PALETTE_SAMPLES, tile=PALETTE_TILE):
+    """Return one palette (flat RGB list) for all output frames.
+
+    Statt jeden Frame einzeln zu quantisieren (wie GIF ``optimize=True``),
+    wird die Palette einmal aus verkleinerten Stichproben-Frames gebildet.
+    NEAREST erhält dabei die exakten Quellfarben, sodass eine GIF-Palette
+    mit höchstens 256 Farben unverändert übernommen wird. Bei Transparenz
+    bleibt Index 255 für transparente Pixel frei.
+    """
+    transparent = has_transparency(img)
+    step = max(1, img.n_frames // samples)
+    tiles = []
+    # Nur die Stichproben-Frames werden angesteuert und umgewandelt
+    for index in range(0, img.n_frames, step)[:samples]:
+        img.seek(index)
+        sample = img.convert('RGBA')
+        sample.thumbnail((tile, tile), Image.Resampling.NEAREST)
+        tiles.append(sample)
+    img.seek(0)
+
+    mosaic = Image.new('RGB', (tile * len(tiles), tile), tiles[0].getpixel((0, 0))[:3])
+    for position, sample in enumerate(tiles):
+        # Transparente Pixel sollen keine Palettenplätze belegen
+        mosaic.paste(sample.convert('RGB'), (position * tile, 0), sample.getchannel('A'))
+    return mosaic.quantize(colors=255 if transparent else 256).getpalette()
+
+
+def _palette_image(colors):
+    palette = Image.new('P', (1, 1))
+    palette.putpalette(colors)
+    return palette
+
+
+def _index_bytes(frame):
+    # Palettenindizes als Graustufen vergleichen, ohne die Palette anzuwenden
+    return Image.frombytes('L', frame.size, frame.tobytes())
+
+
+def write_gif(frames, destination, size, loop, colors, transparent):
+    """Write an animated GIF frame by frame.
+
+    Pillow sammelt bei save_all alle Frames, bevor es schreibt. Hier wird
+    jeder Frame sofort auf die gemeinsame Palette abgebildet und geschrieben;
+    gehalten werden nur der vorige und der noch offene Frame. Ohne
+    Transparenz werden nur die geänderten Bereiche geschrieben.
+    """
+    palette = _palette_image(colors)
+    full_palette = (colors + [0] * 768)[:768]
+    disposal = 2 if transparent else 1
+    extra = {'transparency': TRANSPARENT_INDEX} if transparent else {}
+
+    def to_palette(frame):
+        indexed = frame.convert('RGB').quantize(palette=palette, dither=Image.Dither.NONE)
+        indexed.putpalette(full_palette)
+        if transparent:
+            mask = frame.getchannel('A').point(lambda alpha: 255 if alpha < 128 else 0)
+            indexed.paste(TRANSPARENT_INDEX, mask=mask)
+        return indexed
+
+    def write(fp, frame, duration, bbox):
+        offset = (0, 0)
+        if bbox:
+            frame = frame.crop(bbox)
+            offset = bbox[:2]
+        for chunk in GifImagePlugin.getdata(frame, offset, duration=duration, disposal=disposal, **extra):
+            fp.write(chunk)
+
+    fp = open(destination, 'wb') if isinstance(destination, str) else destination
+    try:
+        pending = None
+        previous = None
+        for frame, duration in frames:
+            indexed = to_palette(frame)
+            if pending is None:
+                info = {'background': 0, **extra}
+                if loop is not None:
+                    info['loop'] = loop
+                header, _ = GifImagePlugin.getheader(indexed, info=info)
+                for chunk in header:
+                    fp.write(chunk)
+                pending = [indexed, duration, None]
+                previous = indexed
+                continue
+
+            bbox = ImageChops.difference(_index_bytes(previous), _index_bytes(indexed)).getbbox()
+            if bbox is None:
+                # Identischer Frame: nur die Anzeigedauer des vorigen verlängern
+                pending[1] += duration
+                continue
+            write(fp, *pending)
+            pending = [indexed, duration, None if transparent else bbox]
+            previous = indexed
+
+        if pending is not None:
+            write(fp, *pending)
+        fp.write(b';')
+    finally:
+        if fp is not destination:
+            fp.close()
+
+
+def streaming_webp():
+    return int(PIL.__version__.split('.')[0]) in STREAMING_WEBP_PILLOW
+
+
+def write_webp(frames, destination, size, loop, settings):
+    """Write an animated WebP frame by frame.
+
+    Entspricht WebPImagePlugin._save_all, nimmt die Frames aber aus einem
+    Iterator entgegen: libwebp hält nur die bereits kodierten Frames. Der
+    Encoder ist privat; mit einer ungeprüften Pillow-Version geht es über
+    das öffentliche save_all, das alle Frames im Speicher sammelt.
+    """
+    lossless = settings.get('lossless', False)
+    quality = settings.get('quality', 80)
+    method = settings.get('method', 0)
+    if not streaming_webp():
+        images, durations = [], []
+        for frame, duration in frames:
+            images.append(frame)
+            durations.append(duration)
+        images[0].save(destination, format='WEBP', save_all=True, append_images=images[1:], duration=durations,
+                       loop=loop, background=(0, 0, 0, 0), lossless=lossless, quality=quality, method=method)
+        return
+
+    from PIL import _webp
+
+    encoder = _webp.WebPAnimEncoder(
+        size[0], size[1],
+        0,  # transparenter Hintergrund
+        loop,
+        False,  # minimize_size
+        9 if lossless else 3,  # kmin, Voreinstellungen wie gif2webp
+        17 if lossless else 5,  # kmax
+        False,  # allow_mixed
+        False,  # verbose
+    )
+
+    timestamp = 0
+    for frame, duration in frames:
+        encoder.add(frame.tobytes('raw', 'RGBA'), round(timestamp), size[0], size[1], 'RGBA',
+                    lossless, quality, method)
+        timestamp += duration
+    encoder.add(None, round(timestamp), 0, 0, '', lossless, quality, 0)
+
+    data = encoder.assemble('', '', '')
+    if data is None:
+        raise OSError('WebP-Encoder hat keine Daten geliefert')
+    if isinstance(destination, str):
+        with open(destination, 'wb') as fp:
+            fp.write(data)
+    else:
+        destination.write(data)
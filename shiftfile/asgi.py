@@ -0,0 +1,239 @@
+"""ASGI-Einstiegspunkt für dieselben Routen, z.B. ``uvicorn --app-dir backend app:asgi_app``.
+
+Unter gunicorn mit Sync-Workern hält jede Anfrage einen Worker fest,
+solange sie dauert, auch wenn sie nur auf einen langsamen Upload oder
+Download wartet. Hier wartet die Event-Loop darauf:
+
+- Der Request-Body wird per ``await receive()`` eingelesen und wie bei
+  SpooledRequest ab SPOOL_MAX_SIZE auf die Platte ausgelagert (die
+  Schreibzugriffe dann in einem Thread). Erst danach bekommt Flask einen
+  Thread; Abbrüche während des Uploads kosten keinen.
+- Die Flask-App selbst (Pillow, FFmpeg, Cache) läuft in einem eigenen
+  Thread-Pool, dessen Größe ASGI_THREADS bestimmt. Pillow und FFmpeg geben
+  den GIL beim Kodieren frei, die Kerne bleiben ausgelastet; wie viele
+  Konvertierungen gleichzeitig laufen, regelt weiterhin die Zulassung.
+- Datei-Antworten laufen über ``wsgi.file_wrapper``: Blöcke werden in einem
+  Thread gelesen und per ``await send()`` geschrieben, sodass ein
+  langsamer Client nur den Socket-Puffer füllt.
+- Fortschritts-Events (ProgressStream) warten auf der Event-Loop; ein
+  Zuhörer mit PROGRESS_STREAM_SECONDS > 0 belegt keinen Thread des Pools.
+
+Kein zusätzliches Paket nötig; gestartet wird mit einem beliebigen
+ASGI-Server (uvicorn, hypercorn, gunicorn mit UvicornWorker).
+"""
+import asyncio
+import contextvars
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from werkzeug.wsgi import FileWrapper
+
+from .progress import ProgressStream
+from .streams import SPOOL_MAX_SIZE, spooled_buffer
+
+logger = logging.getLogger(__name__)
+
+# Blockgröße für Datei-Antworten; werkzeugs 8KB wären ein Thread-Wechsel pro 8KB
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+class AsyncFileWrapper(FileWrapper):
+    """``wsgi.file_wrapper`` whose blocks the bridge reads off the event loop"""
+
+    def __init__(self, file, buffer_size=8192):
+        super().__init__(file, max(buffer_size, FILE_CHUNK_SIZE))
+
+
+def default_threads(config):
+    """Threads for the Flask app: every admitted or queued conversion plus a few for cheap requests.
+
+    Wartende Konvertierungen blockieren ihren Thread in der Zulassung; ohne
+    diese Reserve würden sie /api/health und Downloads aushungern.
+    """
+    return (config['ADMISSION_MAX_ACTIVE'] + config['ADMISSION_IMAGE_QUEUE'] + config['ADMISSION_AUDIO_QUEUE']
+            + (os.cpu_count() or 1))
+
+
+class AsgiBridge:
+    """Serves a Flask app over ASGI; request bodies and responses are awaited, the app runs in a thread pool"""
+
+    def __init__(self, app, threads=None):
+        self.app = app
+        self.config = app.config
+        threads = threads or int(os.getenv('ASGI_THREADS', 0)) or default_threads(app.config)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Nicht unterstützter ASGI-Typ: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.to_thread(self.executor.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _run(self, context, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, context.run, function, *args)
+
+    async def _http(self, scope, receive, send):
+        headers = [(name.decode('latin-1').lower(), value.decode('latin-1')) for name, value in scope['headers']]
+        declared = next((value for name, value in headers if name == 'content-length'), None)
+        max_size = self.config.get('MAX_CONTENT_LENGTH')
+
+        if declared is not None and declared.isdigit() and max_size is not None and int(declared) > max_size:
+            # Flask antwortet mit 413 anhand von CONTENT_LENGTH, ohne den Body zu lesen
+            body, size = io.BytesIO(), int(declared)
+        else:
+            body, size = await self._receive_body(receive, max_size)
+            if body is None:
+                return
+
+        try:
+            environ = self._environ(scope, headers, body, size)
+            await self._respond(environ, send)
+        finally:
+            await asyncio.to_thread(body.close)
+
+    async def _receive_body(self, receive, max_size):
+        """Read the request body; returns ``(buffer, size)`` or ``(None, 0)`` if the client went away"""
+        spool_size = self.config.get('SPOOL_MAX_SIZE', SPOOL_MAX_SIZE)
+        body = spooled_buffer(self.config.get('SPOOL_DIR'), spool_size)
+        size = 0
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    logger.info('Client hat die Verbindung während des Uploads getrennt')
+                    await asyncio.to_thread(body.close)
+                    return None, 0
+                chunk = message.get('body', b'')
+                if chunk:
+                    if size + len(chunk) > spool_size:
+                        # Ab hier schreibt der Puffer in eine Datei
+                        await asyncio.to_thread(body.write, chunk)
+                    else:
+                        body.write(chunk)
+                    size += len(chunk)
+                if not message.get('more_body', False):
+                    break
+                if max_size is not None and size > max_size:
+                    # Chunked ohne Content-Length: Flask meldet 413 anhand der gelesenen Größe
+                    break
+        except BaseException:
+            await asyncio.to_thread(body.close)
+            raise
+        body.seek(0)
+        return body, size
+
+    def _environ(self, scope, headers, body, size):
+        root_path = scope.get('root_path', '')
+        path = scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'CONTENT_LENGTH': str(size),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'wsgi.file_wrapper': AsyncFileWrapper,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+        for name, value in headers:
+            if name == 'content-length':
+                continue
+            key = 'CONTENT_TYPE' if name == 'content-type' else f"HTTP_{name.upper().replace('-', '_')}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    async def _respond(self, environ, send):
+        started = {}
+        # Ein Kontext pro Anfrage für App-Aufruf, alle Blöcke und close(): stream_with_context braucht
+        # den Request-Kontext beim Weiterlaufen, Korrelations-ID und Fortschrittskanal überleben die Anfrage nicht
+        context = contextvars.copy_context()
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in response_headers]
+            return lambda data: started.setdefault('written', []).append(data)
+
+        def call_app():
+            result = self.app(environ, start_response)
+            iterator = iter(result)
+            first = None
+            if 'status' not in started:
+                # Ein Generator ruft start_response erst beim ersten Block auf
+                first = next(iterator, b'')
+            return result, iterator, first
+
+        try:
+            result, iterator, first = await self._run(context, call_app)
+        except Exception:
+            logger.exception('Fehler in der WSGI-App')
+            await send({'type': 'http.response.start', 'status': 500,
+                        'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+            await send({'type': 'http.response.body', 'body': b'Internal Server Error'})
+            return
+
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            for data in started.get('written', ()):
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            if first:
+                await send({'type': 'http.response.body', 'body': first, 'more_body': True})
+            if isinstance(result, (list, tuple)):
+                for data in iterator:
+                    await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            elif isinstance(result, ProgressStream):
+                async for data in result:
+                    await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            else:
+                # Dateien liest ein I/O-Thread; Generatoren (ZIP, SSE) arbeiten im Pool der App
+                if isinstance(result, AsyncFileWrapper):
+                    read = partial(asyncio.to_thread, context.run)
+                else:
+                    read = partial(self._run, context)
+                while True:
+                    data = await read(next, iterator, None)
+                    if data is None:
+                        break
+                    if data:
+                        await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                # Schließt u.a. _DeleteOnClose und entfernt damit die Ausgabedatei
+                await asyncio.to_thread(context.run, result.close)
+
+
+def to_asgi(app, threads=None):
+    """Wrap a Flask app created by create_app() for an ASGI server"""
+    return AsgiBridge(app, threads)
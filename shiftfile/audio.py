@@ -0,0 +1,590 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from .effects import use_numpy
+from .metrics import stage
+from .probe import parse_ffmpeg_info, probe_audio_header
+from .progress import current as progress_channel
+
+logger = logging.getLogger(__name__)
+
+# Zielformat -> (ffmpeg-Muxer, Audio-Codec, verlustbehaftet)
+FFMPEG_FORMATS = {
+    'mp3': ('mp3', 'libmp3lame', True),
+    'wav': ('wav', 'pcm_s16le', False),
+    'ogg': ('ogg', 'libvorbis', True),
+    'flac': ('flac', 'flac', False),
+    'm4a': ('ipod', 'aac', True),
+    'aac': ('adts', 'aac', True),
+    'wma': ('asf', 'wmav2', True),
+}
+
+DEFAULT_AUDIO_SETTINGS = {
+    'bitrate': '192',
+    'normalize': False,
+    'channels': 2,
+    'volume': 0.0,
+    'fade_in': 0.0,
+    'fade_out': 0.0,
+    'speed': 1.0,
+}
+
+# Zielformat -> (Container, Codec) laut Probe, bei denen nicht neu kodiert werden muss
+PASSTHROUGH_STREAMS = {
+    'mp3': ('mp3', 'mp3'),
+    'wav': ('wav', 'pcm_s16le'),
+    'ogg': ('ogg', 'vorbis'),
+    'flac': ('flac', 'flac'),
+    'm4a': ('mp4', 'aac'),
+    'aac': ('adts', 'aac'),
+    'wma': ('asf', 'wmav2'),
+}
+
+# Spielraum für VBR-Quellen, deren mittlere Bitrate knapp über der angeforderten liegt
+BITRATE_TOLERANCE = 1.05
+
+# Container, die ffmpeg nicht zuverlässig aus einer Pipe lesen kann (moov-Atom am Ende)
+PIPE_UNSAFE_INPUTS = {'m4a', 'mp4'}
+
+PIPE_CHUNK_SIZE = 256 * 1024
+
+
+class AudioEngineError(Exception):
+    """Raised when an audio engine is unavailable or a conversion fails"""
+
+
+def parse_audio_settings(form):
+    """Resolve engine-neutral audio settings from a request form"""
+    return {
+        'bitrate': str(form.get('bitrate') or '192').rstrip('kK'),
+        'normalize': str(form.get('normalize', 'false')).lower() == 'true',
+        'channels': 1 if str(form.get('mono', 'false')).lower() == 'true' else 2,
+        'volume': float(form.get('volume', 0)),
+        'fade_in': float(form.get('fadeIn', 0)),
+        'fade_out': float(form.get('fadeOut', 0)),
+        'speed': float(form.get('speed') or 1.0),
+    }
+
+
+def passthrough_mode(info, target_format, settings):
+    """Decide whether probed audio can skip the encoder.
+
+    Returns ``'copy'`` if the source already is the target (the bytes are
+    copied), ``'remux'`` if only the container differs (``ffmpeg -c copy``)
+    and None if the audio has to be re-encoded. Lossy sources qualify only
+    up to the requested bitrate; encoding them at a higher one adds
+    generation loss without restoring quality.
+    """
+    if not info or target_format not in PASSTHROUGH_STREAMS:
+        return None
+    settings = {**DEFAULT_AUDIO_SETTINGS, **settings}
+    if settings['volume'] or settings['fade_in'] > 0 or settings['fade_out'] > 0 \
+            or settings['speed'] != 1.0 or settings['normalize']:
+        return None
+    if settings['channels'] == 1 and info['channels'] != 1:
+        return None
+    container, codec = PASSTHROUGH_STREAMS[target_format]
+    if info['codec'] != codec:
+        return None
+    if FFMPEG_FORMATS[target_format][2] and settings.get('bitrate'):
+        try:
+            requested = float(settings['bitrate'])
+        except ValueError:
+            return None
+        if not info['bitrate'] or info['bitrate'] > requested * BITRATE_TOLERANCE:
+            return None
+    return 'copy' if info.get('container') == container else 'remux'
+
+
+def _format_label(path):
+    return os.path.splitext(path)[1].lower().lstrip('.') or 'unknown'
+
+
+# Einmal gefundener FFmpeg-Pfad; jede Engine im Prozess teilt ihn
+_ffmpeg_binary = None
+
+
+def find_ffmpeg(refresh=False):
+    """Locate the ffmpeg binary (FFMPEG_BINARY, PATH, then the Vercel build location).
+
+    Ein Treffer wird für den Prozess gemerkt. Solange nichts gefunden wurde,
+    wird bei jedem Aufruf erneut gesucht, damit ein später nach /tmp/ffmpeg
+    kopiertes Binary noch erkannt wird.
+    """
+    global _ffmpeg_binary
+    if refresh:
+        _ffmpeg_binary = None
+    if _ffmpeg_binary:
+        return _ffmpeg_binary
+
+    candidates = []
+    configured = os.getenv('FFMPEG_BINARY')
+    if configured:
+        # vercel.json setzt FFMPEG_BINARY auf das Verzeichnis /tmp/ffmpeg
+        candidates.append(os.path.join(configured, 'ffmpeg') if os.path.isdir(configured) else configured)
+    candidates.append(shutil.which('ffmpeg'))
+    candidates.append('/tmp/ffmpeg/ffmpeg')
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            _ffmpeg_binary = candidate
+            return candidate
+    return None
+
+
+def output_seconds(duration, settings, copy=False):
+    """Expected output duration in seconds, the 100% mark of ffmpeg's progress"""
+    if not duration:
+        return None
+    return duration if copy else duration / settings['speed']
+
+
+def _read_progress(fd, channel, stage_name, total):
+    # ffmpeg -progress schreibt Blöcke aus key=value-Zeilen; out_time_us ist die bisher erzeugte Ausgabezeit
+    with os.fdopen(fd, 'r', errors='replace') as lines:
+        for line in lines:
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_us' and value.isdigit():
+                channel.percent(stage_name, int(value) / 1_000_000, total)
+            elif key == 'progress' and value == 'end':
+                channel.percent(stage_name, total, total)
+
+
+class FFmpegEngine:
+    """Converts audio locally with an ffmpeg subprocess"""
+
+    name = 'ffmpeg'
+    _duration_pattern = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+    _sample_rate_pattern = re.compile(r'Audio: .*?(\d+) Hz')
+    _time_pattern = re.compile(r'time=(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+    def __init__(self, binary=None, timeout=None):
+        self._binary = binary
+        self.timeout = timeout or int(os.getenv('FFMPEG_TIMEOUT', 300))
+
+    @property
+    def binary(self):
+        # Erst beim ersten Gebrauch suchen, nicht beim Import der App
+        return self._binary or find_ffmpeg()
+
+    def available(self):
+        return self.binary is not None
+
+    def unavailable_reason(self):
+        return 'FFmpeg nicht gefunden'
+
+    @staticmethod
+    def _seconds(match):
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def _parse_info(self, stderr):
+        info = {'duration': None, 'sample_rate': None}
+        match = self._duration_pattern.search(stderr)
+        if match:
+            info['duration'] = self._seconds(match)
+        match = self._sample_rate_pattern.search(stderr)
+        if match:
+            info['sample_rate'] = int(match.group(1))
+        return info
+
+    @staticmethod
+    def _header_info(source, need_duration):
+        # Reiner Header-Parser ohne Subprozess; geschätzte Dauern (MP3 ohne Xing, ADTS) reichen nicht für fadeOut
+        header = probe_audio_header(source)
+        if not header or not header['sample_rate']:
+            return None
+        if need_duration and (not header['duration'] or header['duration_estimated']):
+            return None
+        return {'duration': header['duration'], 'sample_rate': header['sample_rate']}
+
+    def probe(self, input_path, need_duration=True):
+        """Read duration (seconds) and sample rate from the container header"""
+        with open(input_path, 'rb') as source:
+            info = self._header_info(source, need_duration)
+        if info:
+            return info
+        result = subprocess.run(
+            [self.binary, '-hide_banner', '-i', input_path],
+            capture_output=True, text=True, timeout=self.timeout
+        )
+        return self._parse_info(result.stderr)
+
+    def probe_stream(self, source, need_duration=False):
+        """Probe a seekable stream through stdin and rewind it.
+
+        Liefert der Header keine Dauer (z.B. MP3 ohne Xing-Tag aus einer
+        Pipe), wird der Stream einmal ohne Ausgabe dekodiert und die Dauer
+        aus der letzten Fortschrittszeile gelesen; der Speicher bleibt flach.
+        """
+        info = self._header_info(source, need_duration)
+        if info:
+            return info
+        stderr = self._run_pipe([self.binary, '-hide_banner', '-i', 'pipe:0'], source, None, check=False)
+        info = self._parse_info(stderr)
+        if need_duration and not info['duration']:
+            stderr = self._run_pipe(
+                [self.binary, '-hide_banner', '-i', 'pipe:0', '-vn', '-f', 'null', '-'],
+                source, None, check=False
+            )
+            matches = list(self._time_pattern.finditer(stderr))
+            if matches:
+                info['duration'] = self._seconds(matches[-1])
+        return info
+
+    def describe_stream(self, source):
+        """Full probe metadata (codec, channels, bitrate, ...) via ``ffmpeg -i`` on stdin"""
+        return parse_ffmpeg_info(
+            self._run_pipe([self.binary, '-hide_banner', '-i', 'pipe:0'], source, None, check=False)
+        )
+
+    def passthrough(self, source, target_format, settings, info=None):
+        """Probe a seekable stream (unless ``info`` is given) and return its passthrough_mode()"""
+        if target_format not in PASSTHROUGH_STREAMS:
+            return None
+        info = info or probe_audio_header(source)
+        if info is None and PASSTHROUGH_STREAMS[target_format][0] == 'asf':
+            # Für ASF/WMA gibt es keinen Header-Parser
+            info = self.describe_stream(source)
+        return passthrough_mode(info, target_format, settings)
+
+    def _run_pipe(self, command, source, destination, check=True, progress=None):
+        """Run ffmpeg with ``source`` on stdin and stdout copied into ``destination``.
+
+        ``progress`` ist ``(stage, Sekunden)``: Fordert der Client Fortschritt
+        an, meldet ffmpeg über eine eigene Pipe (``-progress pipe:N``) die
+        erzeugte Ausgabezeit, daraus werden Prozente.
+        """
+        if source is not None:
+            source.seek(0)
+        channel = progress_channel.get()
+        progress_fd = None
+        if channel is not None and progress and progress[1]:
+            progress_fd, write_fd = os.pipe()
+            command = [command[0], '-progress', f'pipe:{write_fd}', '-nostats', *command[1:]]
+
+        def feed(stdin):
+            try:
+                shutil.copyfileobj(source, stdin, PIPE_CHUNK_SIZE)
+            except (BrokenPipeError, ValueError):
+                # ffmpeg hat genug gelesen (z.B. beim Proben) und die Pipe geschlossen
+                pass
+            finally:
+                try:
+                    stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                process = subprocess.Popen(
+                    command,
+                    stdin=subprocess.PIPE if source is not None else subprocess.DEVNULL,
+                    stdout=subprocess.PIPE if destination is not None else subprocess.DEVNULL,
+                    stderr=stderr,
+                    pass_fds=(write_fd,) if progress_fd is not None else ()
+                )
+            except OSError:
+                if progress_fd is not None:
+                    os.close(progress_fd)
+                raise
+            finally:
+                if progress_fd is not None:
+                    # Das Schreibende gehört jetzt ffmpeg; sonst sähe der Leser nie das Dateiende
+                    os.close(write_fd)
+            reader = None
+            if progress_fd is not None:
+                reader = threading.Thread(target=_read_progress, args=(progress_fd, channel, *progress), daemon=True)
+                reader.start()
+            writer = None
+            if source is not None:
+                writer = threading.Thread(target=feed, args=(process.stdin,), daemon=True)
+                writer.start()
+            try:
+                if destination is not None:
+                    shutil.copyfileobj(process.stdout, destination, PIPE_CHUNK_SIZE)
+                process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise AudioEngineError('Zeitüberschreitung bei der FFmpeg-Konvertierung')
+            finally:
+                if writer is not None:
+                    writer.join()
+                    source.seek(0)
+                if reader is not None:
+                    reader.join()
+            stderr.seek(0)
+            output = stderr.read().decode('utf-8', errors='replace')
+        if check and process.returncode != 0:
+            raise AudioEngineError(f'FFmpeg-Fehler: {output.strip()[-500:]}')
+        return output
+
+    @staticmethod
+    def needs_probe(settings):
+        return settings['fade_out'] > 0 or settings['normalize'] or settings['speed'] != 1.0
+
+    def build_filters(self, settings, duration=None, sample_rate=None):
+        """Translate the effect settings into a single ffmpeg filter chain"""
+        filters = []
+        sample_rate = sample_rate or 44100
+        speed = settings['speed']
+        if settings['volume']:
+            filters.append(f"volume={settings['volume']}dB")
+        if speed != 1.0:
+            # Wie pydub: schneller abspielen inkl. Tonhöhe, dann zurück auf die Quellrate
+            filters.append(f"asetrate={int(sample_rate * speed)}")
+            filters.append(f"aresample={sample_rate}")
+        if settings['fade_in'] > 0:
+            filters.append(f"afade=t=in:st=0:d={settings['fade_in']}")
+        if settings['fade_out'] > 0 and duration:
+            start = max(duration / speed - settings['fade_out'], 0)
+            filters.append(f"afade=t=out:st={start}:d={settings['fade_out']}")
+        if settings['normalize']:
+            # loudnorm rechnet intern mit 192kHz, danach zurück auf die Quellrate
+            filters.append('loudnorm')
+            filters.append(f"aresample={sample_rate}")
+        return filters
+
+    def build_command(self, input_path, output_path, target_format, settings, duration=None, sample_rate=None,
+                      copy=False, input_args=()):
+        muxer, codec, lossy = FFMPEG_FORMATS[target_format]
+        command = [self.binary, '-hide_banner', '-loglevel', 'error', '-y', *input_args, '-i', input_path, '-vn']
+        if copy:
+            # Nur der Container wechselt, die Audiopakete werden unverändert übernommen
+            command += ['-c:a', 'copy']
+            if muxer == 'ipod':
+                # ADTS-Header entfernen; bei fragmentierter Ausgabe fügt ffmpeg den Filter nicht selbst ein
+                command += ['-bsf:a', 'aac_adtstoasc']
+        else:
+            filters = self.build_filters(settings, duration, sample_rate)
+            if filters:
+                command += ['-af', ','.join(filters)]
+            if settings['channels'] == 1:
+                command += ['-ac', '1']
+            command += ['-c:a', codec]
+            if lossy and settings.get('bitrate'):
+                command += ['-b:a', f"{settings['bitrate']}k"]
+        if output_path == 'pipe:1' and muxer == 'ipod':
+            # MP4 braucht sonst eine seekbare Ausgabe für das moov-Atom
+            command += ['-movflags', 'frag_keyframe+empty_moov']
+        command += ['-f', muxer, output_path]
+        return command
+
+    def apply_effects_in_numpy(self, input_path, source, output_path, destination, target_format, settings, header,
+                               label=None):
+        """Decode to float PCM, run the effect chain in NumPy and encode the result.
+
+        ``input_path`` ist eine Datei oder ``pipe:0`` mit ``source`` als
+        Eingabe, ``output_path`` eine Datei oder ``pipe:1`` mit ``destination``.
+        """
+        from .effects import ArrayReader, PCMBuffer, apply_effects, pcm_bytes
+
+        label = label or _format_label(input_path)
+        rate, channels = header['sample_rate'], header['channels']
+        pcm = PCMBuffer(pcm_bytes(header))
+        with stage('decode', label, target_format):
+            self._run_pipe([self.binary, '-hide_banner', '-loglevel', 'error', '-i', input_path, '-vn',
+                            '-f', 'f32le', '-ac', str(channels), '-ar', str(rate), 'pipe:1'], source, pcm,
+                           progress=('decode', header.get('duration')))
+        with stage('effects', label, target_format):
+            samples = apply_effects(pcm.samples(channels), rate, settings)
+        # Die Effekte sind schon angewendet; FFmpeg kodiert nur noch
+        encode_settings = {**settings, 'volume': 0.0, 'fade_in': 0.0, 'fade_out': 0.0, 'speed': 1.0,
+                           'normalize': False}
+        command = self.build_command('pipe:0', output_path, target_format, encode_settings,
+                                     input_args=['-f', 'f32le', '-ar', str(rate), '-ac', str(samples.shape[1])])
+        with stage('encode', label, target_format):
+            self._run_pipe(command, ArrayReader(samples), destination, progress=('encode', len(samples) / rate))
+
+    def convert(self, input_path, output_path, target_format, settings):
+        """Convert a file; returns the passthrough mode (``'copy'``/``'remux'``) or None if re-encoded"""
+        if not self.available():
+            raise AudioEngineError(self.unavailable_reason())
+        if target_format not in FFMPEG_FORMATS:
+            raise AudioEngineError(f'Nicht unterstütztes Audioformat: {target_format}')
+        settings = {**DEFAULT_AUDIO_SETTINGS, **settings}
+        source = _format_label(input_path)
+        with open(input_path, 'rb') as input_file:
+            header = probe_audio_header(input_file)
+            mode = self.passthrough(input_file, target_format, settings, header)
+        if mode == 'copy':
+            with stage('copy', source, target_format):
+                shutil.copyfile(input_path, output_path)
+            return mode
+        if mode is None and use_numpy(settings, header):
+            self.apply_effects_in_numpy(input_path, None, output_path, None, target_format, settings, header)
+            return None
+
+        info = {}
+        if mode is None and self.needs_probe(settings):
+            with stage('probe', source, target_format):
+                info = self.probe(input_path, need_duration=settings['fade_out'] > 0)
+        command = self.build_command(input_path, output_path, target_format, settings, copy=mode == 'remux',
+                                     **info)
+        duration = output_seconds(info.get('duration') or (header or {}).get('duration'), settings, mode == 'remux')
+        with stage(mode or 'transcode', source, target_format):
+            self._run_pipe(command, None, None, progress=('encode', duration))
+        return mode
+
+    def convert_stream(self, source, destination, target_format, settings, input_format=None):
+        """Transcode a seekable stream in one ffmpeg pass from stdin to stdout.
+
+        Im Gegensatz zu pydub wird das Audio nie vollständig als PCM im
+        Speicher gehalten; alle Effekte laufen in einem Filtergraphen.
+        Gibt wie convert() den Passthrough-Modus zurück.
+        """
+        if not self.available():
+            raise AudioEngineError(self.unavailable_reason())
+        if target_format not in FFMPEG_FORMATS:
+            raise AudioEngineError(f'Nicht unterstütztes Audioformat: {target_format}')
+        settings = {**DEFAULT_AUDIO_SETTINGS, **settings}
+        header = probe_audio_header(source)
+        mode = self.passthrough(source, target_format, settings, header)
+        if mode == 'copy':
+            with stage('copy', input_format, target_format):
+                source.seek(0)
+                shutil.copyfileobj(source, destination, PIPE_CHUNK_SIZE)
+                source.seek(0)
+            return mode
+        numpy_effects = mode is None and use_numpy(settings, header)
+
+        if input_format in PIPE_UNSAFE_INPUTS:
+            # MP4-Container lassen sich nur mit seekbarer Eingabe sicher lesen
+            with tempfile.NamedTemporaryFile(suffix=f'.{input_format}') as input_file:
+                shutil.copyfileobj(source, input_file, PIPE_CHUNK_SIZE)
+                input_file.flush()
+                source.seek(0)
+                if numpy_effects:
+                    self.apply_effects_in_numpy(input_file.name, None, 'pipe:1', destination, target_format,
+                                                settings, header, label=input_format)
+                    return None
+                info = {}
+                if mode is None and self.needs_probe(settings):
+                    with stage('probe', input_format, target_format):
+                        info = self.probe(input_file.name, need_duration=settings['fade_out'] > 0)
+                command = self.build_command(input_file.name, 'pipe:1', target_format, settings,
+                                             copy=mode == 'remux', **info)
+                duration = output_seconds(info.get('duration') or (header or {}).get('duration'), settings,
+                                          mode == 'remux')
+                with stage(mode or 'transcode', input_format, target_format):
+                    self._run_pipe(command, None, destination, progress=('encode', duration))
+            return mode
+
+        if numpy_effects:
+            self.apply_effects_in_numpy('pipe:0', source, 'pipe:1', destination, target_format, settings, header,
+                                        label=input_format)
+            return None
+        info = {}
+        if mode is None and self.needs_probe(settings):
+            with stage('probe', input_format, target_format):
+                info = self.probe_stream(source, need_duration=settings['fade_out'] > 0)
+        command = self.build_command('pipe:0', 'pipe:1', target_format, settings, copy=mode == 'remux', **info)
+        duration = output_seconds(info.get('duration') or (header or {}).get('duration'), settings, mode == 'remux')
+        with stage(mode or 'transcode', input_format, target_format):
+            self._run_pipe(command, source, destination, progress=('encode', duration))
+        return mode
+
+
+class CloudConvertEngine:
+    """Converts audio through the CloudConvert API (upload, wait, download).
+
+    Gleichzeitige Konvertierungen werden zu einem Job gebündelt, siehe
+    shiftfile.cloudconvert_client. Der Client wird erst bei der ersten
+    Konvertierung gebaut, damit requests den Import nicht verlangsamt.
+    """
+
+    name = 'cloudconvert'
+
+    def __init__(self, api_key=None, api_url=None, webhook_url=None, webhook_secret=None):
+        self.api_key = api_key or os.getenv('CLOUDCONVERT_API_KEY')
+        self.api_url = api_url or os.getenv('CLOUDCONVERT_API_URL')
+        self.webhook_url = webhook_url or os.getenv('CLOUDCONVERT_WEBHOOK_URL')
+        self.webhook_secret = webhook_secret or os.getenv('CLOUDCONVERT_WEBHOOK_SECRET')
+        self.batch_window = int(os.getenv('CLOUDCONVERT_BATCH_WINDOW_MS', 50)) / 1000
+        self.max_batch = int(os.getenv('CLOUDCONVERT_MAX_BATCH', 10))
+        self.pool_size = int(os.getenv('CLOUDCONVERT_POOL_SIZE', 10))
+        self._batcher = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        return bool(self.api_key)
+
+    def unavailable_reason(self):
+        return 'CloudConvert API-Key nicht konfiguriert'
+
+    def _get_batcher(self):
+        with self._lock:
+            if self._batcher is None:
+                from .cloudconvert_client import CloudConvertBatcher, CloudConvertClient
+                client = CloudConvertClient(self.api_key, self.api_url, pool_size=self.pool_size,
+                                            webhook_url=self.webhook_url)
+                self._batcher = CloudConvertBatcher(client, window=self.batch_window, max_batch=self.max_batch,
+                                                    transfers=self.pool_size)
+            return self._batcher
+
+    def convert(self, input_path, output_path, target_format, settings):
+        if not self.available():
+            raise AudioEngineError(self.unavailable_reason())
+        settings = {**DEFAULT_AUDIO_SETTINGS, **settings}
+        self._get_batcher().submit(input_path, output_path, target_format, settings).result()
+
+    def notify(self, job_id):
+        """Wake the batch waiting for ``job_id``; returns False if no batch waits for it"""
+        return self._batcher is not None and self._batcher.client.notify(job_id)
+
+
+class FallbackEngine:
+    """Tries the primary engine and falls back to a second one on failure"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def available(self):
+        return self.primary.available() or self.fallback.available()
+
+    def unavailable_reason(self):
+        return f"{self.primary.unavailable_reason()}; {self.fallback.unavailable_reason()}"
+
+    def convert(self, input_path, output_path, target_format, settings):
+        if self.primary.available():
+            try:
+                return self.primary.convert(input_path, output_path, target_format, settings)
+            except Exception as e:
+                if not self.fallback.available():
+                    raise
+                logger.warning(f"{self.primary.name} fehlgeschlagen, nutze {self.fallback.name}: {str(e)}")
+        return self.fallback.convert(input_path, output_path, target_format, settings)
+
+
+def find_engine(engine, name):
+    """Return the engine called ``name``, looking inside a FallbackEngine"""
+    if isinstance(engine, FallbackEngine):
+        return find_engine(engine.primary, name) or find_engine(engine.fallback, name)
+    return engine if getattr(engine, 'name', None) == name else None
+
+
+AUDIO_ENGINES = {
+    FFmpegEngine.name: FFmpegEngine,
+    CloudConvertEngine.name: CloudConvertEngine,
+}
+
+
+def create_audio_engine(name=None, fallback=None):
+    """Build the engine selected via AUDIO_ENGINE and optional AUDIO_FALLBACK_ENGINE"""
+    name = (name or os.getenv('AUDIO_ENGINE') or FFmpegEngine.name).lower()
+    fallback = (fallback if fallback is not None else os.getenv('AUDIO_FALLBACK_ENGINE', '')).lower()
+    if name not in AUDIO_ENGINES:
+        raise ValueError(f'Unbekannte Audio-Engine: {name}')
+    engine = AUDIO_ENGINES[name]()
+    if fallback and fallback != name:
+        if fallback not in AUDIO_ENGINES:
+            raise ValueError(f'Unbekannte Audio-Engine: {fallback}')
+        engine = FallbackEngine(engine, AUDIO_ENGINES[fallback]())
+    return engine
@@ -0,0 +1,163 @@
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from .formats import metric_labels
+from .metrics import CONVERSIONS, collect_stages, record_stages
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', os.cpu_count() or 1))
+# Module, die der Forkserver einmal lädt; die Worker starten dann ohne Importkosten
+WORKER_PRELOAD = ['shiftfile.convert']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared worker pool, created on first use.
+
+    Die Worker entstehen über einen Forkserver (sonst spawn), nicht per fork:
+    der App-Prozess hat dann schon Threads (Logging, Janitor, Jobs), und ein
+    Fork mitten in deren Locks kann hängen bleiben. Der Forkserver lädt nur
+    shiftfile.convert vor statt des Hauptskripts mit seiner App.
+
+    AWS Lambda hat kein /dev/shm, dort schlägt ProcessPoolExecutor fehl und
+    wir fallen auf Threads zurück (Pillow gibt beim Kodieren das GIL frei).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                context = multiprocessing.get_context(method)
+                if method == 'forkserver':
+                    context.set_forkserver_preload(WORKER_PRELOAD)
+                _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=context)
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Kein Prozess-Pool verfügbar, nutze Threads: {str(e)}")
+                _pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+        return _pool
+
+
+def discard_pool(pool):
+    """Drop a broken pool so that the next get_pool() starts new workers"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def convert_bytes(convert, data, target_format):
+    """Run ``convert(source, destination, target_format)`` on in-memory bytes.
+
+    Gibt die Ausgabe und die Stufenzeiten zurück; Zähler in einem
+    Worker-Prozess gingen verloren, verbucht wird in stream_zip().
+    """
+    output = io.BytesIO()
+    with collect_stages() as stages:
+        convert(io.BytesIO(data), output, target_format)
+    return output.getvalue(), stages
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink that hands out what ZipFile wrote since the last pop"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_name(name, used):
+    stem, ext = os.path.splitext(name)
+    candidate, counter = name, 1
+    while candidate in used:
+        candidate = f"{stem}_{counter}{ext}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def stream_zip(convert, uploads, target_format, max_in_flight=None):
+    """Convert ``(name, fileobj)`` pairs in the pool and yield a ZIP archive.
+
+    Es werden höchstens ``max_in_flight`` Dateien gleichzeitig in den Pool
+    gegeben, damit nicht alle Uploads auf einmal im Speicher liegen. Fertige
+    Dateien landen in der Reihenfolge ihrer Fertigstellung im Archiv;
+    Fehler werden in ``errors.json`` gesammelt.
+    """
+    pool = get_pool()
+    max_in_flight = max_in_flight or 2 * BATCH_WORKERS
+    sink = _ZipStream()
+    used_names = set()
+    errors = {}
+    pending = {}
+    uploads = iter(uploads)
+
+    def fail(name, error):
+        logger.error(f"Batch-Konvertierung von {name} fehlgeschlagen: {str(error)}")
+        source, target = metric_labels(name, target_format)
+        CONVERSIONS.inc(source=source, target=target, status='error')
+        errors[name] = str(error)
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        while True:
+            for name, fileobj in uploads:
+                content = fileobj.read()
+                try:
+                    future = pool.submit(convert_bytes, convert, content, target_format)
+                except BrokenProcessPool:
+                    # Ein Worker ist abgestürzt (OOM, Signal): die Datei geht an einen neuen Pool
+                    discard_pool(pool)
+                    pool = get_pool()
+                    future = pool.submit(convert_bytes, convert, content, target_format)
+                pending[future] = name, pool
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, used_pool = pending.pop(future)
+                try:
+                    data, stages = future.result()
+                except BrokenProcessPool as e:
+                    # Alle Dateien im kaputten Pool scheitern, die übrigen gehen an einen neuen
+                    fail(name, e)
+                    if used_pool is pool:
+                        discard_pool(pool)
+                        pool = get_pool()
+                    continue
+                except Exception as e:
+                    fail(name, e)
+                    continue
+                record_stages(stages)
+                source, target = metric_labels(name, target_format)
+                CONVERSIONS.inc(source=source, target=target, status='success')
+                output_name = f"{os.path.splitext(name)[0]}.{target_format}"
+                archive.writestr(unique_name(output_name, used_names), data)
+            yield sink.pop()
+
+        if errors:
+            archive.writestr('errors.json', json.dumps(errors, indent=2))
+    yield sink.pop()
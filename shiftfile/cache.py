@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+from .streams import copy_buffer
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream):
+    """Return the sha256 hex digest of a seekable stream and rewind it"""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file on disk"""
+    with open(path, 'rb') as f:
+        return hash_stream(f)
+
+
+class ConversionCache:
+    """Content-addressed LRU cache for converted files on disk.
+
+    Einträge werden über sha256(Eingabe) + Zielformat + aufgelöste
+    Einstellungen adressiert. Überschreitet der Cache ``max_bytes``, werden
+    die am längsten nicht genutzten Dateien gelöscht.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _load_index(self):
+        # Bereits vorhandene Einträge nach letzter Nutzung (mtime) einsortieren
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._size += size
+        self._evict()
+
+    @staticmethod
+    def make_key(input_digest, target_format, settings=None):
+        payload = json.dumps(
+            {'input': input_digest, 'format': target_format.lower(), 'settings': settings or {}},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _name(key, target_format):
+        return f"{key}.{target_format.lower()}"
+
+    def get(self, key, target_format):
+        """Return the cached file path for ``key`` or None on a miss"""
+        if not self.enabled:
+            return None
+        name = self._name(key, target_format)
+        path = self._path(name)
+        with self._lock:
+            if not os.path.exists(path):
+                # Eintrag wurde extern (z.B. von einem anderen Worker) gelöscht
+                self._discard(name)
+                self.misses += 1
+                return None
+            if name not in self._entries:
+                # Von einem anderen Worker geschrieben
+                size = os.path.getsize(path)
+                self._entries[name] = size
+                self._size += size
+            self._entries.move_to_end(name)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, target_format, source_path):
+        """Copy a converted file into the cache and return its cache path"""
+        if not self.enabled:
+            return None
+        return self._store(key, target_format, os.path.getsize(source_path),
+                           lambda tmp_path: shutil.copyfile(source_path, tmp_path))
+
+    def put_file(self, key, target_format, fileobj):
+        """Copy a converted in-memory/spooled buffer into the cache and rewind it"""
+        if not self.enabled:
+            return None
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(0)
+        return self._store(key, target_format, size, lambda tmp_path: copy_buffer(fileobj, tmp_path))
+
+    def _store(self, key, target_format, size, write):
+        if size > self.max_bytes:
+            return None
+        name = self._name(key, target_format)
+        path = self._path(name)
+        tmp_path = self._path(f".{name}.{uuid.uuid4().hex}")
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Fehler beim Schreiben in den Cache: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        with self._lock:
+            self._discard(name)
+            self._entries[name] = size
+            self._size += size
+            self._evict()
+        return path
+
+    def _discard(self, name):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self, limit=None):
+        limit = self.max_bytes if limit is None else limit
+        while self._size > limit and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Fehler beim Entfernen aus dem Cache: {str(e)}")
+
+    def shrink(self, nbytes):
+        """Evict least recently used entries until ``nbytes`` are freed; returns the freed bytes"""
+        with self._lock:
+            before = self._size
+            self._evict(max(0, self._size - nbytes))
+            return before - self._size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
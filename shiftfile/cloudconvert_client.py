@@ -0,0 +1,300 @@
+"""CloudConvert-API-v2-Client mit Verbindungspool und Sammel-Jobs.
+
+Statt pro Datei einen Job anzulegen, sammelt der CloudConvertBatcher alle
+Konvertierungen, die innerhalb von ``window`` Sekunden eintreffen, in einem
+Job mit je einem import/convert/export-Task pro Datei. Uploads und Downloads
+laufen parallel über eine gemeinsame Keep-Alive-Session; auf das Ende des
+Jobs wird mit wachsendem Intervall gepollt oder per Webhook geweckt.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .audio import AudioEngineError, _format_label
+from .metrics import STAGE_SECONDS, stage
+
+logger = logging.getLogger(__name__)
+
+API_URL = 'https://api.cloudconvert.com/v2'
+
+# Endzustände eines Jobs; alles andere heißt weiter warten
+FINAL_STATUSES = ('finished', 'error')
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class CloudConvertError(AudioEngineError):
+    """Raised when the CloudConvert API rejects a request or a task fails"""
+
+
+def verify_signature(payload, signature, secret):
+    """Check the HMAC-SHA256 ``CloudConvert-Signature`` of a webhook body"""
+    expected = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+def convert_task(input_task, target_format, settings):
+    return {
+        'operation': 'convert',
+        'input': [input_task],
+        'output_format': target_format,
+        'audio_codec': target_format,
+        'audio_bitrate': settings['bitrate'],
+        'audio_normalize': settings['normalize'],
+        'audio_channels': settings['channels'],
+        'volume': settings['volume'],
+        'trim_start': settings['fade_in'],
+        'trim_end': settings['fade_out']
+    }
+
+
+def build_tasks(items):
+    """One import/convert/export chain per item, named by the item's index in the batch"""
+    tasks = {}
+    for index, item in enumerate(items):
+        tasks[f'import-{index}'] = {'operation': 'import/upload'}
+        tasks[f'convert-{index}'] = convert_task(f'import-{index}', item.target_format, item.settings)
+        tasks[f'export-{index}'] = {'operation': 'export/url', 'input': [f'convert-{index}']}
+    return tasks
+
+
+class CloudConvertClient:
+    """Minimal CloudConvert v2 REST client on one pooled keep-alive session"""
+
+    def __init__(self, api_key, api_url=None, pool_size=10, timeout=60, poll_interval=0.5,
+                 max_poll_interval=5.0, wait_timeout=300, webhook_url=None):
+        self.api_url = (api_url or API_URL).rstrip('/')
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.wait_timeout = wait_timeout
+        self.webhook_url = webhook_url
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+        # Wiederholt werden nur idempotente Anfragen (GET) bei Überlast oder Gateway-Fehlern
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._auth = {'Authorization': f'Bearer {api_key}'}
+
+    def _api(self, method, path, **kwargs):
+        response = self.session.request(method, f'{self.api_url}{path}', headers=self._auth,
+                                        timeout=self.timeout, **kwargs)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise CloudConvertError(f'CloudConvert-Fehler {response.status_code}: {message}')
+        return response.json()['data']
+
+    def create_job(self, tasks, tag=None):
+        payload = {'tasks': tasks}
+        if tag:
+            payload['tag'] = tag
+        if self.webhook_url:
+            payload['webhook_url'] = self.webhook_url
+        return self._api('POST', '/jobs', json=payload)
+
+    def get_job(self, job_id):
+        return self._api('GET', f'/jobs/{job_id}')
+
+    def delete_job(self, job_id):
+        response = self.session.delete(f'{self.api_url}/jobs/{job_id}', headers=self._auth, timeout=self.timeout)
+        if response.status_code >= 400 and response.status_code != 404:
+            raise CloudConvertError(f'CloudConvert-Fehler {response.status_code} beim Löschen von Job {job_id}')
+
+    def upload(self, task, path):
+        """Upload a file to an import/upload task; the form URL is not the API host and gets no token"""
+        form = task['result']['form']
+        with open(path, 'rb') as source:
+            response = self.session.post(form['url'], data=form.get('parameters', {}),
+                                         files={'file': (os.path.basename(path), source)}, timeout=self.timeout)
+        if response.status_code >= 400:
+            raise CloudConvertError(f'Upload zu CloudConvert fehlgeschlagen: {response.status_code}')
+
+    def download(self, url, path):
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code >= 400:
+                raise CloudConvertError(f'Download von CloudConvert fehlgeschlagen: {response.status_code}')
+            with open(path, 'wb') as destination:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    destination.write(chunk)
+
+    def wait(self, job_id, timeout=None):
+        """Poll until the job is finished or failed, backing off up to ``max_poll_interval``.
+
+        Mit konfiguriertem Webhook ist das Polling nur Absicherung und läuft
+        gleich im langen Intervall; notify() weckt den Wartenden sofort.
+        """
+        deadline = time.monotonic() + (timeout or self.wait_timeout)
+        interval = self.max_poll_interval if self.webhook_url else self.poll_interval
+        with self._lock:
+            event = self._waiting.setdefault(job_id, threading.Event())
+        try:
+            while True:
+                job = self.get_job(job_id)
+                if job['status'] in FINAL_STATUSES:
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CloudConvertError('Zeitüberschreitung beim Warten auf CloudConvert')
+                event.wait(min(interval, remaining))
+                event.clear()
+                interval = min(interval * 2, self.max_poll_interval)
+        finally:
+            with self._lock:
+                self._waiting.pop(job_id, None)
+
+    def notify(self, job_id):
+        """Wake up wait() for ``job_id`` (called from the webhook route)"""
+        with self._lock:
+            event = self._waiting.get(job_id)
+        if event is not None:
+            event.set()
+        return event is not None
+
+    def close(self):
+        self.session.close()
+
+
+class _Item:
+    __slots__ = ('input_path', 'output_path', 'target_format', 'settings', 'future')
+
+    def __init__(self, input_path, output_path, target_format, settings):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.target_format = target_format
+        self.settings = settings
+        self.future = Future()
+
+
+def _engine_error(error):
+    return error if isinstance(error, AudioEngineError) else CloudConvertError(str(error))
+
+
+def _task_error(tasks, index):
+    for name in (f'import-{index}', f'convert-{index}', f'export-{index}'):
+        task = tasks.get(name)
+        if task and task['status'] == 'error':
+            return CloudConvertError(f"CloudConvert-Task {name} fehlgeschlagen: {task.get('message')}")
+    return CloudConvertError(f'CloudConvert hat für Datei {index} kein Ergebnis geliefert')
+
+
+class CloudConvertBatcher:
+    """Groups conversions that arrive within ``window`` seconds into one CloudConvert job"""
+
+    def __init__(self, client, window=0.05, max_batch=10, max_jobs=4, transfers=8):
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._jobs = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='cloudconvert-job')
+        self._transfers = ThreadPoolExecutor(max_workers=transfers, thread_name_prefix='cloudconvert-io')
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, input_path, output_path, target_format, settings):
+        """Queue one conversion; the returned future resolves once the output file is written"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name='cloudconvert-batcher', daemon=True)
+                self._thread.start()
+        item = _Item(input_path, output_path, target_format, settings)
+        self._queue.put(item)
+        return item.future
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._jobs.submit(self._run, batch)
+
+    def _observe(self, name, seconds, batch):
+        for item in batch:
+            STAGE_SECONDS.observe(seconds, stage=name, source=_format_label(item.input_path),
+                                  target=item.target_format)
+
+    def _upload(self, task, item):
+        with stage('cloudconvert_upload', _format_label(item.input_path), item.target_format):
+            self.client.upload(task, item.input_path)
+
+    def _download(self, tasks, index, item):
+        export = tasks.get(f'export-{index}')
+        if not export or export['status'] != 'finished':
+            raise _task_error(tasks, index)
+        with stage('cloudconvert_download', _format_label(item.input_path), item.target_format):
+            self.client.download(export['result']['files'][0]['url'], item.output_path)
+
+    def _fail(self, batch, error):
+        for item in batch:
+            item.future.set_exception(_engine_error(error))
+
+    def _run(self, batch):
+        try:
+            logger.info(f"CloudConvert-Job mit {len(batch)} Dateien")
+            job = self.client.create_job(build_tasks(batch), tag='shiftfile')
+            tasks = {task['name']: task for task in job['tasks']}
+            uploads = [self._transfers.submit(self._upload, tasks[f'import-{index}'], item)
+                       for index, item in enumerate(batch)]
+        except Exception as e:
+            self._fail(batch, e)
+            return
+
+        uploaded = []
+        for item, upload in zip(batch, uploads):
+            try:
+                upload.result()
+            except Exception as e:
+                # Ein fehlgeschlagener Upload betrifft nur seine eigene Datei
+                logger.warning(f"Upload von {os.path.basename(item.input_path)} fehlgeschlagen: {str(e)}")
+                item.future.set_exception(_engine_error(e))
+            else:
+                uploaded.append(item)
+        if len(uploaded) < len(batch):
+            # Der offene Import hielte den Job für immer auf: verwerfen und die übrigen Dateien neu einreichen
+            try:
+                self.client.delete_job(job['id'])
+            except Exception as e:
+                logger.warning(f"CloudConvert-Job {job['id']} nicht gelöscht: {str(e)}")
+            if uploaded:
+                self._run(uploaded)
+            return
+
+        try:
+            start = time.perf_counter()
+            job = self.client.wait(job['id'])
+            self._observe('cloudconvert_wait', time.perf_counter() - start, batch)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+
+        tasks = {task['name']: task for task in job['tasks']}
+        downloads = [self._transfers.submit(self._download, tasks, index, item) for index, item in enumerate(batch)]
+        for item, download in zip(batch, downloads):
+            try:
+                download.result()
+            except Exception as e:
+                item.future.set_exception(_engine_error(e))
+            else:
+                item.future.set_result(None)
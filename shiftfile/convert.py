@@ -0,0 +1,183 @@
+"""Konvertierungskern: Bilder über Pillow, Audio über die konfigurierte Engine.
+
+Pillow wird erst bei der ersten Bildkonvertierung importiert, damit Anfragen
+wie /api/formats oder /api/health den Kaltstart nicht bezahlen.
+"""
+import os
+import shutil
+
+from .formats import FORMAT_MAPPING
+from .images import DEFAULT_PROFILE, encoder_settings, largest_icon_size, shrink_to_bounds, shrink_to_cover
+from .metrics import stage
+from .progress import report_percent
+from .tiles import band_height, band_writer, can_read_bands, exceeds_budget, open_image, read_bands, shrink_in_bands
+
+# Format-spezifische Einstellungen; Qualität/Kompression kommen aus ENCODER_PROFILES
+IMAGE_QUALITY_SETTINGS = {
+    'BMP': {},
+    'ICO': {'sizes': [(16, 16), (32, 32), (48, 48), (64, 64)]}
+}
+
+# Modi, die der jeweilige Encoder schreiben kann, und der Ersatz für alle anderen
+ENCODER_MODES = {
+    'JPEG': ({'L', 'RGB', 'CMYK'}, 'RGB'),
+    'PNG': ({'1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA'}, 'RGBA'),
+    'BMP': ({'1', 'L', 'P', 'RGB', 'RGBA'}, 'RGBA'),
+}
+
+# Profile, bei denen eine Quelle im Zielformat unverändert übernommen wird; 'smallest' soll neu komprimieren
+PASSTHROUGH_PROFILES = {'fast', 'balanced'}
+
+
+def image_settings(target_format, profile=DEFAULT_PROFILE):
+    """Return the save() keyword arguments for a target extension and profile"""
+    pillow_format = FORMAT_MAPPING[target_format]
+    return encoder_settings(pillow_format, profile, IMAGE_QUALITY_SETTINGS.get(pillow_format))
+
+
+def prepare_mode(img, pillow_format):
+    """Convert ``img`` to a mode the target encoder can write"""
+    from PIL import Image
+
+    if pillow_format == 'JPEG' and (img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info):
+        # Transparenz auf weißen Hintergrund legen
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+
+    supported = ENCODER_MODES.get(pillow_format)
+    if supported and img.mode not in supported[0]:
+        return img.convert(supported[1])
+    return img
+
+
+def can_copy_image(img, pillow_format, max_size=None, profile=DEFAULT_PROFILE):
+    """True if ``img`` already is in the target format and needs neither resizing nor recompression"""
+    if img.format != pillow_format or profile not in PASSTHROUGH_PROFILES:
+        return False
+    if pillow_format == 'ICO':
+        # ICO wird immer mit den festen Größen aus IMAGE_QUALITY_SETTINGS neu geschrieben
+        return False
+    if max_size:
+        width, height = max_size
+        if (width and img.width > width) or (height and img.height > height):
+            return False
+    return True
+
+
+def copy_image(source, destination):
+    """Copy the source bytes unchanged; source and destination may be paths or file objects"""
+    if isinstance(source, (str, os.PathLike)):
+        if isinstance(destination, (str, os.PathLike)):
+            shutil.copyfile(source, destination)
+            return
+        with open(source, 'rb') as source_file:
+            shutil.copyfileobj(source_file, destination)
+        return
+    source.seek(0)
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, 'wb') as destination_file:
+            shutil.copyfileobj(source, destination_file)
+    else:
+        shutil.copyfileobj(source, destination)
+    source.seek(0)
+
+
+def _target_size(img, max_size):
+    """Size ``img`` would have after shrink_to_bounds()"""
+    if not max_size:
+        return img.size
+    width = max_size[0] or img.width
+    height = max_size[1] or img.height
+    scale = min(width / img.width, height / img.height, 1)
+    return max(1, round(img.width * scale)), max(1, round(img.height * scale))
+
+
+def convert_in_bands(img, source, destination, pillow_format, target_format, max_size, quality_settings):
+    """Convert an image whose decoded size exceeds the memory budget band by band.
+
+    Muss verkleinert werden (max_size, ICO), wird bandweise reduziert und das
+    kleine Ergebnis normal kodiert. Sonst laufen Dekodieren, prepare_mode()
+    und Kodieren pro Band. Gibt False zurück, wenn weder das eine noch das
+    andere geht; dann bleibt es beim Dekodieren des ganzen Bildes.
+    """
+    source_format = (img.format or 'unknown').lower()
+    target_size = _target_size(img, max_size)
+    if pillow_format == 'ICO':
+        target_size = largest_icon_size(quality_settings)
+
+    if target_size != img.size:
+        with stage('tiled', source_format, target_format):
+            small = shrink_in_bands(img, source, target_size)
+        if small is None or exceeds_budget(small):
+            return False
+        small = shrink_to_bounds(small, max_size)
+        with stage('transform', source_format, target_format):
+            small = prepare_mode(small, pillow_format)
+        with stage('encode', source_format, target_format):
+            small.save(destination, format=pillow_format, **quality_settings)
+        return True
+
+    writer = band_writer(destination, pillow_format, quality_settings, img.size)
+    if writer is None:
+        return False
+    with stage('tiled', source_format, target_format):
+        try:
+            done = 0
+            for band in read_bands(img, source, band_height(img.width)):
+                writer.write(prepare_mode(band, pillow_format))
+                done += band.height
+                report_percent('tiled', done, img.height)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+    return True
+
+
+def convert_image(source, destination, target_format, max_size=None, profile=DEFAULT_PROFILE):
+    """Convert an image with Pillow; source and destination may be paths or file objects.
+
+    Liegt die Quelle schon im Zielformat (z.B. jpeg -> jpg) und muss weder
+    verkleinert noch neu komprimiert werden, werden die Bytes kopiert statt
+    dekodiert und neu kodiert; dann wird ``'copy'`` zurückgegeben, sonst None.
+    Große PNG- und TIFF-Quellen über IMAGE_MEMORY_BUDGET werden bandweise
+    konvertiert (siehe shiftfile.tiles).
+    """
+    from .animation import is_animated, save_animated, supports_animation
+
+    pillow_format = FORMAT_MAPPING[target_format]
+    quality_settings = image_settings(target_format, profile)
+
+    with open_image(source) as img:
+        source_format = (img.format or 'unknown').lower()
+
+        if can_copy_image(img, pillow_format, max_size, profile):
+            with stage('copy', source_format, target_format):
+                copy_image(source, destination)
+            return 'copy'
+
+        if is_animated(img) and supports_animation(pillow_format):
+            # Alle Frames einzeln dekodieren und kodieren statt nur den ersten zu speichern
+            with stage('encode', source_format, target_format):
+                save_animated(img, destination, pillow_format, max_size, quality_settings)
+            return
+
+        if exceeds_budget(img) and can_read_bands(img) and convert_in_bands(
+                img, source, destination, pillow_format, target_format, max_size, quality_settings):
+            return
+
+        with stage('decode', source_format, target_format):
+            # Verkleinern, bevor Pixeldaten geladen werden (draft/reduce statt Volldekodierung)
+            img = shrink_to_bounds(img, max_size)
+            if pillow_format == 'ICO':
+                img = shrink_to_cover(img, largest_icon_size(quality_settings))
+            img.load()
+
+        with stage('transform', source_format, target_format):
+            img = prepare_mode(img, pillow_format)
+
+        # Speichere das konvertierte Bild
+        with stage('encode', source_format, target_format):
+            img.save(destination, format=pillow_format, **quality_settings)
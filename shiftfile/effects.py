@@ -0,0 +1,167 @@
+"""Vektorisierte Audio-Effekte auf NumPy-Arrays.
+
+FFmpeg dekodiert die Quelle einmal nach 32-Bit-Float-PCM; die Bytes werden
+ohne Kopie als ``(frames, channels)``-Array gesehen und alle Effekte laufen
+darauf in place. Das lohnt sich vor allem für die Normalisierung: ``loudnorm``
+rechnet intern mit 192kHz und ist um ein Vielfaches langsamer als Dekodieren
+und Kodieren zusammen, hier ist es ein Durchlauf über das Array.
+
+NumPy ist optional; ohne NumPy bleibt es beim FFmpeg-Filtergraphen.
+AUDIO_EFFECTS wählt: ``auto`` (NumPy nur für normalize), ``numpy`` oder ``ffmpeg``.
+"""
+import io
+import os
+
+# RMS-Ziel der Normalisierung; entspricht dem Integrated-Loudness-Standard von loudnorm (-24 LUFS)
+NORMALIZE_TARGET_DB = -24.0
+# Spitzen bleiben darunter, die Normalisierung verstärkt nie bis zum Clipping
+PEAK_CEILING_DB = -0.1
+
+# Speichergrenze der NumPy-Effekte (Float-PCM plus Zwischenarrays, siehe peak_bytes); darüber bleibt es
+# beim FFmpeg-Filtergraphen. 512MB reichen für gut 20 min Stereo/48kHz ohne Tempoänderung
+MAX_BYTES = int(os.getenv('AUDIO_EFFECTS_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def numpy_available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def has_effects(settings):
+    return bool(settings['volume'] or settings['fade_in'] > 0 or settings['fade_out'] > 0
+                or settings['speed'] != 1.0 or settings['normalize'] or settings['channels'] == 1)
+
+
+def use_numpy(settings, info, mode=None):
+    """Decide whether the effect chain for ``settings`` runs in NumPy; ``info`` is the header probe"""
+    mode = (mode or os.getenv('AUDIO_EFFECTS', 'auto')).lower()
+    if mode == 'ffmpeg' or not has_effects(settings):
+        return False
+    if mode == 'auto' and not settings['normalize']:
+        # Die übrigen Filter kosten in FFmpeg kaum etwas, ein zweiter Prozess lohnt sich nicht
+        return False
+    if not info or not info.get('sample_rate') or not info.get('channels'):
+        return False
+    if not info.get('duration') or peak_bytes(info, settings) > MAX_BYTES:
+        return False
+    return numpy_available()
+
+
+def pcm_bytes(info):
+    """Size of the decoded float32 PCM for a source described by the header probe ``info``"""
+    return int(info['duration'] * info['sample_rate']) * info['channels'] * 4
+
+
+def peak_bytes(info, settings):
+    """Estimate the peak memory of decoding and apply_effects() for ``info``"""
+    frames = int(info['duration'] * info['sample_rate'])
+    channels = info['channels']
+    total = pcm_bytes(info)
+    if settings['channels'] == 1 and channels > 1:
+        total += frames * 4
+        channels = 1
+    if settings['speed'] != 1.0:
+        # np.arange der Quell- und Zielpositionen (je 8 Bytes) und das neu abgetastete Array
+        output = int(frames / settings['speed'])
+        total += frames * 8 + output * 8 + output * channels * 4
+    return total
+
+
+def _db(value):
+    return 10 ** (value / 20)
+
+
+def apply_effects(samples, sample_rate, settings):
+    """Run the effect chain on a float32 ``(frames, channels)`` array.
+
+    Gleiche Reihenfolge wie der FFmpeg-Filtergraph: Lautstärke, Tempo
+    (schneller inklusive Tonhöhe), Fades, Normalisierung. Mono wird zuerst
+    gemischt, damit alles Weitere nur einen Kanal bearbeitet. Gibt das
+    Ergebnis zurück; nur Mono und Tempo legen ein neues Array an.
+    """
+    import numpy as np
+
+    if settings['channels'] == 1 and samples.shape[1] > 1:
+        samples = samples.mean(axis=1, dtype=np.float32, keepdims=True)
+
+    if settings['volume']:
+        samples *= np.float32(_db(settings['volume']))
+
+    speed = settings['speed']
+    if speed != 1.0 and len(samples) > 1:
+        # Lineare Interpolation an den Positionen 0, speed, 2*speed, ... wie asetrate + aresample
+        positions = np.arange(0, len(samples) - 1, speed)
+        frames = np.arange(len(samples))
+        resampled = np.empty((len(positions), samples.shape[1]), dtype=np.float32)
+        for channel in range(samples.shape[1]):
+            resampled[:, channel] = np.interp(positions, frames, samples[:, channel])
+        samples = resampled
+
+    fade_in = min(int(settings['fade_in'] * sample_rate), len(samples))
+    if fade_in > 0:
+        samples[:fade_in] *= np.linspace(0, 1, fade_in, endpoint=False, dtype=np.float32)[:, None]
+    fade_out = min(int(settings['fade_out'] * sample_rate), len(samples))
+    if fade_out > 0:
+        samples[-fade_out:] *= np.linspace(1, 0, fade_out, dtype=np.float32)[:, None]
+
+    if settings['normalize'] and samples.size:
+        flat = samples.reshape(-1)
+        rms = float(np.sqrt(np.dot(flat, flat) / flat.size))
+        peak = float(max(flat.max(), -flat.min()))
+        if rms > 0 and peak > 0:
+            samples *= np.float32(min(_db(NORMALIZE_TARGET_DB) / rms, _db(PEAK_CEILING_DB) / peak))
+
+    return samples
+
+
+class PCMBuffer:
+    """Byte sink for decoder output that NumPy can view without a copy.
+
+    ``size`` legt den Puffer vorab in der erwarteten Größe an; ein von null
+    wachsender bytearray bräuchte beim Vergrößern kurz den doppelten Platz.
+    """
+
+    def __init__(self, size=0):
+        self.data = bytearray(size)
+        self.length = 0
+
+    def write(self, chunk):
+        # Über das Ende hinaus wächst der Puffer, falls die Header-Dauer zu kurz geschätzt war
+        self.data[self.length:self.length + len(chunk)] = chunk
+        self.length += len(chunk)
+        return len(chunk)
+
+    def samples(self, channels):
+        import numpy as np
+
+        del self.data[self.length:]
+        usable = len(self.data) - len(self.data) % (4 * channels)
+        return np.frombuffer(self.data, dtype=np.float32, count=usable // 4).reshape(-1, channels)
+
+
+class ArrayReader(io.RawIOBase):
+    """Seekable read-only file over an array's memory, used as ffmpeg's stdin without a copy"""
+
+    def __init__(self, array):
+        self._view = memoryview(array).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer):
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
@@ -0,0 +1,46 @@
+"""Format-Registry für beide Einstiegspunkte; importiert keine Codecs."""
+from .audio import FFMPEG_FORMATS
+from .metrics import format_label
+
+# Dateiendung -> Pillow-Formatname
+FORMAT_MAPPING = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'webp': 'WEBP',
+    'gif': 'GIF',
+    'tiff': 'TIFF',
+    'bmp': 'BMP',
+    'ico': 'ICO'
+}
+
+# Einmal beim Import berechnet; Audio folgt den Formaten der FFmpeg-Engine
+ALLOWED_IMAGE_EXTENSIONS = frozenset(FORMAT_MAPPING)
+ALLOWED_AUDIO_EXTENSIONS = frozenset(FFMPEG_FORMATS)
+ALLOWED_EXTENSIONS = ALLOWED_IMAGE_EXTENSIONS | ALLOWED_AUDIO_EXTENSIONS
+
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+def allowed_file(filename):
+    return file_extension(filename) in ALLOWED_EXTENSIONS
+
+
+def is_image_file(filename):
+    return file_extension(filename) in ALLOWED_IMAGE_EXTENSIONS
+
+
+def is_audio_file(filename):
+    return file_extension(filename) in ALLOWED_AUDIO_EXTENSIONS
+
+
+def metric_labels(filename, target_format):
+    """Return (source, target) metric labels, limited to known formats"""
+    source = file_extension(filename)
+    target = (target_format or '').lower()
+    return (
+        format_label(source) if source in ALLOWED_EXTENSIONS else 'other',
+        format_label(target) if target in ALLOWED_EXTENSIONS else 'other'
+    )
@@ -0,0 +1,94 @@
+# Pillow wird erst in den Funktionen importiert, damit der Import billig bleibt
+
+# Modi, für die Image.reduce() implementiert ist
+REDUCIBLE_MODES = {'L', 'LA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'I', 'F'}
+
+# Encoder-Profile: Pillow-save()-Parameter je Format, von schnell bis klein
+ENCODER_PROFILES = {
+    'fast': {
+        'JPEG': {'quality': 90, 'optimize': False, 'progressive': False, 'subsampling': '4:2:0'},
+        'PNG': {'compress_level': 1},
+        'WEBP': {'quality': 85, 'method': 0},
+        'GIF': {'optimize': False},
+        'TIFF': {'compression': 'packbits'},
+    },
+    'balanced': {
+        'JPEG': {'quality': 92, 'optimize': True, 'progressive': False, 'subsampling': '4:2:0'},
+        'PNG': {'compress_level': 6},
+        'WEBP': {'quality': 90, 'method': 4},
+        'GIF': {'optimize': True},
+        'TIFF': {'compression': 'tiff_lzw'},
+    },
+    'smallest': {
+        'JPEG': {'quality': 82, 'optimize': True, 'progressive': True, 'subsampling': '4:2:0'},
+        'PNG': {'optimize': True},
+        'WEBP': {'quality': 80, 'method': 6},
+        'GIF': {'optimize': True},
+        'TIFF': {'compression': 'tiff_adobe_deflate'},
+    },
+}
+DEFAULT_PROFILE = 'balanced'
+
+
+def parse_max_size(form):
+    """Read optional max_width/max_height form fields; returns (width, height) or None"""
+    values = []
+    for field in ('max_width', 'max_height'):
+        raw = form.get(field)
+        if raw in (None, ''):
+            values.append(None)
+            continue
+        value = int(raw)
+        if value <= 0:
+            raise ValueError(f'{field} muss größer als 0 sein')
+        values.append(value)
+    return tuple(values) if any(values) else None
+
+
+def parse_profile(form):
+    """Read the optional ``profile`` form field; raises ValueError for unknown names"""
+    profile = (form.get('profile') or DEFAULT_PROFILE).lower()
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f'Unbekanntes Profil: {profile}')
+    return profile
+
+
+def encoder_settings(pillow_format, profile=DEFAULT_PROFILE, base=None):
+    """Return save() keyword arguments for ``pillow_format``; the profile overrides ``base``"""
+    return {**(base or {}), **ENCODER_PROFILES[profile].get(pillow_format, {})}
+
+
+def largest_icon_size(save_settings):
+    sizes = save_settings.get('sizes') or [(256, 256)]
+    return max(w for w, _ in sizes), max(h for _, h in sizes)
+
+
+def shrink_to_bounds(img, max_size):
+    """Downscale ``img`` in place so it fits ``max_size``, keeping the aspect ratio.
+
+    Muss vor jedem Zugriff auf die Pixeldaten aufgerufen werden: thumbnail()
+    nutzt dann draft(), sodass JPEGs per DCT-Skalierung direkt verkleinert
+    dekodiert werden, und reduce() für den groben Schritt vor LANCZOS.
+    """
+    if not max_size:
+        return img
+    width = max_size[0] or img.width
+    height = max_size[1] or img.height
+    if img.width <= width and img.height <= height:
+        return img
+    from PIL import Image
+    img.thumbnail((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    return img
+
+
+def shrink_to_cover(img, size):
+    """Return ``img`` cheaply downscaled by an integer factor, both sides staying >= ``size``.
+
+    Für Encoder wie ICO, die selbst auf die Endgröße skalieren: draft()
+    lässt JPEGs verkleinert dekodieren, reduce() fasst Pixelblöcke zusammen.
+    """
+    img.draft(img.mode, size)
+    factor = int(min(img.width / size[0], img.height / size[1]))
+    if factor >= 2 and img.mode in REDUCIBLE_MODES:
+        return img.reduce(factor)
+    return img
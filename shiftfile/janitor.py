@@ -0,0 +1,155 @@
+import fnmatch
+import logging
+import os
+import threading
+import time
+
+from .metrics import TEMP_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Dateien, die Anfragen direkt in TEMP_DIR anlegen; Cache, Uploads und Jobs räumen ihre Verzeichnisse selbst
+STALE_PATTERNS = ('input_*', 'output_*', 'health_*', 'spool_*')
+
+
+class TempJanitor:
+    """Background sweeper that removes stale temp files and keeps TEMP_DIR under a byte quota.
+
+    Das Aufräumen im ``finally`` einer Anfrage greift nicht, wenn ein Worker
+    abstürzt oder beendet wird. Der Janitor löscht deshalb in festen
+    Abständen Anfrage-Dateien, die älter als ``max_age`` sind. Liegt das
+    Verzeichnis danach über ``max_bytes``, werden die ältesten Anfrage-Dateien
+    (mindestens ``min_age`` alt) und anschließend Cache-Einträge entfernt.
+    Die Quota zählt alles unter ``directory``; es sollte deshalb der App
+    allein gehören (auf Vercel /tmp/shiftfile statt /tmp).
+    """
+
+    def __init__(self, directory, max_bytes, max_age=3600, interval=60, min_age=60, cache=None, cleaners=()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+        self.min_age = min_age
+        self.cache = cache
+        self.cleaners = list(cleaners)
+        self.removed_files = 0
+        self.removed_bytes = 0
+        self._usage = {'bytes': 0, 'files': 0, 'swept_at': None}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the sweeper thread; the first sweep runs right away"""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='shiftfile-janitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Sweep now instead of waiting for the next interval (e.g. after ENOSPC)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Fehler beim Aufräumen von {self.directory}: {str(e)}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _candidates(self):
+        """Return ``(mtime, size, path)`` of request files directly in the directory"""
+        candidates = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return candidates
+        for entry in entries:
+            if not any(fnmatch.fnmatch(entry.name, pattern) for pattern in STALE_PATTERNS):
+                continue
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    candidates.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                continue
+        return candidates
+
+    def _disk_usage(self):
+        total = 0
+        files = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                    files += 1
+                except OSError:
+                    continue
+        return total, files
+
+    def _remove(self, path, size):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.error(f"Temporäre Datei {path} konnte nicht gelöscht werden: {str(e)}")
+            return 0
+        self.removed_files += 1
+        self.removed_bytes += size
+        return size
+
+    def sweep(self):
+        """Remove stale files, enforce the quota and return the current usage"""
+        with self._lock:
+            for cleanup in self.cleaners:
+                cleanup()
+
+            now = time.time()
+            removed = 0
+            remaining = []
+            for mtime, size, path in self._candidates():
+                if now - mtime > self.max_age:
+                    removed += self._remove(path, size)
+                else:
+                    remaining.append((mtime, size, path))
+
+            total, files = self._disk_usage()
+            if self.max_bytes and total > self.max_bytes:
+                # Älteste zuerst; ganz frische Dateien gehören vermutlich zu laufenden Konvertierungen
+                for mtime, size, path in sorted(remaining):
+                    if total <= self.max_bytes:
+                        break
+                    if now - mtime > self.min_age:
+                        freed = self._remove(path, size)
+                        total -= freed
+                        removed += freed
+                if total > self.max_bytes and self.cache is not None:
+                    freed = self.cache.shrink(total - self.max_bytes)
+                    total -= freed
+                    removed += freed
+                total, files = self._disk_usage()
+                if total > self.max_bytes:
+                    logger.warning(f"Temp-Verzeichnis über dem Limit: {total} von {self.max_bytes} Bytes")
+
+            if removed:
+                logger.info(f"Temporäre Dateien wurden bereinigt: {removed} Bytes freigegeben")
+            self._usage = {'bytes': total, 'files': files, 'swept_at': now}
+            TEMP_BYTES.set(total)
+            return self.usage()
+
+    def usage(self):
+        """Return the usage measured by the last sweep plus lifetime removal counters"""
+        return {
+            **self._usage,
+            'max_bytes': self.max_bytes,
+            'max_age': self.max_age,
+            'removed_files': self.removed_files,
+            'removed_bytes': self.removed_bytes,
+        }
@@ -0,0 +1,148 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .progress import report
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+FINISHED_STATES = ('done', 'error')
+
+
+class JobQueueFull(Exception):
+    """Raised when the job executor already has ``max_pending`` jobs"""
+
+
+class JobManager:
+    """Runs conversions in a bounded background executor.
+
+    Jeder Job bekommt ein eigenes Verzeichnis unter ``directory`` mit
+    ``job.json`` (Status) sowie Ein- und Ausgabedatei. Der Status liegt auf
+    der Platte, damit auch andere Worker-Prozesse ihn abfragen können.
+    Abgeschlossene Jobs werden nach ``ttl`` Sekunden entfernt; cleanup()
+    läuft im Janitor, nicht bei jeder Abfrage.
+    """
+
+    def __init__(self, directory, max_workers=2, max_pending=16, ttl=900):
+        self.directory = directory
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='shiftfile-job')
+        self._pending = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.directory, job_id)
+
+    def _write(self, job):
+        path = os.path.join(self._job_dir(job['id']), 'job.json')
+        tmp_path = f"{path}.{uuid.uuid4().hex}"
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def get(self, job_id):
+        """Return the job status dict or None for unknown/expired ids"""
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), 'job.json')) as f:
+                job = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if job['status'] in FINISHED_STATES and time.time() - job['finished_at'] > self.ttl:
+            # Abgelaufen, vom Janitor nur noch nicht gelöscht
+            return None
+        return job
+
+    def result_path(self, job):
+        return os.path.join(self._job_dir(job['id']), f"output.{job['target_format']}")
+
+    def submit(self, upload, input_ext, target_format, download_name, convert):
+        """Store the upload and queue ``convert(input_path, output_path)``"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull('Zu viele laufende Konvertierungen')
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            os.makedirs(self._job_dir(job_id))
+            input_path = os.path.join(self._job_dir(job_id), f"input{input_ext}")
+            upload.save(input_path)
+            job = {
+                'id': job_id,
+                'status': 'queued',
+                'target_format': target_format,
+                'download_name': download_name,
+                'created_at': time.time(),
+                'finished_at': None,
+                'error': None,
+            }
+            self._write(job)
+            # Der Worker-Thread übernimmt Korrelations-ID und Fortschrittskanal der Anfrage
+            self._executor.submit(contextvars.copy_context().run, self._run, dict(job), input_path, convert)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            raise
+        return job
+
+    def _run(self, job, input_path, convert):
+        try:
+            job['status'] = 'running'
+            self._write(job)
+            convert(input_path, self.result_path(job))
+            job['status'] = 'done'
+            job['result_size'] = os.path.getsize(self.result_path(job))
+        except Exception as e:
+            logger.error(f"Job {job['id']} fehlgeschlagen: {str(e)}")
+            job['status'] = 'error'
+            job['error'] = str(e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            job['finished_at'] = time.time()
+            try:
+                if os.path.exists(input_path):
+                    os.remove(input_path)
+                self._write(job)
+            except OSError as e:
+                logger.error(f"Fehler beim Abschluss von Job {job['id']}: {str(e)}")
+            if job['status'] == 'done':
+                report('ready', job=job['id'], size=job['result_size'])
+            else:
+                report('error', job=job['id'], message=job.get('error'))
+
+    def cleanup(self):
+        """Remove finished jobs older than ``ttl`` and abandoned unfinished ones"""
+        now = time.time()
+        try:
+            job_ids = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for job_id in job_ids:
+            status_path = os.path.join(self._job_dir(job_id), 'job.json')
+            try:
+                with open(status_path) as f:
+                    job = json.load(f)
+                if job['status'] in FINISHED_STATES:
+                    expired = now - job['finished_at'] > self.ttl
+                else:
+                    # Von einem abgestürzten Worker zurückgelassen
+                    expired = now - os.path.getmtime(status_path) > 4 * self.ttl
+            except (OSError, ValueError, KeyError):
+                expired = os.path.isdir(self._job_dir(job_id)) and \
+                    now - os.path.getmtime(self._job_dir(job_id)) > self.ttl
+            if expired:
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
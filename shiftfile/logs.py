@@ -0,0 +1,182 @@
+"""Logging-Setup für beide Einstiegspunkte.
+
+Die Anfrage-Threads legen Log-Records nur in eine Queue; ein
+QueueListener-Thread formatiert und schreibt sie nach stdout und optional in
+eine rotierende Datei. Jeder Record trägt die Korrelations-ID der Anfrage
+(X-Request-ID). Erfolgs-Logs unterhalb von WARNING lassen sich pro Anfrage
+samplen, Warnungen und Fehler werden immer geschrieben.
+
+Umgebungsvariablen: LOG_LEVEL, LOG_FORMAT (text/json), LOG_FILE,
+LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_SAMPLE_RATE (0..1), LOG_QUEUE (0 = synchron).
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import uuid
+import zlib
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+# Vom Client übernommene IDs; alles andere wird durch eine neue ersetzt
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+# Attribute jedes LogRecord; alles darüber hinaus kam per ``extra=`` und landet im JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+request_id = contextvars.ContextVar('request_id', default='-')
+
+_listener = None
+_installed = None
+
+
+def new_request_id(incoming=None):
+    """Return the client's X-Request-ID if it is well-formed, otherwise a fresh id"""
+    if incoming and REQUEST_ID_PATTERN.fullmatch(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the correlation id of the current request; must run on the thread that logged"""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class SuccessSampler(logging.Filter):
+    """Keep only ``rate`` of the requests' records below WARNING.
+
+    Die Entscheidung hängt an der Korrelations-ID, sodass eine Anfrage
+    entweder alle oder keine ihrer Info-Zeilen behält.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        current = getattr(record, 'request_id', request_id.get())
+        if current == '-':
+            return True
+        return zlib.crc32(current.encode()) / 0xffffffff < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, message, request id and extras"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = '-'
+        return super().format(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    Die Standard-Implementierung formatiert und kopiert jeden Record schon
+    im Anfrage-Thread; hier wird nur die Nachricht aufgelöst, damit spätere
+    Änderungen an den Argumenten nichts mehr verfälschen.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _env(name, default, cast=str):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, '') else default
+
+
+def configure_logging(text_format=TEXT_FORMAT, level=None, fmt=None, log_file=None, max_bytes=None,
+                      backup_count=None, sample_rate=None, use_queue=None, logger=None, stream=None):
+    """Install the queue-backed handlers on ``logger`` (the root logger by default).
+
+    Nicht gesetzte Parameter kommen aus den LOG_*-Umgebungsvariablen. Ein
+    erneuter Aufruf ersetzt die vorherige Konfiguration.
+    """
+    global _listener, _installed
+    level = level or _env('LOG_LEVEL', 'INFO').upper()
+    fmt = (fmt or _env('LOG_FORMAT', 'text')).lower()
+    log_file = log_file or _env('LOG_FILE', None)
+    max_bytes = max_bytes if max_bytes is not None else _env('LOG_MAX_BYTES', 10 * 1024 * 1024, int)
+    backup_count = backup_count if backup_count is not None else _env('LOG_BACKUP_COUNT', 3, int)
+    sample_rate = sample_rate if sample_rate is not None else _env('LOG_SAMPLE_RATE', 1.0, float)
+    use_queue = use_queue if use_queue is not None else _env('LOG_QUEUE', '1') != '0'
+    logger = logger or logging.getLogger()
+
+    stop_logging()
+    formatter = JsonFormatter() if fmt == 'json' else _TextFormatter(text_format)
+    targets = [logging.StreamHandler(stream or sys.stdout)]
+    if log_file:
+        targets.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        ))
+    for target in targets:
+        target.setFormatter(formatter)
+
+    handlers = targets
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        handlers = [_QueueHandler(log_queue)]
+        _listener = logging.handlers.QueueListener(log_queue, *targets, respect_handler_level=True)
+        _listener.start()
+    # Filter am Eingangs-Handler laufen noch im Anfrage-Thread, wo die Korrelations-ID gesetzt ist
+    for handler in handlers:
+        handler.addFilter(RequestIdFilter())
+        if sample_rate < 1:
+            handler.addFilter(SuccessSampler(sample_rate))
+
+    for existing in list(logger.handlers):
+        logger.removeHandler(existing)
+    for handler in handlers:
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    _installed = (logger, handlers)
+    return handlers
+
+
+def stop_logging():
+    """Flush and stop the listener thread and detach the handlers installed by configure_logging()"""
+    global _listener, _installed
+    if _listener is not None:
+        _listener.stop()
+        for target in _listener.handlers:
+            target.close()
+        _listener = None
+    if _installed is not None:
+        logger, handlers = _installed
+        for handler in handlers:
+            logger.removeHandler(handler)
+            handler.close()
+        _installed = None
+
+
+atexit.register(stop_logging)
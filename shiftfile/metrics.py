@@ -0,0 +1,315 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import make_response
+
+from .progress import report
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} erwartet die Labels {self.labelnames}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {total!r}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Minimal in-process metrics registry with Prometheus text exposition.
+
+    Jeder Worker-Prozess zählt für sich; bei mehreren gunicorn-Workern
+    liefert /api/metrics also die Werte des Workers, der den Scrape bedient.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'shiftfile_stage_seconds',
+    'Dauer einzelner Konvertierungsschritte in Sekunden',
+    ('stage', 'source', 'target'),
+)
+CONVERSIONS = REGISTRY.counter(
+    'shiftfile_conversions_total',
+    'Anzahl der Konvertierungen nach Ergebnis',
+    ('source', 'target', 'status'),
+)
+BYTES_IN = REGISTRY.counter(
+    'shiftfile_bytes_in_total',
+    'Empfangene Bytes der Eingabedateien',
+    ('source', 'target'),
+)
+BYTES_OUT = REGISTRY.counter(
+    'shiftfile_bytes_out_total',
+    'Gesendete Bytes der konvertierten Dateien',
+    ('source', 'target'),
+)
+IN_FLIGHT = REGISTRY.gauge(
+    'shiftfile_conversions_in_flight',
+    'Aktuell laufende Konvertierungen',
+    ('kind',),
+)
+
+QUEUED = REGISTRY.gauge(
+    'shiftfile_admission_queued',
+    'Anfragen, die auf einen Platz im Konvertierungspool warten',
+    ('pool',),
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    'shiftfile_admission_rejections_total',
+    'Mit 429 abgewiesene Anfragen nach Pool und Grund',
+    ('pool', 'reason'),
+)
+TEMP_BYTES = REGISTRY.gauge(
+    'shiftfile_temp_bytes',
+    'Belegte Bytes im Temp-Verzeichnis beim letzten Aufräumen',
+)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# Pillow liefert 'jpeg'/'tiff', Uploads heissen meist .jpg/.tif – für die Labels vereinheitlichen
+LABEL_ALIASES = {'jpeg': 'jpg', 'tif': 'tiff'}
+
+
+def format_label(name):
+    """Normalise a file extension or Pillow format name for use as a metric label"""
+    name = (name or '').lower().lstrip('.')
+    return LABEL_ALIASES.get(name, name) or 'unknown'
+
+
+# In Batch-Workern gesetzt: Stufen werden gesammelt und erst im Hauptprozess verbucht
+_collected = contextvars.ContextVar('collected_stages', default=None)
+
+
+@contextmanager
+def stage(name, source, target):
+    """Time a conversion stage: ``with stage('decode', 'png', 'jpg'): ...``
+
+    Fordert der Client Fortschritt an, wird der Beginn jeder Stufe auch als
+    ``stage``-Ereignis gemeldet (siehe shiftfile.progress).
+    """
+    report('stage', stage=name)
+    labels = {'stage': name, 'source': format_label(source), 'target': format_label(target)}
+    collected = _collected.get()
+    if collected is None:
+        with STAGE_SECONDS.time(**labels):
+            yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        collected.append((labels, time.perf_counter() - start))
+
+
+@contextmanager
+def collect_stages():
+    """Collect stage timings instead of recording them, for work whose registry is another process'"""
+    collected = []
+    token = _collected.set(collected)
+    try:
+        yield collected
+    finally:
+        _collected.reset(token)
+
+
+def record_stages(samples):
+    """Record stage timings returned by collect_stages()"""
+    for labels, seconds in samples:
+        STAGE_SECONDS.observe(seconds, **labels)
+
+
+def track_send(response, source, target):
+    """Record the send duration and output bytes when the response is closed"""
+    start = time.perf_counter()
+
+    def finished():
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='send', source=source, target=target)
+        if response.content_length:
+            BYTES_OUT.inc(response.content_length, source=source, target=target)
+
+    if response.direct_passthrough and hasattr(response.response, 'close'):
+        # send_file-Antworten werden direkt durchgereicht; Werkzeug ruft dann nur close() des Bodys auf
+        body = response.response
+        close = body.close
+
+        def closing():
+            try:
+                close()
+            finally:
+                finished()
+
+        body.close = closing
+    else:
+        response.call_on_close(finished)
+    return response
+
+
+def instrument_conversion(kind, source, target, stream, run):
+    """Run a conversion view body and record input bytes, in-flight count, result and send time"""
+    if stream is not None:
+        BYTES_IN.inc(stream.seek(0, os.SEEK_END), source=source, target=target)
+        stream.seek(0)
+
+    with IN_FLIGHT.track_inprogress(kind=kind):
+        response = make_response(run())
+
+    if response.status_code >= 400:
+        status = 'error'
+    elif response.headers.get('X-Cache') == 'HIT':
+        status = 'cache_hit'
+    else:
+        status = 'success'
+    CONVERSIONS.inc(source=source, target=target, status=status)
+    if status != 'error':
+        track_send(response, source, target)
+    return response
+
+
+def encode_headers(response, seconds, output_size, profile=None, passthrough=None):
+    """Report conversion time, output size, encoder profile and passthrough mode in response headers"""
+    milliseconds = round(seconds * 1000, 1)
+    response.headers['X-Encode-Time-Ms'] = str(milliseconds)
+    response.headers['X-Output-Size'] = str(output_size)
+    response.headers['Server-Timing'] = f'encode;dur={milliseconds}'
+    if profile:
+        response.headers['X-Encoder-Profile'] = profile
+    if passthrough:
+        # 'copy': Bytes unverändert, 'remux': nur der Container wurde gewechselt
+        response.headers['X-Passthrough'] = passthrough
+    return response
@@ -0,0 +1,375 @@
+"""Format metadata from container headers, without decoding.
+
+Für Audio werden nur die Header von WAV, FLAC, MP3, Ogg (Vorbis/Opus),
+MP4/M4A und ADTS-AAC gelesen; andere Formate fallen auf ``ffmpeg -i``
+zurück. Bilder öffnet Pillow lazy, die Pixeldaten werden nie geladen.
+"""
+import os
+import re
+import struct
+
+# Wie viele Bytes am Dateianfang nach dem ersten MP3/ADTS-Frame gesucht wird
+SYNC_SEARCH_BYTES = 64 * 1024
+
+# Letzte Ogg-Seite (Granule-Position = Dauer) liegt in diesem Bereich am Dateiende
+OGG_TAIL_BYTES = 64 * 1024
+
+# moov-Atome größer als das werden nicht eingelesen
+MAX_MOOV_BYTES = 16 * 1024 * 1024
+
+MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+AAC_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+WAV_CODECS = {1: 'pcm_s{bits}le', 3: 'pcm_f{bits}le', 6: 'pcm_alaw', 7: 'pcm_mulaw'}
+# Demuxer-Namen aus ``ffmpeg -i`` -> Containernamen wie im Header-Parser
+FFMPEG_CONTAINERS = {'mov': 'mp4', 'aac': 'adts'}
+FFMPEG_CHANNELS = {'mono': 1, 'stereo': 2, '2.1': 3, 'quad': 4, '5.0': 5, '5.1': 6, '7.1': 8}
+
+
+def _size(stream):
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def _read_at(stream, offset, length):
+    stream.seek(offset)
+    return stream.read(length)
+
+
+def _audio(codec, sample_rate, channels, duration=None, bitrate=None, estimated=False, **extra):
+    return {
+        'kind': 'audio',
+        'codec': codec,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'duration': round(duration, 3) if duration is not None else None,
+        'bitrate': round(bitrate) if bitrate else None,
+        'duration_estimated': estimated,
+        **extra
+    }
+
+
+def _skip_id3(stream):
+    header = _read_at(stream, 0, 10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] & 0x7f) << 21 | (header[7] & 0x7f) << 14 | (header[8] & 0x7f) << 7 | (header[9] & 0x7f)
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+
+def _probe_wav(stream, size):
+    header = _read_at(stream, 0, 12)
+    if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+    offset = 12
+    fmt = None
+    while offset + 8 <= size:
+        chunk_id, chunk_size = struct.unpack('<4sI', _read_at(stream, offset, 8))
+        if chunk_id == b'fmt ':
+            fmt = list(struct.unpack('<HHIIHH', _read_at(stream, offset + 8, 16)))
+            if fmt[0] == 0xfffe and chunk_size >= 40:
+                # WAVE_FORMAT_EXTENSIBLE: der eigentliche Format-Tag steht am Anfang der Subformat-GUID
+                fmt[0] = struct.unpack('<H', _read_at(stream, offset + 32, 2))[0]
+        elif chunk_id == b'data' and fmt:
+            tag, channels, sample_rate, byte_rate, _, bits = fmt
+            # Gestreamte WAVs tragen oft 0 oder 0xFFFFFFFF als Länge
+            data_size = min(chunk_size, size - offset - 8) or size - offset - 8
+            codec = WAV_CODECS.get(tag, f'wav_0x{tag:04x}').format(bits=bits)
+            return _audio(codec, sample_rate, channels, data_size / byte_rate if byte_rate else None,
+                          byte_rate * 8 / 1000)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _probe_flac(stream, start, size):
+    header = _read_at(stream, start, 42)
+    if header[:4] != b'fLaC' or header[4] & 0x7f != 0:
+        return None
+    info = int.from_bytes(header[18:26], 'big')
+    sample_rate = info >> 44
+    channels = ((info >> 41) & 0x7) + 1
+    total_samples = info & 0xfffffffff
+    duration = total_samples / sample_rate if sample_rate and total_samples else None
+    return _audio('flac', sample_rate, channels, duration, size * 8 / duration / 1000 if duration else None,
+                  bits_per_sample=((info >> 36) & 0x1f) + 1)
+
+
+def _mp3_frame(header):
+    """Decode a 4-byte MPEG audio layer III frame header; returns None if invalid"""
+    if len(header) < 4 or header[0] != 0xff or header[1] & 0xe0 != 0xe0:
+        return None
+    version = (header[1] >> 3) & 0x3
+    layer = (header[1] >> 1) & 0x3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = MP3_BITRATES[1 if version == 3 else 2][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    samples = 1152 if version == 3 else 576
+    length = samples // 8 * bitrate * 1000 // sample_rate + ((header[2] >> 1) & 0x1)
+    return {
+        'version': version, 'bitrate': bitrate, 'sample_rate': sample_rate, 'samples': samples,
+        'channels': 1 if header[3] >> 6 == 3 else 2, 'length': length
+    }
+
+
+def _probe_mp3(stream, start, size):
+    data = _read_at(stream, start, SYNC_SEARCH_BYTES)
+    position = data.find(b'\xff')
+    while 0 <= position < len(data) - 4:
+        frame = _mp3_frame(data[position:position + 4])
+        # Ein zweiter gültiger Frame direkt dahinter schließt zufällige Sync-Bytes aus
+        if frame and _mp3_frame(_read_at(stream, start + position + frame['length'], 4)):
+            break
+        position = data.find(b'\xff', position + 1)
+    else:
+        return None
+
+    frame_start = start + position
+    side_info = (32 if frame['channels'] == 2 else 17) if frame['version'] == 3 else \
+        (17 if frame['channels'] == 2 else 9)
+    head = _read_at(stream, frame_start, 4 + side_info + 16)
+    frames = None
+    tag = head[4 + side_info:8 + side_info]
+    if tag in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', head[8 + side_info:12 + side_info])[0]
+        if flags & 1:
+            frames = struct.unpack('>I', head[12 + side_info:16 + side_info])[0]
+    else:
+        vbri = _read_at(stream, frame_start + 36, 18)
+        if vbri[:4] == b'VBRI':
+            frames = struct.unpack('>I', vbri[14:18])[0]
+
+    if frames:
+        duration = frames * frame['samples'] / frame['sample_rate']
+        bitrate = (size - frame_start) * 8 / duration / 1000 if duration else frame['bitrate']
+        return _audio('mp3', frame['sample_rate'], frame['channels'], duration, bitrate)
+    # Ohne Xing/VBRI-Header: Dauer aus der Bitrate des ersten Frames (exakt nur bei CBR)
+    duration = (size - frame_start) * 8 / (frame['bitrate'] * 1000)
+    return _audio('mp3', frame['sample_rate'], frame['channels'], duration, frame['bitrate'], estimated=True)
+
+
+def _probe_ogg(stream, size):
+    page = _read_at(stream, 0, 27 + 255 + 64)
+    if page[:4] != b'OggS':
+        return None
+    packet = page[27 + page[26]:]
+    if packet[:7] == b'\x01vorbis':
+        channels, rate, _, nominal = struct.unpack('<BIiI', packet[11:24])
+        codec, granule_rate, pre_skip = 'vorbis', rate, 0
+    elif packet[:8] == b'OpusHead':
+        channels, pre_skip, rate = struct.unpack('<BHI', packet[9:16])
+        codec, granule_rate, nominal = 'opus', 48000, 0
+    else:
+        return None
+
+    tail_start = max(0, size - OGG_TAIL_BYTES)
+    tail = _read_at(stream, tail_start, OGG_TAIL_BYTES)
+    last = tail.rfind(b'OggS')
+    duration = None
+    if last >= 0 and last + 14 <= len(tail):
+        granule = struct.unpack('<q', tail[last + 6:last + 14])[0]
+        if granule > 0:
+            duration = (granule - pre_skip) / granule_rate
+    bitrate = nominal / 1000 if nominal > 0 else (size * 8 / duration / 1000 if duration else None)
+    return _audio(codec, rate, channels, duration, bitrate)
+
+
+def _atoms(data, offset=0, end=None):
+    """Yield ``(type, payload_start, payload_end)`` of the MP4 atoms in ``data``"""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield kind, offset + header, min(offset + size, end)
+        offset += size
+
+
+def _find_atom(data, path, start=0, end=None):
+    for kind, payload_start, payload_end in _atoms(data, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return payload_start, payload_end
+            return _find_atom(data, path[1:], payload_start, payload_end)
+    return None
+
+
+def _probe_mp4(stream, size):
+    head = _read_at(stream, 0, 12)
+    if head[4:8] != b'ftyp':
+        return None
+    # Top-Level-Atome ablaufen, ohne die Mediendaten (mdat) zu lesen
+    offset = 0
+    moov = None
+    while offset + 8 <= size:
+        atom_size, kind = struct.unpack('>I4s', _read_at(stream, offset, 8))
+        header = 8
+        if atom_size == 1:
+            atom_size = struct.unpack('>Q', stream.read(8))[0]
+            header = 16
+        elif atom_size == 0:
+            atom_size = size - offset
+        if atom_size < header:
+            return None
+        if kind == b'moov':
+            if atom_size > MAX_MOOV_BYTES:
+                return None
+            moov = _read_at(stream, offset + header, atom_size - header)
+            break
+        offset += atom_size
+    if moov is None:
+        return None
+
+    for kind, trak_start, trak_end in _atoms(moov):
+        if kind != b'trak':
+            continue
+        handler = _find_atom(moov, (b'mdia', b'hdlr'), trak_start, trak_end)
+        if not handler or moov[handler[0] + 8:handler[0] + 12] != b'soun':
+            continue
+        mdhd = _find_atom(moov, (b'mdia', b'mdhd'), trak_start, trak_end)
+        stsd = _find_atom(moov, (b'mdia', b'minf', b'stbl', b'stsd'), trak_start, trak_end)
+        if not mdhd or not stsd:
+            continue
+        box = moov[mdhd[0]:mdhd[1]]
+        if box[0] == 1:
+            timescale, duration = struct.unpack('>IQ', box[20:32])
+        else:
+            timescale, duration = struct.unpack('>II', box[12:20])
+        entry = moov[stsd[0] + 8:stsd[1]]
+        codec = entry[4:8].decode('latin-1').strip()
+        channels, _, _, _, rate = struct.unpack('>HHHHI', entry[24:36])
+        seconds = duration / timescale if timescale else None
+        return _audio({'mp4a': 'aac'}.get(codec, codec), rate >> 16, channels, seconds,
+                      size * 8 / seconds / 1000 if seconds else None)
+    return None
+
+
+def _probe_adts(stream, start, size):
+    data = _read_at(stream, start, SYNC_SEARCH_BYTES)
+    if len(data) < 7 or data[0] != 0xff or data[1] & 0xf6 != 0xf0:
+        return None
+    rate_index = (data[2] >> 2) & 0xf
+    if rate_index >= len(AAC_SAMPLE_RATES):
+        return None
+    sample_rate = AAC_SAMPLE_RATES[rate_index]
+    channels = ((data[2] & 0x1) << 2) | (data[3] >> 6)
+
+    # Mittlere Framelänge der ersten Frames; jeder Frame hat 1024 Samples
+    lengths = []
+    position = 0
+    while position + 7 <= len(data) and data[position] == 0xff and data[position + 1] & 0xf6 == 0xf0:
+        length = ((data[position + 3] & 0x3) << 11) | (data[position + 4] << 3) | (data[position + 5] >> 5)
+        if length < 7:
+            break
+        lengths.append(length)
+        position += length
+    if not lengths:
+        return None
+    frame_seconds = 1024 / sample_rate
+    bitrate = sum(lengths) / len(lengths) * 8 / frame_seconds / 1000
+    duration = (size - start) * 8 / (bitrate * 1000)
+    return _audio('aac', sample_rate, channels, duration, bitrate, estimated=True)
+
+
+def probe_audio_header(stream, size=None):
+    """Read audio metadata from the container header of a seekable stream; None if unknown
+
+    ``size`` ist die Größe der ganzen Datei, wenn der Stream nur ihr Anfang
+    ist; Dauer und Bitrate werden dann daraus geschätzt.
+    """
+    position = stream.tell()
+    try:
+        size = max(_size(stream), size or 0)
+        magic = _read_at(stream, 0, 12)
+        if magic[:4] == b'RIFF':
+            container, info = 'wav', _probe_wav(stream, size)
+        elif magic[:4] == b'OggS':
+            container, info = 'ogg', _probe_ogg(stream, size)
+        elif magic[4:8] == b'ftyp':
+            container, info = 'mp4', _probe_mp4(stream, size)
+        else:
+            start = _skip_id3(stream)
+            lead = _read_at(stream, start, 4)
+            if lead == b'fLaC':
+                container, info = 'flac', _probe_flac(stream, start, size)
+            elif lead[:1] == b'\xff' and len(lead) > 1 and lead[1] & 0xf6 == 0xf0:
+                container, info = 'adts', _probe_adts(stream, start, size)
+            else:
+                container, info = 'mp3', _probe_mp3(stream, start, size)
+        if info is not None:
+            info['container'] = container
+        return info
+    except (struct.error, IndexError, ZeroDivisionError):
+        return None
+    finally:
+        stream.seek(position)
+
+
+def probe_audio(stream, engine=None, size=None):
+    """Probe an audio stream from its header, falling back to ``ffmpeg -i`` of an FFmpegEngine"""
+    header = probe_audio_header(stream, size)
+    if header is None and engine is not None and engine.available():
+        header = engine.describe_stream(stream)
+        if header is not None:
+            header['source'] = 'ffmpeg'
+    elif header is not None:
+        header['source'] = 'header'
+    return header
+
+
+def probe_image(stream):
+    """Read dimensions and mode with a lazy Image.open; pixel data is never decoded"""
+    from .tiles import open_image
+
+    position = stream.tell()
+    try:
+        with open_image(stream) as img:
+            return {
+                'kind': 'image',
+                'codec': (img.format or 'unknown').lower(),
+                'width': img.width,
+                'height': img.height,
+                'mode': img.mode,
+                'animated': bool(getattr(img, 'is_animated', False)),
+                'has_alpha': img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info,
+            }
+    finally:
+        stream.seek(position)
+
+
+def parse_ffmpeg_info(stderr):
+    """Parse the stream line of ``ffmpeg -i`` output into probe metadata"""
+    match = re.search(r'Audio: (\w+)[^,\n]*, (\d+) Hz, ([^,\n]+)(?:, [^,\n]+)?(?:, (\d+) kb/s)?', stderr)
+    if not match:
+        return None
+    layout = match.group(3).strip()
+    channels = FFMPEG_CHANNELS.get(layout)
+    if channels is None and layout.split()[0].isdigit():
+        channels = int(layout.split()[0])
+    duration = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', stderr)
+    seconds = None
+    if duration:
+        hours, minutes, rest = duration.groups()
+        seconds = int(hours) * 3600 + int(minutes) * 60 + float(rest)
+    bitrate = match.group(4)
+    if not bitrate:
+        total = re.search(r'bitrate: (\d+) kb/s', stderr)
+        bitrate = total and total.group(1)
+    container = re.search(r'Input #0, (\w+)', stderr)
+    container = container and FFMPEG_CONTAINERS.get(container.group(1), container.group(1))
+    return _audio(match.group(1), int(match.group(2)), channels, seconds, int(bitrate) if bitrate else None,
+                  container=container)
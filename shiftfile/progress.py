@@ -0,0 +1,264 @@
+"""Fortschritt laufender Konvertierungen für /api/convert/<id>/events (Server-Sent Events).
+
+Ein Client, der den Fortschritt sehen will, erzeugt eine ID, öffnet den
+Event-Stream und schickt dieselbe ID als X-Progress-ID mit der
+Konvertierung. Die Konvertierung meldet ``upload``, ``stage`` (decode,
+encode, ...), ``progress`` (Prozent aus ffmpeg ``-progress``, Frames oder
+Bildbändern) und zum Schluss ``ready`` oder ``error``.
+
+Die Ereignisse werden als JSON-Zeilen an eine Datei pro ID angehängt, damit
+jeder Worker-Prozess sie ausliefern kann; die Byte-Position hinter einem
+Ereignis ist seine SSE-ID, ein wiederverbindender EventSource setzt mit
+Last-Event-ID genau dort fort.
+
+Der Event-Endpunkt blockiert standardmäßig nicht: er liefert, was seit
+Last-Event-ID dazugekommen ist, und bittet per ``retry`` um erneutes
+Verbinden, sodass ein Zuhörer keinen Sync-Worker festhält. Mit
+PROGRESS_STREAM_SECONDS > 0 bleibt die Verbindung so lange offen und wird
+bei neuen Ereignissen sofort geweckt. Unter WSGI wartet dabei ein Thread
+(Thread-Worker); die ASGI-Brücke erkennt ProgressStream und wartet auf der
+Event-Loop, sodass kein Thread des Konvertierungs-Pools pro Zuhörer hängt.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{8,64}')
+FINAL_EVENTS = ('ready', 'error')
+
+# Prozentmeldungen höchstens so oft; stage/ready/error werden immer geschrieben
+MIN_INTERVAL = 0.25
+
+# Kanal der laufenden Konvertierung; None, wenn der Client keinen Fortschritt angefordert hat
+current = contextvars.ContextVar('progress', default=None)
+
+# Weckt wartende Streams in diesem Prozess; Ereignisse anderer Prozesse findet erst das Poll-Intervall
+_published = threading.Condition()
+# Wartende Streams auf einer Event-Loop als (loop, asyncio.Event), geschützt durch _published
+_async_waiters = set()
+
+
+class ProgressStore:
+    """Append-only event files under ``directory``, one per progress id"""
+
+    def __init__(self, directory, ttl=600, stream_seconds=0, retry_ms=500, poll_interval=0.5):
+        self.directory = directory
+        self.ttl = ttl
+        self.stream_seconds = stream_seconds
+        self.retry_ms = retry_ms
+        self.poll_interval = poll_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, progress_id):
+        return os.path.join(self.directory, f"{progress_id}.jsonl")
+
+    def channel(self, progress_id):
+        """Return the channel for a client-supplied id, or None if the id is malformed"""
+        if not progress_id or not PROGRESS_ID_PATTERN.fullmatch(progress_id):
+            return None
+        return ProgressChannel(self, progress_id)
+
+    def append(self, progress_id, event, data):
+        line = json.dumps({'event': event, 'ts': round(time.time(), 3), **data}, ensure_ascii=False)
+        try:
+            # Eine kurze Zeile im Append-Modus landet auch bei mehreren Prozessen am Stück
+            with open(self.path(progress_id), 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            logger.warning(f"Fortschritt für {progress_id} nicht geschrieben: {str(e)}")
+            return
+        with _published:
+            _published.notify_all()
+            waiters = list(_async_waiters)
+        for loop, woken in waiters:
+            try:
+                loop.call_soon_threadsafe(woken.set)
+            except RuntimeError:
+                # Loop bereits geschlossen
+                pass
+
+    def read(self, progress_id, offset=0):
+        """Return ``(events, finished)`` after byte ``offset``; events are ``(id, name, data)``.
+
+        ``finished`` ist wahr, sobald ready oder error geschrieben wurde,
+        auch wenn das Ereignis vor ``offset`` liegt.
+        """
+        events, finished = [], False
+        try:
+            with open(self.path(progress_id), 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Halb geschriebene Zeile; kommt beim nächsten Lesen vollständig
+                        break
+                    offset += len(line)
+                    data = json.loads(line)
+                    events.append((offset, data.pop('event'), data))
+                if not events and offset:
+                    f.seek(0)
+                    finished = any(json.loads(line).get('event') in FINAL_EVENTS for line in f)
+        except FileNotFoundError:
+            return [], False
+        finished = finished or any(name in FINAL_EVENTS for _, name, _ in events)
+        return events, finished
+
+    def size(self, progress_id):
+        try:
+            return os.path.getsize(self.path(progress_id))
+        except FileNotFoundError:
+            return 0
+
+    def wait(self, progress_id, offset, timeout):
+        """Block until the file grows past ``offset`` or ``timeout`` seconds passed"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.size(progress_id) > offset:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with _published:
+                _published.wait(min(self.poll_interval, remaining))
+
+    async def wait_async(self, progress_id, offset, timeout):
+        """Like :meth:`wait`, but awaits on the running event loop instead of blocking a thread"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter = (loop, asyncio.Event())
+        with _published:
+            _async_waiters.add(waiter)
+        try:
+            while True:
+                # Vor dem Prüfen zurücksetzen, sonst ginge ein append() dazwischen verloren
+                waiter[1].clear()
+                if await asyncio.to_thread(self.size, progress_id) > offset:
+                    return True
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), min(self.poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with _published:
+                _async_waiters.discard(waiter)
+
+    def stream(self, progress_id, offset=0):
+        """Yield Server-Sent Events from ``offset`` until the conversion finished or the stream time is up"""
+        yield f"retry: {self.retry_ms}\n\n"
+        deadline = time.monotonic() + self.stream_seconds
+        while True:
+            events, finished = self.read(progress_id, offset)
+            for event_id, name, data in events:
+                offset = event_id
+                yield _format_event(event_id, name, data)
+            remaining = deadline - time.monotonic()
+            if finished or remaining <= 0:
+                return
+            if not self.wait(progress_id, offset, min(remaining, 15)):
+                # Kommentarzeile hält Proxys davon ab, die Verbindung als tot zu schließen
+                yield ': keepalive\n\n'
+
+    async def stream_async(self, progress_id, offset=0):
+        """Same events as :meth:`stream`; file reads run in a thread, waiting happens on the event loop"""
+        yield f"retry: {self.retry_ms}\n\n"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.stream_seconds
+        while True:
+            events, finished = await asyncio.to_thread(self.read, progress_id, offset)
+            for event_id, name, data in events:
+                offset = event_id
+                yield _format_event(event_id, name, data)
+            remaining = deadline - loop.time()
+            if finished or remaining <= 0:
+                return
+            if not await self.wait_async(progress_id, offset, min(remaining, 15)):
+                yield ': keepalive\n\n'
+
+    def cleanup(self):
+        """Remove event files not written to for ``ttl`` seconds"""
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def _format_event(event_id, name, data):
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class ProgressStream:
+    """SSE response body of one listener.
+
+    Unter WSGI wird er synchron iteriert; die ASGI-Brücke erkennt ihn und
+    liest per ``async for``, damit das Warten keinen Thread belegt.
+    """
+
+    def __init__(self, store, progress_id, offset=0):
+        self.store = store
+        self.progress_id = progress_id
+        self.offset = offset
+
+    def __iter__(self):
+        for chunk in self.store.stream(self.progress_id, self.offset):
+            yield chunk.encode('utf-8')
+
+    async def __aiter__(self):
+        async for chunk in self.store.stream_async(self.progress_id, self.offset):
+            yield chunk.encode('utf-8')
+
+
+class ProgressChannel:
+    """Publishes the events of one conversion; percentages are throttled"""
+
+    def __init__(self, store, progress_id):
+        self.store = store
+        self.id = progress_id
+        self._last = (None, -1, 0.0)
+
+    def publish(self, event, **data):
+        self.store.append(self.id, event, data)
+
+    def percent(self, stage, done, total):
+        if not total:
+            return
+        value = max(0, min(100, int(done * 100 / total)))
+        last_stage, last_value, last_time = self._last
+        now = time.monotonic()
+        if stage == last_stage and (value <= last_value or (value < 100 and now - last_time < MIN_INTERVAL)):
+            return
+        self._last = (stage, value, now)
+        self.publish('progress', stage=stage, percent=value)
+
+
+def report(event, **data):
+    """Publish an event on the current conversion's channel, if the client asked for progress"""
+    channel = current.get()
+    if channel is not None:
+        channel.publish(event, **data)
+
+
+def report_percent(stage, done, total):
+    channel = current.get()
+    if channel is not None:
+        channel.percent(stage, done, total)
+
+
+def active():
+    return current.get() is not None
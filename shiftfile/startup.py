@@ -0,0 +1,75 @@
+"""Startprofil und Warm-up für Kaltstarts.
+
+Nur Standardbibliothek, damit der Import selbst nichts kostet. Die
+Einstiegspunkte messen damit ihre Startphasen; /api/warmup lädt Pillow-Plugins
+und sucht FFmpeg, bevor die erste echte Konvertierung kommt.
+"""
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Records how long each startup or warm-up phase of the process took"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.warmup = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def warm_up(self, audio_engine):
+        """Initialize codecs once per process; later calls return the first result"""
+        with self._lock:
+            if self.warmup is not None:
+                return self.warmup, False
+
+            steps = []
+
+            def step(name, action):
+                start = time.perf_counter()
+                result = action()
+                steps.append({'phase': name, 'ms': _ms(time.perf_counter() - start), 'result': result})
+
+            step('pillow', _init_pillow)
+            step('animation', _init_animation)
+            step('audio_engine', audio_engine.available)
+            self.warmup = steps
+            return steps, True
+
+    def report(self):
+        return {
+            'uptime_ms': _ms(time.perf_counter() - self.started),
+            'startup': [{'phase': name, 'ms': _ms(seconds)} for name, seconds in self.phases],
+            'warmup': self.warmup
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _init_pillow():
+    # Image.init() importiert alle Format-Plugins, die sonst beim ersten Öffnen oder Speichern geladen werden
+    from PIL import Image, features
+    Image.init()
+    features.check('webp_anim')
+    return len(Image.SAVE)
+
+
+def _init_animation():
+    importlib.import_module('shiftfile.animation')
+    return True
+
+
+# Ein Profil pro Prozess; die Startzeit ist der Import dieses Moduls
+PROFILE = StartupProfile()
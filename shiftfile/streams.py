@@ -0,0 +1,162 @@
+import io
+import logging
+import os
+import shutil
+import tempfile
+
+from flask import Request, current_app, request, send_file
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.sansio.multipart import Epilogue, File, MultipartDecoder, NeedData
+
+logger = logging.getLogger(__name__)
+
+# Ab dieser Größe werden Uploads und Ergebnisse auf die Platte ausgelagert
+SPOOL_MAX_SIZE = int(os.getenv('SPOOL_MAX_BYTES', 16 * 1024 * 1024))
+
+# So weit wird ein Multipart-Body nach dem Dateinamen abgesucht; Formularfelder stehen davor
+PEEK_BYTES = 64 * 1024
+
+
+class SpooledRequest(Request):
+    """Request whose uploads stay in memory up to ``SPOOL_MAX_SIZE``.
+
+    Werkzeug lagert Uploads standardmäßig schon ab 500KB ins System-Temp
+    aus. Hier gelten stattdessen ``SPOOL_MAX_SIZE`` und ``SPOOL_DIR`` aus der
+    App-Konfiguration.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return spooled_buffer(
+            current_app.config.get('SPOOL_DIR'),
+            current_app.config.get('SPOOL_MAX_SIZE', SPOOL_MAX_SIZE),
+        )
+
+
+class _PrefixedStream(io.RawIOBase):
+    """``wsgi.input`` that replays the bytes read by peek_filename() before the rest of the body"""
+
+    def __init__(self, head, stream):
+        self._head = memoryview(head)
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._head:
+            size = min(len(buffer), len(self._head))
+            buffer[:size] = self._head[:size]
+            self._head = self._head[size:]
+            return size
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def peek_filename(req, field='file', limit=PEEK_BYTES):
+    """Return the filename of the multipart file ``field`` without consuming the body.
+
+    Liest höchstens ``limit`` Bytes aus ``wsgi.input`` und legt sie für den
+    eigentlichen Parser wieder davor. So lässt sich der Pool wählen, bevor
+    der Upload eingelesen wird. None, wenn der Name nicht so früh kommt.
+    """
+    boundary = req.mimetype_params.get('boundary')
+    length = req.content_length
+    if req.mimetype != 'multipart/form-data' or not boundary or length is None:
+        return None
+    if req.max_content_length is not None and length > req.max_content_length:
+        # Das 413 kommt beim Zugriff auf request.files
+        return None
+
+    stream = req.environ['wsgi.input']
+    head = bytearray()
+    while len(head) < min(limit, length):
+        chunk = stream.read(min(limit, length) - len(head))
+        if not chunk:
+            break
+        head += chunk
+    req.environ['wsgi.input'] = _PrefixedStream(bytes(head), stream)
+
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_form_memory_size=limit)
+    decoder.receive_data(bytes(head))
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, File) and event.name == field:
+                return event.filename
+            if isinstance(event, (NeedData, Epilogue)):
+                return None
+    except ValueError:
+        # Kaputter Body; request.files meldet den Fehler wie bisher
+        return None
+
+
+def spooled_buffer(directory=None, max_size=SPOOL_MAX_SIZE):
+    """Return a binary buffer that spills to ``directory`` above ``max_size``"""
+    # Linux legt namenlose Dateien an (O_TMPFILE); wo das fehlt, erkennt der Janitor eigene am Präfix
+    return tempfile.SpooledTemporaryFile(max_size=max_size, mode='w+b', prefix='spool_', dir=directory)
+
+
+def copy_buffer(buffer, path):
+    """Write the whole buffer to ``path`` and rewind it"""
+    buffer.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(buffer, f)
+    buffer.seek(0)
+
+
+def send_buffer(buffer, download_name, mimetype=None, etag=None):
+    """Send a spooled buffer as attachment; the response closes it when done"""
+    size = buffer.seek(0, os.SEEK_END)
+    buffer.seek(0)
+    response = send_file(buffer, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         conditional=False, etag=False)
+    return _conditional(response, buffer, size, etag)
+
+
+class _DeleteOnClose(io.FileIO):
+    """Read-only file that removes itself from disk once it is closed"""
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            super().close()
+        finally:
+            try:
+                os.remove(self.name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Fehler beim Löschen von {self.name}: {str(e)}")
+
+
+def send_output(path, download_name, mimetype=None, etag=None, delete=False):
+    """Stream a converted file from disk with Range, ETag and If-None-Match support.
+
+    Der Body läuft über ``wsgi.file_wrapper`` (sendfile, sofern der Server
+    es anbietet). Mit ``delete=True`` wird die Datei erst gelöscht, wenn der
+    Server die Antwort geschlossen hat – nicht schon beim Verlassen des
+    Handlers.
+    """
+    if not delete:
+        # Ohne Löschen darf Flask den Pfad selbst öffnen (inkl. X-Sendfile)
+        return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         etag=etag or True)
+
+    size = os.path.getsize(path)
+    output = _DeleteOnClose(path)
+    response = send_file(output, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         conditional=False, etag=False)
+    return _conditional(response, output, size, etag)
+
+
+def _conditional(response, fileobj, size, etag):
+    response.content_length = size
+    if etag:
+        response.set_etag(etag)
+    try:
+        return response.make_conditional(request.environ, accept_ranges=True, complete_length=size)
+    except RequestedRangeNotSatisfiable:
+        fileobj.close()
+        raise
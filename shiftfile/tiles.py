@@ -0,0 +1,569 @@
+"""Bandweise Konvertierung sehr großer PNG- und TIFF-Bilder.
+
+Image.open() liest nur den Header, load() dekodiert dann das ganze Bitmap:
+ein 20000x20000-RGBA-TIFF belegt 1,6GB, das Compositing auf weißen
+Hintergrund für JPEG noch einmal so viel. Übersteigt das dekodierte Bild
+IMAGE_MEMORY_BUDGET, wird es hier in waagerechten Bändern gelesen,
+umgewandelt und geschrieben; gleichzeitig liegen nur wenige Bänder im
+Speicher, die Bandhöhe folgt aus Budget und Bildbreite.
+
+Lesen:
+  PNG  - der IDAT-Strom wird fortlaufend entpackt; jedes Band wird mit der
+         letzten Zeile des vorherigen Bandes als ungefilterter Vorzeile an
+         Pillows PNG-Dekoder gegeben, der die Zeilenfilter in C auflöst.
+  TIFF - pro Band ein kleines TIFF im Speicher aus den Tags der Quelle und
+         den Strips bzw. Kachelzeilen des Bandes, dekodiert von libtiff.
+
+Schreiben:
+  PNG  - gefilterte Zeilen aus Pillows Encoder, ein durchgehender zlib-Strom
+  JPEG - Baseline mit Standard-Huffman-Tabellen und einem Restart-Marker pro
+         MCU-Zeile; die Scans der Bänder werden aneinandergehängt
+  TIFF - ein Strip pro Band, das IFD am Dateiende
+  BMP  - Zeilen von oben nach unten (negative Höhe)
+
+Andere Zielformate und Verkleinerungen (max_size, ICO) verkleinern
+bandweise mit reduce() und kodieren das kleine Ergebnis wie gewohnt.
+"""
+import io
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+
+from .progress import report_percent
+
+# Obergrenze für die dekodierten Pixeldaten einer Konvertierung
+MEMORY_BUDGET = int(os.getenv('IMAGE_MEMORY_BUDGET', 256 * 1024 * 1024))
+# Bandweise lesbare Bilder dürfen über Pillows Decompression-Bomb-Grenze hinaus, bis hierher
+MAX_PIXELS = int(os.getenv('IMAGE_TILED_MAX_PIXELS', 1_000_000_000))
+
+# Kopien eines Bandes, die gleichzeitig leben: gelesene Daten, dekodiert, umgewandelt, gefiltert, kodiert
+BAND_COPIES = 6
+# Bandhöhen sind Vielfache von 8 MCU-Zeilen zu 16 Pixeln, damit die JPEG-Restart-Marker
+# über die Bandgrenzen hinweg fortlaufend nummeriert bleiben
+BAND_ALIGN = 128
+
+# SOFn-Marker; C4 (DHT), C8 (JPG) und CC (DAC) liegen im selben Bereich, sind aber keine Frame-Header
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG-Rohmodi, die sich verlustfrei in Zeilenbytes zurückwandeln lassen, mit Bits pro Pixel
+PNG_ROW_BITS = {'1': 1, 'L': 8, 'P': 8, 'LA': 16, 'RGB': 24, 'RGBA': 32}
+PNG_READ_SIZE = 64 * 1024
+
+# Tags, die libtiff zum Dekodieren braucht; alle anderen bleiben im Band-TIFF weg
+TIFF_DECODE_TAGS = (256, 258, 259, 262, 266, 277, 278, 284, 317, 320, 322, 323, 338, 339, 347, 529, 530, 531, 532)
+# Zusätzlich in die Ausgabe übernommen: Auflösung und ICC-Profil
+TIFF_OUTPUT_TAGS = TIFF_DECODE_TAGS + (282, 283, 296, 34675)
+TIFF_TYPE_FORMATS = {1: 'B', 3: 'H', 4: 'L', 5: 'L', 7: 'B'}
+IMAGE_LENGTH, ROWS_PER_STRIP, STRIP_OFFSETS, STRIP_BYTE_COUNTS = 257, 278, 273, 279
+TILE_WIDTH, TILE_LENGTH, TILE_OFFSETS, TILE_BYTE_COUNTS = 322, 323, 324, 325
+PLANAR_CONFIGURATION = 284
+
+# Zielformate mit bandweisem Writer
+STREAM_FORMATS = {'PNG', 'JPEG', 'TIFF', 'BMP'}
+
+
+def decoded_size(img):
+    """Bytes Pillow needs for the decoded image (4 per pixel for multi-band modes)"""
+    return img.width * img.height * (1 if img.mode in ('1', 'L', 'P') else 4)
+
+
+def exceeds_budget(img, budget=None):
+    return decoded_size(img) > (budget or MEMORY_BUDGET)
+
+
+def band_height(width, budget=None, align=BAND_ALIGN):
+    """Rows per band so that ``BAND_COPIES`` bands fit into the budget"""
+    rows = (budget or MEMORY_BUDGET) // (max(width, 1) * 4 * BAND_COPIES)
+    return max(align, rows // align * align)
+
+
+def can_read_bands(img):
+    """True for non-interlaced 8-bit PNGs and single-plane striped or tiled TIFFs"""
+    if img.format == 'PNG':
+        return (len(img.tile) == 1 and img.tile[0][0] == 'zip' and not img.info.get('interlace')
+                and img.tile[0][3] in PNG_ROW_BITS)
+    if img.format == 'TIFF':
+        tags = img.tag_v2
+        return (len(img.tile) >= 1 and img.tile[0][0] in ('libtiff', 'raw')
+                and tags.get(PLANAR_CONFIGURATION, 1) == 1
+                and (STRIP_OFFSETS in tags or TILE_OFFSETS in tags))
+    return False
+
+
+def open_image(source):
+    """Image.open() that lets band-readable PNGs and TIFFs past the decompression bomb check.
+
+    Pillow verweigert Bilder über 2x MAX_IMAGE_PIXELS, weil load() sie ganz
+    in den Speicher holen würde. Bandweise lesbare Bilder bis MAX_PIXELS
+    werden direkt über ihr Plugin geöffnet, was den Check auslässt.
+    """
+    from PIL import Image, PngImagePlugin, TiffImagePlugin
+
+    try:
+        return Image.open(source)
+    except Image.DecompressionBombError:
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        with _source_file(source) as fp:
+            lead = fp.read(8)
+            fp.seek(0)
+        plugin = {PNG_SIGNATURE[:4]: PngImagePlugin.PngImageFile,
+                  b'II*\x00': TiffImagePlugin.TiffImageFile,
+                  b'MM\x00*': TiffImagePlugin.TiffImageFile}.get(lead[:4])
+        if plugin is None:
+            raise
+        img = plugin(source)
+        if img.width * img.height > MAX_PIXELS or not can_read_bands(img):
+            img.close()
+            raise
+        return img
+
+
+@contextmanager
+def _source_file(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fp:
+            yield fp
+    else:
+        yield source
+
+
+def _attach_info(band, img):
+    """Carry palette, transparency and ICC profile of the source over to a band"""
+    if band.mode in ('P', 'PA') and img.palette is not None:
+        band.putpalette(img.palette)
+    for key in ('transparency', 'icc_profile'):
+        if key in img.info:
+            band.info[key] = img.info[key]
+    return band
+
+
+def read_bands(img, source, rows):
+    """Yield the decoded image top to bottom in bands of ``rows`` rows (the last one shorter)"""
+    chunks = _png_bands(img, source, rows) if img.format == 'PNG' else _tiff_bands(img, source, rows)
+    return _regroup(chunks, img, rows)
+
+
+def _regroup(chunks, img, rows):
+    from PIL import Image
+
+    band, filled = None, 0
+    for chunk in chunks:
+        if band is None and chunk.height == rows:
+            yield chunk
+            continue
+        y = 0
+        while y < chunk.height:
+            if band is None:
+                band, filled = _attach_info(Image.new(chunk.mode, (chunk.width, rows)), img), 0
+            take = min(rows - filled, chunk.height - y)
+            band.paste(chunk.crop((0, y, chunk.width, y + take)), (0, filled))
+            filled += take
+            y += take
+            if filled == rows:
+                yield band
+                band = None
+    if band is not None:
+        yield band.crop((0, 0, band.width, filled))
+
+
+def _png_chunks(fp):
+    """Yield ``(type, offset, length)`` for the chunks of a PNG file; leaves ``fp`` after each chunk"""
+    fp.seek(0)
+    if fp.read(8) != PNG_SIGNATURE:
+        raise OSError('Keine PNG-Datei')
+    while True:
+        header = fp.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack('>I4s', header)
+        offset = fp.tell()
+        yield kind, offset, length
+        fp.seek(offset + length + 4)
+        if kind == b'IEND':
+            return
+
+
+def _png_idat(fp):
+    for kind, offset, length in _png_chunks(fp):
+        if kind != b'IDAT':
+            continue
+        while length:
+            piece = fp.read(min(length, PNG_READ_SIZE))
+            if not piece:
+                raise OSError('PNG-Datei ist abgeschnitten')
+            length -= len(piece)
+            yield piece
+
+
+def _png_bands(img, source, rows):
+    from PIL import Image
+
+    rawmode = img.tile[0][3]
+    stride = 1 + (img.width * PNG_ROW_BITS[rawmode] + 7) // 8
+    # Vor der ersten Zeile gilt eine Nullzeile als Vorgänger, genau wie im PNG-Standard
+    previous = bytes(stride - 1)
+    inflater = zlib.decompressobj()
+    pending = bytearray()
+    done = 0
+
+    def decode(count):
+        nonlocal previous, done
+        data = b'\x00' + previous + bytes(pending[:count * stride])
+        del pending[:count * stride]
+        decoded = Image.frombytes(img.mode, (img.width, count + 1), zlib.compress(data, 0), 'zip', rawmode)
+        band = decoded.crop((0, 1, img.width, count + 1))
+        previous = band.crop((0, count - 1, img.width, count)).tobytes('raw', rawmode)
+        done += count
+        return _attach_info(band, img)
+
+    with _source_file(source) as fp:
+        for piece in _png_idat(fp):
+            while piece:
+                need = min(rows, img.height - done) * stride
+                pending += inflater.decompress(piece, max(need - len(pending), stride))
+                piece = inflater.unconsumed_tail
+                while done < img.height and len(pending) >= min(rows, img.height - done) * stride:
+                    yield decode(min(rows, img.height - done))
+            if done >= img.height:
+                return
+    raise OSError('PNG-Datenstrom endet vor der letzten Zeile')
+
+
+def _tiff_value(value):
+    return value if isinstance(value, (tuple, bytes)) else (value,)
+
+
+def _tiff_ifd(prefix, tags, types, offset):
+    """Serialize a classic TIFF IFD at ``offset``; out-of-line values follow the entry table"""
+    order = '<' if prefix == b'II' else '>'
+    entries, extra = [], bytearray()
+    data_start = offset + 2 + 12 * len(tags) + 4
+    for tag in sorted(tags):
+        kind = types[tag]
+        value = tags[tag]
+        if kind == 7:
+            data = bytes(value)
+        elif kind == 5:
+            pairs = [part for rational in _tiff_value(value) for part in (rational.numerator, rational.denominator)]
+            data = struct.pack(f'{order}{len(pairs)}L', *pairs)
+        else:
+            values = _tiff_value(value)
+            data = struct.pack(f'{order}{len(values)}{TIFF_TYPE_FORMATS[kind]}', *values)
+        count = len(data) // (8 if kind == 5 else struct.calcsize(order + TIFF_TYPE_FORMATS[kind]))
+        if len(data) <= 4:
+            field = data.ljust(4, b'\x00')
+        else:
+            field = struct.pack(f'{order}L', data_start + len(extra))
+            extra += data + b'\x00' * (len(data) % 2)
+        entries.append(struct.pack(f'{order}HHL', tag, kind, count) + field)
+    return struct.pack(f'{order}H', len(entries)) + b''.join(entries) + struct.pack(f'{order}L', 0) + bytes(extra)
+
+
+def _tiff_header(prefix, ifd_offset):
+    order = '<' if prefix == b'II' else '>'
+    return prefix + struct.pack(f'{order}HL', 42, ifd_offset)
+
+
+def _tiff_tags(source_tags, keep):
+    tags, types = {}, {}
+    for tag in keep:
+        if tag in source_tags and source_tags.tagtype.get(tag) in TIFF_TYPE_FORMATS:
+            tags[tag] = source_tags[tag]
+            types[tag] = source_tags.tagtype[tag]
+    return tags, types
+
+
+def _tiff_band(img, fp, tags, types, first, count, band_rows, offset_tag, count_tag):
+    """Decode ``count`` strips or tiles starting at ``first`` as an image of ``band_rows`` rows"""
+    from PIL import Image
+
+    source = img.tag_v2
+    offsets = source[offset_tag][first:first + count]
+    sizes = source[count_tag][first:first + count]
+    tags = {**tags, IMAGE_LENGTH: band_rows, offset_tag: (0,) * count, count_tag: tuple(sizes)}
+    types = {**types, IMAGE_LENGTH: 4, offset_tag: 4, count_tag: 4}
+    position = 8 + len(_tiff_ifd(source.prefix, tags, types, 8))
+    starts = []
+    for size in sizes:
+        starts.append(position)
+        position += size
+    tags[offset_tag] = tuple(starts)
+
+    data = bytearray(_tiff_header(source.prefix, 8) + _tiff_ifd(source.prefix, tags, types, 8))
+    for offset, size in zip(offsets, sizes):
+        fp.seek(offset)
+        data += fp.read(size)
+    with Image.open(io.BytesIO(data)) as band:
+        band.load()
+        return _attach_info(band, img)
+
+
+def _tiff_bands(img, source, rows):
+    source_tags = img.tag_v2
+    tags, types = _tiff_tags(source_tags, TIFF_DECODE_TAGS)
+    height = img.height
+    if TILE_OFFSETS in source_tags:
+        # Eine Kachelzeile ist die kleinste Einheit; mehrere bilden ein Band
+        unit = source_tags[TILE_LENGTH]
+        per_unit = -(-img.width // source_tags[TILE_WIDTH])
+        offset_tag, count_tag = TILE_OFFSETS, TILE_BYTE_COUNTS
+    else:
+        unit = min(source_tags.get(ROWS_PER_STRIP, height), height)
+        per_unit = 1
+        offset_tag, count_tag = STRIP_OFFSETS, STRIP_BYTE_COUNTS
+    units = max(1, rows // unit)
+
+    with _source_file(source) as fp:
+        for y in range(0, height, unit * units):
+            band_rows = min(unit * units, height - y)
+            first = y // unit * per_unit
+            count = -(-band_rows // unit) * per_unit
+            yield _tiff_band(img, fp, tags, types, first, count, band_rows, offset_tag, count_tag)
+
+
+def shrink_in_bands(img, source, size, rows=None):
+    """Downscale by an integer factor while reading bands; both sides stay >= ``size``.
+
+    Entspricht dem reduce()-Schritt von thumbnail() mit reducing_gap=2.0;
+    den LANCZOS-Feinschritt macht der Aufrufer auf dem kleinen Ergebnis.
+    Gibt None zurück, wenn sich nicht verkleinern lässt.
+    """
+    from PIL import Image
+    from .images import REDUCIBLE_MODES
+
+    factor = int(min(img.width / size[0], img.height / size[1]) / 2)
+    if factor < 2:
+        return None
+    rows = rows or band_height(img.width)
+    rows = max(factor, rows // factor * factor)
+    result = None
+    for y, band in _positioned(read_bands(img, source, rows)):
+        if band.mode not in REDUCIBLE_MODES:
+            band = band.convert('RGBA' if band.mode in ('P', 'PA') else 'L' if band.mode == '1' else 'RGB')
+        small = band.reduce(factor)
+        if result is None:
+            result = Image.new(small.mode, (-(-img.width // factor), -(-img.height // factor)))
+            for key in ('icc_profile',):
+                if key in img.info:
+                    result.info[key] = img.info[key]
+        result.paste(small, (0, y // factor))
+        report_percent('tiled', y + band.height, img.height)
+    return result
+
+
+def _positioned(bands):
+    y = 0
+    for band in bands:
+        yield y, band
+        y += band.height
+
+
+def band_writer(destination, pillow_format, settings, size):
+    """Return an incremental writer for ``pillow_format`` or None if there is none.
+
+    Die Writer nehmen Bänder gleicher Höhe (nur das letzte darf kürzer
+    sein) von oben nach unten per write() entgegen; close() schließt die
+    Datei ab.
+    """
+    writer = {'PNG': _PngWriter, 'JPEG': _JpegWriter, 'TIFF': _TiffWriter, 'BMP': _BmpWriter}.get(pillow_format)
+    if writer is None or not writer.supports(destination, size):
+        return None
+    return writer(destination, settings, size)
+
+
+class _BandWriter:
+    def __init__(self, destination, settings, size):
+        self.settings = settings
+        self.size = size
+        self._owned = isinstance(destination, (str, os.PathLike))
+        self.fp = open(destination, 'wb') if self._owned else destination
+        self.rows = 0
+
+    @classmethod
+    def supports(cls, destination, size):
+        return True
+
+    def write(self, band):
+        self._write(band)
+        self.rows += band.height
+
+    def close(self):
+        try:
+            self._finish()
+        finally:
+            if self._owned:
+                self.fp.close()
+
+    def abort(self):
+        if self._owned:
+            self.fp.close()
+
+    @staticmethod
+    def _encode(band, pillow_format, **settings):
+        buffer = io.BytesIO()
+        band.save(buffer, format=pillow_format, **settings)
+        return buffer
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+class _PngWriter(_BandWriter):
+    """Filters each band with Pillow and deflates all rows into one zlib stream"""
+
+    def __init__(self, destination, settings, size):
+        super().__init__(destination, settings, size)
+        level = settings.get('compress_level', 9 if settings.get('optimize') else 6)
+        self._deflate = zlib.compressobj(level)
+        self._previous = None
+
+    def _write(self, band):
+        from PIL import Image
+
+        image = band
+        if self._previous is not None:
+            # Die letzte Zeile des Vorgängers voranstellen, damit die erste Bandzeile gegen sie gefiltert wird
+            image = _attach_info(Image.new(band.mode, (band.width, band.height + 1)), band)
+            image.paste(self._previous, (0, 0))
+            image.paste(band, (0, 1))
+        encoded = self._encode(image, 'PNG', compress_level=0)
+        idat = []
+        for kind, offset, length in _png_chunks(encoded):
+            if kind == b'IDAT':
+                idat.append(encoded.getbuffer()[offset:offset + length])
+            elif self._previous is None and kind != b'IEND':
+                data = bytes(encoded.getbuffer()[offset:offset + length])
+                if kind == b'IHDR':
+                    data = data[:4] + struct.pack('>I', self.size[1]) + data[8:]
+                if not self.rows:
+                    self.fp.write((PNG_SIGNATURE if kind == b'IHDR' else b'') + _png_chunk(kind, data))
+        rows = zlib.decompress(b''.join(idat))
+        if self._previous is not None:
+            rows = rows[len(rows) // image.height:]
+        self._emit(self._deflate.compress(rows))
+        self._previous = band.crop((0, band.height - 1, band.width, band.height))
+
+    def _emit(self, data):
+        if data:
+            self.fp.write(_png_chunk(b'IDAT', data))
+
+    def _finish(self):
+        self._emit(self._deflate.flush())
+        self.fp.write(_png_chunk(b'IEND', b''))
+
+
+class _JpegWriter(_BandWriter):
+    """Concatenates baseline scans of equally high bands, separated by restart markers.
+
+    Mit Standard-Huffman-Tabellen (optimize=False) und Restart-Markern nach
+    jeder MCU-Zeile ist der Entropie-Strom jedes Bandes unabhängig; die
+    Bänder teilen sich Quantisierung und Tabellen des ersten Headers.
+    Bänder sind Vielfache von BAND_ALIGN Zeilen, also endet jedes nach
+    RST6 und der Übergang zum nächsten ist immer RST7.
+    """
+
+    @classmethod
+    def supports(cls, destination, size):
+        return max(size) <= 65535
+
+    def _write(self, band):
+        encoded = self._encode(band, 'JPEG', quality=self.settings.get('quality', 75),
+                               subsampling=self.settings.get('subsampling', -1),
+                               optimize=False, progressive=False, restart_marker_rows=1).getbuffer()
+        # Segmente über ihre Längenfelder ablaufen; APPn-Nutzdaten (EXIF, ICC) können FF C0 enthalten
+        position, sof = 2, None
+        while True:
+            marker = encoded[position + 1]
+            length, = struct.unpack('>H', encoded[position + 2:position + 4])
+            end = position + 2 + length
+            if marker in JPEG_SOF_MARKERS:
+                sof = position
+            if marker == 0xDA:
+                break
+            position = end
+        if sof is None:
+            raise OSError('Kein SOF-Segment im JPEG-Band')
+        scan = encoded[end:len(encoded) - 2]
+        if not self.rows:
+            header = bytearray(encoded[:end])
+            header[sof + 5:sof + 7] = struct.pack('>H', self.size[1])
+            self.fp.write(header)
+        else:
+            self.fp.write(b'\xff\xd7')
+        self.fp.write(scan)
+
+    def _finish(self):
+        self.fp.write(b'\xff\xd9')
+
+
+class _TiffWriter(_BandWriter):
+    """Writes one strip per band and the IFD after the last strip"""
+
+    @classmethod
+    def supports(cls, destination, size):
+        return isinstance(destination, (str, os.PathLike)) or destination.seekable()
+
+    def __init__(self, destination, settings, size):
+        super().__init__(destination, settings, size)
+        self._start = self.fp.tell()
+        self.fp.write(_tiff_header(b'II', 0))
+        self._strips = []
+        self._tags = None
+
+    def _write(self, band):
+        from PIL import Image
+
+        # strip_size so groß, dass Pillow das ganze Band in einen Strip schreibt
+        encoded = self._encode(band, 'TIFF', compression=self.settings.get('compression', 'raw'),
+                               strip_size=2 ** 31 - 1)
+        with Image.open(encoded) as tiff:
+            tags = tiff.tag_v2
+            if self._tags is None:
+                self._tags = _tiff_tags(tags, TIFF_OUTPUT_TAGS)
+                self._rows_per_strip = band.height
+            offset, length = tags[STRIP_OFFSETS][0], tags[STRIP_BYTE_COUNTS][0]
+        if tags.prefix != b'II':
+            raise OSError('Unerwartete Bytereihenfolge im TIFF-Encoder')
+        self._strips.append((self.fp.tell() - self._start, length))
+        self.fp.write(encoded.getbuffer()[offset:offset + length])
+
+    def _finish(self):
+        tags, types = self._tags
+        tags = {**tags, IMAGE_LENGTH: self.size[1], ROWS_PER_STRIP: self._rows_per_strip,
+                STRIP_OFFSETS: tuple(offset for offset, _ in self._strips),
+                STRIP_BYTE_COUNTS: tuple(length for _, length in self._strips)}
+        types = {**types, IMAGE_LENGTH: 4, ROWS_PER_STRIP: 4, STRIP_OFFSETS: 4, STRIP_BYTE_COUNTS: 4}
+        if self.fp.tell() % 2:
+            self.fp.write(b'\x00')
+        ifd_offset = self.fp.tell() - self._start
+        self.fp.write(_tiff_ifd(b'II', tags, types, ifd_offset))
+        end = self.fp.tell()
+        self.fp.seek(self._start)
+        self.fp.write(_tiff_header(b'II', ifd_offset))
+        self.fp.seek(end)
+
+
+class _BmpWriter(_BandWriter):
+    """Uses Pillow's header with a negative height and writes the rows top-down"""
+
+    def _write(self, band):
+        from PIL import BmpImagePlugin
+
+        rawmode, bits, _ = BmpImagePlugin.SAVE[band.mode]
+        stride = ((band.width * bits + 31) // 32) * 4
+        if not self.rows:
+            encoded = self._encode(band.crop((0, 0, band.width, 1)), 'BMP').getvalue()
+            pixels = struct.unpack('<I', encoded[10:14])[0]
+            header = bytearray(encoded[:pixels])
+            struct.pack_into('<I', header, 2, pixels + stride * self.size[1])
+            struct.pack_into('<i', header, 22, -self.size[1])
+            struct.pack_into('<I', header, 34, stride * self.size[1])
+            self.fp.write(header)
+        self.fp.write(band.tobytes('raw', rawmode, stride, 1))
+
+    def _finish(self):
+        pass
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+from .cache import CHUNK_SIZE, hash_file
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+CHUNK_MARKER_PATTERN = re.compile(r'^(\d+)-(\d+)$')
+
+
+class UploadError(Exception):
+    """Raised for invalid chunked upload requests; carries an HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploadStore:
+    """Assembles resumable chunked uploads in ``directory``.
+
+    Pro Upload gibt es ein Verzeichnis mit ``upload.json``, der auf die
+    Endgröße angelegten Datei ``data`` und einer Markierungsdatei je
+    empfangenem Chunk (``chunks/<offset>-<länge>``). Chunks können dadurch
+    parallel und von verschiedenen Worker-Prozessen geschrieben werden, und
+    der Client kann nach einem Abbruch die fehlenden Bereiche erfragen.
+    """
+
+    def __init__(self, directory, max_size, chunk_size, ttl=3600):
+        self.directory = directory
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.directory, upload_id)
+
+    def data_path(self, upload_id):
+        return os.path.join(self._upload_dir(upload_id), 'data')
+
+    def create(self, filename, size, sha256=None):
+        self.cleanup()
+        if not filename:
+            raise UploadError('Kein Dateiname angegeben')
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('Ungültige Dateigröße')
+        if size > self.max_size:
+            raise UploadError(f'Datei zu groß (maximal {self.max_size} Bytes)', 413)
+
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self._upload_dir(upload_id), 'chunks'))
+        with open(self.data_path(upload_id), 'wb') as f:
+            f.truncate(size)
+        upload = {
+            'id': upload_id,
+            'filename': filename,
+            'size': size,
+            'sha256': sha256.lower() if sha256 else None,
+            'chunk_size': self.chunk_size,
+            'created_at': time.time(),
+        }
+        with open(os.path.join(self._upload_dir(upload_id), 'upload.json'), 'w') as f:
+            json.dump(upload, f)
+        return self.status(upload_id)
+
+    def _load(self, upload_id):
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            raise UploadError('Upload nicht gefunden', 404)
+        try:
+            with open(os.path.join(self._upload_dir(upload_id), 'upload.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise UploadError('Upload nicht gefunden', 404)
+
+    def _received_ranges(self, upload_id):
+        ranges = []
+        for name in os.listdir(os.path.join(self._upload_dir(upload_id), 'chunks')):
+            match = CHUNK_MARKER_PATTERN.match(name)
+            if match:
+                ranges.append((int(match.group(1)), int(match.group(2))))
+        # Zusammenhängende Bereiche verschmelzen
+        merged = []
+        for start, length in sorted(ranges):
+            end = start + length
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    def status(self, upload_id):
+        upload = self._load(upload_id)
+        received = self._received_ranges(upload_id)
+        upload['received'] = received
+        upload['received_bytes'] = sum(end - start for start, end in received)
+        upload['complete'] = received == [[0, upload['size']]]
+        return upload
+
+    def write_chunk(self, upload_id, offset, stream, chunk_sha256=None):
+        """Write one chunk at ``offset``; verifies its sha256 when given"""
+        upload = self._load(upload_id)
+        if offset < 0 or offset >= upload['size']:
+            raise UploadError('Ungültiger Offset')
+
+        digest = hashlib.sha256()
+        length = 0
+        with open(self.data_path(upload_id), 'r+b') as f:
+            f.seek(offset)
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                length += len(chunk)
+                if offset + length > upload['size']:
+                    raise UploadError('Chunk überschreitet die angekündigte Dateigröße')
+                digest.update(chunk)
+                f.write(chunk)
+        if length == 0:
+            raise UploadError('Leerer Chunk')
+        if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+            raise UploadError('Prüfsumme des Chunks stimmt nicht', 422)
+
+        marker = os.path.join(self._upload_dir(upload_id), 'chunks', f"{offset}-{length}")
+        open(marker, 'w').close()
+        return self.status(upload_id)
+
+    def finish(self, upload_id):
+        """Verify that the upload is complete and intact; returns (upload, data_path)"""
+        upload = self.status(upload_id)
+        if not upload['complete']:
+            raise UploadError('Upload unvollständig', 409)
+        if upload['sha256'] and hash_file(self.data_path(upload_id)) != upload['sha256']:
+            raise UploadError('Prüfsumme der Datei stimmt nicht', 422)
+        return upload, self.data_path(upload_id)
+
+    def delete(self, upload_id):
+        if UPLOAD_ID_PATTERN.match(upload_id or ''):
+            shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+    def cleanup(self):
+        """Remove uploads that were not finished within ``ttl`` seconds"""
+        now = time.time()
+        try:
+            upload_ids = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for upload_id in upload_ids:
+            path = self._upload_dir(upload_id)
+            try:
+                if now - os.path.getmtime(os.path.join(path, 'chunks')) > self.ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
@@ -0,0 +1,816 @@
+"""Flask-Blueprint mit allen /api-Routen und App-Factory für beide Einstiegspunkte."""
+import errno
+import logging
+import os
+import re
+import time
+import traceback
+import uuid
+from contextlib import nullcontext
+from functools import partial, wraps
+from urllib.parse import quote
+
+from flask import (
+    Blueprint, Flask, Response, current_app, jsonify, make_response, request, stream_with_context
+)
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from .admission import AdmissionController, AdmissionRejected, client_key
+from .audio import (
+    FFMPEG_FORMATS, CloudConvertEngine, FFmpegEngine, create_audio_engine, find_engine, parse_audio_settings
+)
+from .batch import BATCH_WORKERS, stream_zip
+from .cache import ConversionCache, hash_stream
+from .convert import convert_image, image_settings
+from .formats import (
+    ALLOWED_AUDIO_EXTENSIONS, ALLOWED_EXTENSIONS, ALLOWED_IMAGE_EXTENSIONS, allowed_file, file_extension,
+    is_audio_file, is_image_file, metric_labels
+)
+from .images import ENCODER_PROFILES, parse_max_size, parse_profile
+from .janitor import TempJanitor
+from .jobs import JobManager, JobQueueFull
+from .logs import new_request_id, request_id
+from .metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, STAGE_SECONDS, encode_headers, instrument_conversion, stage
+from .probe import probe_audio, probe_image
+from .progress import PROGRESS_ID_PATTERN, ProgressStore, ProgressStream, report
+from .progress import current as progress_channel
+from .startup import PROFILE
+from .streams import SpooledRequest, peek_filename, send_buffer, send_output, spooled_buffer
+from .uploads import ChunkedUploadStore, UploadError
+
+logger = logging.getLogger(__name__)
+
+# Standardwerte der Dienste; jede Einstellung lässt sich per Umgebungsvariable überschreiben
+SERVICE_DEFAULTS = {
+    'CACHE_MAX_BYTES': 256 * 1024 * 1024,  # 0 deaktiviert den Cache
+    'UPLOAD_MAX_BYTES': 1024 * 1024 * 1024,
+    'UPLOAD_CHUNK_SIZE': 4 * 1024 * 1024,
+    'UPLOAD_TTL_SECONDS': 3600,
+    'JOB_WORKERS': 2,
+    'JOB_MAX_PENDING': 16,
+    'JOB_TTL_SECONDS': 900,
+    # Zulassung: globale und je Pool gleichzeitige Konvertierungen, Warteschlangen, Rate je Client
+    'ADMISSION_MAX_ACTIVE': 6,
+    'ADMISSION_IMAGE_ACTIVE': 5,
+    'ADMISSION_AUDIO_ACTIVE': 2,
+    'ADMISSION_IMAGE_QUEUE': 16,
+    'ADMISSION_AUDIO_QUEUE': 4,
+    'ADMISSION_QUEUE_TIMEOUT': 30,
+    'ADMISSION_RATE_PER_MINUTE': 120,  # 0 deaktiviert das Rate-Limit
+    'ADMISSION_BURST': 10,
+    # Aufräumen des Temp-Verzeichnisses: Gesamtlimit, maximales Alter, Intervall (0 = kein Thread)
+    'TEMP_MAX_BYTES': 2 * 1024 * 1024 * 1024,
+    'TEMP_MAX_AGE_SECONDS': 3600,
+    'JANITOR_INTERVAL_SECONDS': 60,
+    # Fortschritts-Events: Aufbewahrung und wie lange ein SSE-Stream offen bleibt (0 = Client pollt per retry)
+    'PROGRESS_TTL_SECONDS': 600,
+    'PROGRESS_STREAM_SECONDS': 0,
+}
+
+# Cache-Schlüssel sind sha256-Hexdigests (siehe ConversionCache.make_key)
+RESULT_KEY_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+# /api/formats ändert sich zur Laufzeit nicht
+FORMATS = {
+    'image': sorted(ALLOWED_IMAGE_EXTENSIONS),
+    'audio': sorted(ALLOWED_AUDIO_EXTENSIONS),
+    'profiles': list(ENCODER_PROFILES)
+}
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+
+class Services:
+    """Cache, chunked uploads, job queue and audio engine of one app"""
+
+    def __init__(self, config):
+        self.temp_dir = config['TEMP_DIR']
+
+        # Ergebnis-Cache für wiederholte Konvertierungen
+        self.cache = ConversionCache(config['CACHE_DIR'], config['CACHE_MAX_BYTES'])
+
+        # Wiederaufnehmbare Chunk-Uploads für Dateien über MAX_CONTENT_LENGTH
+        self.uploads = ChunkedUploadStore(
+            config['UPLOAD_DIR'],
+            max_size=config['UPLOAD_MAX_BYTES'],
+            chunk_size=config['UPLOAD_CHUNK_SIZE'],
+            ttl=config['UPLOAD_TTL_SECONDS']
+        )
+
+        # Audio-Engine: lokal per FFmpeg, CloudConvert optional (AUDIO_ENGINE / AUDIO_FALLBACK_ENGINE)
+        self.audio_engine = create_audio_engine()
+        if not self.audio_engine.available():
+            logger.error(f"Audio-Engine {self.audio_engine.name} nicht verfügbar: "
+                         f"{self.audio_engine.unavailable_reason()}")
+
+        # Hintergrund-Jobs für lange Konvertierungen
+        self.jobs = JobManager(
+            config['JOB_DIR'],
+            max_workers=config['JOB_WORKERS'],
+            max_pending=config['JOB_MAX_PENDING'],
+            ttl=config['JOB_TTL_SECONDS']
+        )
+
+        # Fortschritts-Events je X-Progress-ID für /api/convert/<id>/events
+        self.progress = ProgressStore(
+            config['PROGRESS_DIR'],
+            ttl=config['PROGRESS_TTL_SECONDS'],
+            stream_seconds=config['PROGRESS_STREAM_SECONDS']
+        )
+
+        # Begrenzt gleichzeitige Konvertierungen und Anfragen je Client
+        self.admission = AdmissionController(
+            max_active=config['ADMISSION_MAX_ACTIVE'],
+            image_active=config['ADMISSION_IMAGE_ACTIVE'],
+            audio_active=config['ADMISSION_AUDIO_ACTIVE'],
+            image_queue=config['ADMISSION_IMAGE_QUEUE'],
+            audio_queue=config['ADMISSION_AUDIO_QUEUE'],
+            queue_timeout=config['ADMISSION_QUEUE_TIMEOUT'],
+            rate=config['ADMISSION_RATE_PER_MINUTE'] / 60,
+            burst=config['ADMISSION_BURST']
+        )
+
+        # Räumt liegengebliebene Dateien weg und hält TEMP_DIR unter dem Limit
+        self.janitor = TempJanitor(
+            self.temp_dir,
+            max_bytes=config['TEMP_MAX_BYTES'],
+            max_age=config['TEMP_MAX_AGE_SECONDS'],
+            interval=config['JANITOR_INTERVAL_SECONDS'],
+            cache=self.cache,
+            cleaners=(self.uploads.cleanup, self.jobs.cleanup, self.progress.cleanup)
+        )
+        self.janitor.start()
+
+    def convert_audio(self, input_path, output_path, target_format, settings):
+        """Convert an audio file with the configured audio engine; returns the passthrough mode or None"""
+        passthrough = self.audio_engine.convert(input_path, output_path, target_format, settings)
+        if passthrough:
+            logger.info(f"Audio ohne Neukodierung übernommen ({passthrough})")
+        else:
+            logger.info(f"Audio conversion completed successfully ({self.audio_engine.name})")
+        return passthrough
+
+
+def create_app(import_name, temp_dir, config=None, **flask_options):
+    """Build a Flask app serving the /api routes; ``config`` overrides the defaults"""
+    app = Flask(import_name, **flask_options)
+    app.request_class = SpooledRequest
+    app.config.update(
+        MAX_CONTENT_LENGTH=50 * 1024 * 1024,  # 50MB max-limit
+        TEMP_DIR=temp_dir,
+        SPOOL_DIR=temp_dir,
+        CACHE_DIR=os.path.join(temp_dir, 'cache'),
+        UPLOAD_DIR=os.path.join(temp_dir, 'uploads'),
+        JOB_DIR=os.path.join(temp_dir, 'jobs'),
+        PROGRESS_DIR=os.path.join(temp_dir, 'progress'),
+        **SERVICE_DEFAULTS
+    )
+    app.config.update(config or {})
+    for key in SERVICE_DEFAULTS:
+        if os.getenv(key):
+            app.config[key] = int(os.environ[key])
+
+    with PROFILE.phase('services'):
+        os.makedirs(temp_dir, exist_ok=True)
+        app.extensions['shiftfile'] = Services(app.config)
+    app.register_blueprint(api)
+    return app
+
+
+def services():
+    return current_app.extensions['shiftfile']
+
+
+def rate_limited(view):
+    """Check the client's token bucket before the upload body is read"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        services().admission.check_rate(client_key(request))
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def tracked_conversion(kind, source, target, file, run):
+    """instrument_conversion() with the upload and the outcome reported as progress events"""
+    if file is not None and progress_channel.get() is not None:
+        report('upload', filename=file.filename, bytes=file.stream.seek(0, os.SEEK_END))
+        file.stream.seek(0)
+    response = instrument_conversion(kind, source, target, file.stream if file else None, run)
+    if response.status_code >= 400:
+        error = (response.get_json(silent=True) or {}).get('error')
+        report('error', status=response.status_code, message=error)
+    else:
+        report('ready', status=response.status_code, cache=response.headers.get('X-Cache'),
+               size=response.content_length, result=response.headers.get('Content-Location'))
+    return response
+
+
+def conversion_slot(filename):
+    """Admission slot in the image or audio pool; unknown files are rejected later by validation"""
+    if is_image_file(filename):
+        return services().admission.slot('image')
+    if is_audio_file(filename):
+        return services().admission.slot('audio')
+    return nullcontext()
+
+
+@api.before_app_request
+def assign_request_id():
+    # Korrelations-ID für alle Log-Zeilen dieser Anfrage; vom Client übernommen, wenn gültig
+    request_id.set(new_request_id(request.headers.get('X-Request-ID')))
+    # Fortschritt nur, wenn der Client eine ID mitschickt; sonst kostet report() nichts
+    progress_channel.set(services().progress.channel(request.headers.get('X-Progress-ID')))
+
+
+@api.after_app_request
+def send_request_id(response):
+    response.headers['X-Request-ID'] = request_id.get()
+    return response
+
+
+@api.errorhandler(AdmissionRejected)
+def admission_rejected(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
+@api.route('/formats')
+def get_formats():
+    """Get supported formats"""
+    return jsonify(FORMATS)
+
+
+@api.route('/metrics')
+def get_metrics():
+    """Expose conversion metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@api.route('/cache/stats')
+def get_cache_stats():
+    """Get conversion cache hit/miss counters"""
+    return jsonify(services().cache.stats())
+
+
+@api.route('/temp/stats')
+def get_temp_stats():
+    """Get temp directory usage from the last janitor sweep"""
+    return jsonify(services().janitor.usage())
+
+
+@api.route('/health')
+def health_check():
+    """Check that the temp directory is writable and the audio engine is usable"""
+    temp_dir = services().temp_dir
+    audio_engine = services().audio_engine
+    try:
+        test_file = os.path.join(temp_dir, f"health_{uuid.uuid4()}.txt")
+        with open(test_file, 'w') as f:
+            f.write('test')
+        os.remove(test_file)
+    except OSError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    if not audio_engine.available():
+        return jsonify({'status': 'error', 'message': audio_engine.unavailable_reason()}), 500
+
+    return jsonify({
+        'status': 'healthy',
+        'temp_dir': temp_dir,
+        'audio_engine': audio_engine.name,
+        'ffmpeg_path': getattr(audio_engine, 'binary', None),
+        'admission': services().admission.stats()
+    })
+
+
+@api.route('/warmup', methods=['GET', 'POST'])
+def warmup():
+    """Load image codecs and locate ffmpeg so the first conversion skips that setup"""
+    steps, cold = PROFILE.warm_up(services().audio_engine)
+    if cold:
+        logger.info(f"Warm-up abgeschlossen: {steps}")
+    return jsonify({'cold': cold, **PROFILE.report()})
+
+
+def validate_conversion_request(file):
+    """Validate upload and target format; returns (file, target_format, error_response)"""
+    if file is None:
+        return None, None, (jsonify({'error': 'Keine Datei gefunden'}), 400)
+
+    if not file or file.filename == '':
+        return None, None, (jsonify({'error': 'Keine Datei ausgewählt'}), 400)
+
+    if not allowed_file(file.filename):
+        return None, None, (jsonify({'error': 'Nicht unterstütztes Dateiformat'}), 400)
+
+    target_format = request.form.get('format', '').lower()
+    if not target_format:
+        return None, None, (jsonify({'error': 'Zielformat nicht angegeben'}), 400)
+
+    if target_format not in ALLOWED_EXTENSIONS:
+        return None, None, (jsonify({'error': f'Nicht unterstütztes Zielformat: {target_format}'}), 400)
+
+    try:
+        parse_max_size(request.form)
+    except ValueError:
+        return None, None, (jsonify({'error': 'Ungültige Zielgröße (max_width/max_height)'}), 400)
+
+    try:
+        parse_profile(request.form)
+    except ValueError as e:
+        return None, None, (jsonify({'error': str(e)}), 400)
+
+    if is_image_file(file.filename):
+        if target_format not in ALLOWED_IMAGE_EXTENSIONS:
+            return None, None, (jsonify({'error': f'Ungültiges Bildformat: {target_format}'}), 400)
+    else:
+        audio_engine = services().audio_engine
+        if target_format not in ALLOWED_AUDIO_EXTENSIONS:
+            return None, None, (jsonify({'error': f'Ungültiges Audioformat: {target_format}'}), 400)
+        if not audio_engine.available():
+            return None, None, (jsonify({'error': audio_engine.unavailable_reason()}), 500)
+
+    return file, target_format, None
+
+
+@api.route('/convert', methods=['POST'])
+@rate_limited
+def convert_file():
+    """Handle file conversion"""
+    # Platz im Pool bzw. 429 vor dem Einlesen des Uploads; der Dateiname steht im Kopf des Datei-Teils
+    filename = peek_filename(request)
+    with conversion_slot(filename or ''):
+        start = time.perf_counter()
+        file = request.files.get('file')  # Der Zugriff liest den Multipart-Upload ein
+        source, target = metric_labels(file.filename if file else '', request.form.get('format'))
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='upload', source=source, target=target)
+        if filename is not None:
+            return convert_admitted(file)
+        return convert_upload(file)
+
+
+def convert_upload(file):
+    """Convert an uploaded file with the parameters from the request form"""
+    with conversion_slot(file.filename if file else ''):
+        return convert_admitted(file)
+
+
+def convert_admitted(file):
+    """Convert an upload that already holds its admission slot"""
+    source, target = metric_labels(file.filename if file else '', request.form.get('format'))
+    return tracked_conversion('convert', source, target, file, lambda: run_conversion(file))
+
+
+def run_conversion(file):
+    """Validate, convert and send one upload"""
+    try:
+        file, target_format, error = validate_conversion_request(file)
+        if error:
+            return error
+
+        # Eine Info-Zeile pro Anfrage; die Formularfelder nur im Debug-Level
+        logger.info(f"Konvertierungsanfrage: {file.filename} -> {target_format}")
+        logger.debug('Parameter: %s', request.form.to_dict())
+
+        shared = services()
+        temp_dir = shared.temp_dir
+        download_name = f"converted_{secure_filename(file.filename)}"
+
+        # Cache-Lookup über Inhalt, Zielformat und aufgelöste Einstellungen
+        if is_image_file(file.filename):
+            max_size = parse_max_size(request.form)
+            profile = parse_profile(request.form)
+            cache_settings = {**image_settings(target_format, profile), 'max_size': max_size}
+        else:
+            settings = parse_audio_settings(request.form)
+            cache_settings = {**settings, 'engine': shared.audio_engine.name}
+        cache_key = shared.cache.make_key(hash_stream(file.stream), target_format, cache_settings)
+        cached_output = shared.cache.get(cache_key, target_format)
+        if cached_output:
+            logger.info(f"Cache-Treffer: {file.filename} -> {target_format}")
+            response = send_output(cached_output, download_name, etag=cache_key)
+            response.headers['Content-Location'] = result_url(cache_key, target_format, download_name)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        # Create temp files with correct extensions
+        input_ext = os.path.splitext(file.filename)[1].lower()
+        temp_input = os.path.join(temp_dir, f"input_{uuid.uuid4()}{input_ext}")
+        temp_output = os.path.join(temp_dir, f"output_{uuid.uuid4()}.{target_format}")
+        output_sent = False
+
+        try:
+            if is_image_file(file.filename):
+                logger.debug('Konvertiere Bild von %s nach %s', input_ext, target_format)
+
+                # Dekodiere direkt aus dem Upload-Stream, kodiere in einen Spool-Puffer
+                output = spooled_buffer(temp_dir)
+                try:
+                    start = time.perf_counter()
+                    passthrough = convert_image(file.stream, output, target_format, max_size, profile)
+                    encode_seconds = time.perf_counter() - start
+
+                    cached_output = shared.cache.put_file(cache_key, target_format, output)
+                    response = send_buffer(output, download_name, etag=cache_key)
+                    encode_headers(response, encode_seconds, response.content_length, profile, passthrough)
+                except Exception:
+                    # Ab SPOOL_MAX_SIZE hängt am Puffer eine Temp-Datei samt Deskriptor
+                    output.close()
+                    raise
+                if cached_output:
+                    response.headers['Content-Location'] = result_url(cache_key, target_format, download_name)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+
+            elif is_audio_file(file.filename):
+                logger.debug('Konvertiere Audio von %s nach %s', input_ext, target_format)
+                with stage('save', input_ext.lstrip('.'), target_format):
+                    file.save(temp_input)
+                try:
+                    start = time.perf_counter()
+                    passthrough = shared.convert_audio(temp_input, temp_output, target_format, settings)
+                    encode_seconds = time.perf_counter() - start
+                except Exception as e:
+                    logger.error(f"Audio-Engine-Fehler ({shared.audio_engine.name}): {str(e)}")
+                    return jsonify({'error': f'Fehler bei der Audiokonvertierung: {str(e)}'}), 500
+
+            cached_output = shared.cache.put(cache_key, target_format, temp_output)
+
+            # Die Ausgabe wird gestreamt und erst nach dem Senden gelöscht
+            output_size = os.path.getsize(temp_output)
+            response = send_output(temp_output, download_name, etag=cache_key, delete=True)
+            output_sent = True
+            encode_headers(response, encode_seconds, output_size, passthrough=passthrough)
+            if cached_output:
+                response.headers['Content-Location'] = result_url(cache_key, target_format, download_name)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        except Exception as e:
+            logger.error(f"Konvertierungsfehler: {str(e)}")
+            logger.error(traceback.format_exc())
+            if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+                # Platte voll: nicht bis zum nächsten Intervall warten
+                shared.janitor.wake()
+            return jsonify({'error': f'Fehler bei der Konvertierung: {str(e)}'}), 500
+
+        finally:
+            # Cleanup temp files
+            try:
+                if os.path.exists(temp_input):
+                    os.remove(temp_input)
+                if not output_sent and os.path.exists(temp_output):
+                    os.remove(temp_output)
+            except Exception as e:
+                logger.error(f"Fehler beim Aufräumen: {str(e)}")
+
+    except Exception as e:
+        logger.error(f"Allgemeiner Fehler: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/convert/<progress_id>/events')
+def convert_events(progress_id):
+    """Server-Sent Events with the progress of the conversion sent with this X-Progress-ID"""
+    store = services().progress
+    if not PROGRESS_ID_PATTERN.fullmatch(progress_id):
+        return jsonify({'error': 'Ungültige Fortschritts-ID'}), 404
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or '0'
+    offset = int(last_event_id) if last_event_id.isdigit() else 0
+
+    events, finished = store.read(progress_id, offset)
+    if finished and not events:
+        # 204 beendet das automatische Wiederverbinden des EventSource
+        return '', 204
+    # direct_passthrough reicht den ProgressStream unverändert an den Server, die ASGI-Brücke wartet dann asynchron
+    response = Response(ProgressStream(store, progress_id, offset), mimetype='text/event-stream',
+                        direct_passthrough=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/probe', methods=['POST'])
+@rate_limited
+def probe_file():
+    """Return format metadata (duration, codec, dimensions, ...) read from the headers only"""
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'Keine Datei ausgewählt'}), 400
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Nicht unterstütztes Dateiformat'}), 400
+
+    extension = file_extension(file.filename)
+    # Das Frontend lädt nur den Dateianfang hoch und schickt die ganze Größe im Feld size mit
+    received = file.stream.seek(0, os.SEEK_END)
+    file.stream.seek(0)
+    declared = request.form.get('size', '')
+    size = max(received, int(declared)) if declared.isdigit() else received
+    start = time.perf_counter()
+    try:
+        with stage('probe', extension, extension):
+            if is_image_file(file.filename):
+                info = probe_image(file.stream)
+            else:
+                info = probe_audio(file.stream, find_engine(services().audio_engine, FFmpegEngine.name), size)
+    except Exception as e:
+        logger.warning(f"Probe fehlgeschlagen für {file.filename}: {str(e)}")
+        info = None
+    if info is None:
+        return jsonify({'error': 'Dateiformat konnte nicht erkannt werden'}), 422
+    if size > received and info.get('source') == 'ffmpeg':
+        # ffmpeg schätzt die Dauer aus der gekürzten Datei
+        info['duration'] = None
+
+    info.update({
+        'format': extension,
+        'size': size,
+        'probe_ms': round((time.perf_counter() - start) * 1000, 2)
+    })
+    return jsonify(info)
+
+
+def result_url(cache_key, target_format, download_name):
+    """URL under which a cached conversion result can be downloaded (and resumed) via GET"""
+    return f"/api/results/{cache_key}/{target_format}?name={quote(download_name)}"
+
+
+@api.route('/results/<cache_key>/<target_format>')
+def get_result(cache_key, target_format):
+    """Download a cached conversion result with Range/ETag support"""
+    target_format = target_format.lower()
+    if not RESULT_KEY_PATTERN.fullmatch(cache_key) or target_format not in ALLOWED_EXTENSIONS:
+        return jsonify({'error': 'Ergebnis nicht gefunden'}), 404
+
+    cached_output = services().cache.get(cache_key, target_format)
+    if not cached_output:
+        return jsonify({'error': 'Ergebnis nicht gefunden'}), 404
+    download_name = secure_filename(request.args.get('name', '')) or f"converted.{target_format}"
+    return send_output(cached_output, download_name, etag=cache_key)
+
+
+@api.route('/convert/batch', methods=['POST'])
+@rate_limited
+def convert_batch():
+    """Convert many images in parallel and stream them back as ZIP"""
+    # Plätze vor dem Einlesen der Uploads; je belegtem Platz läuft eine Datei im Worker-Pool
+    admission = services().admission
+    tickets = admission.acquire_up_to('image', BATCH_WORKERS)
+    try:
+        response = make_response(batch_response(tickets))
+    except BaseException:
+        for ticket in tickets:
+            admission.release(ticket)
+        raise
+    # Die Plätze bleiben belegt, bis das ZIP fertig gestreamt ist
+    response.call_on_close(lambda: [admission.release(ticket) for ticket in tickets])
+    return response
+
+
+def batch_response(tickets):
+    """Validate a batch upload and return the streamed ZIP; releases tickets the batch does not need"""
+    files = [f for f in request.files.getlist('files') if f and f.filename]
+    if not files:
+        return jsonify({'error': 'Keine Dateien gefunden'}), 400
+
+    target_format = request.form.get('format', '').lower()
+    if not target_format:
+        return jsonify({'error': 'Zielformat nicht angegeben'}), 400
+
+    if target_format not in ALLOWED_IMAGE_EXTENSIONS:
+        return jsonify({'error': f'Ungültiges Bildformat: {target_format}'}), 400
+
+    try:
+        max_size = parse_max_size(request.form)
+    except ValueError:
+        return jsonify({'error': 'Ungültige Zielgröße (max_width/max_height)'}), 400
+
+    try:
+        profile = parse_profile(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    unsupported = [f.filename for f in files if not is_image_file(f.filename)]
+    if unsupported:
+        return jsonify({'error': f'Nicht unterstützte Dateien: {", ".join(unsupported)}'}), 400
+
+    logger.info(f"Batch-Konvertierung: {len(files)} Dateien nach {target_format}")
+    uploads = [(secure_filename(f.filename) or f"file_{i}", f.stream) for i, f in enumerate(files)]
+    while len(tickets) > len(files):
+        services().admission.release(tickets.pop())
+    return Response(
+        stream_with_context(stream_zip(partial(convert_image, max_size=max_size, profile=profile), uploads,
+                                       target_format, max_in_flight=len(tickets))),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=converted_{target_format}.zip'}
+    )
+
+
+@api.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not allowed_file(filename):
+        return jsonify({'error': 'Nicht unterstütztes Dateiformat'}), 400
+
+    try:
+        upload = services().uploads.create(filename, data.get('size'), data.get('sha256'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    logger.info(f"Chunked Upload {upload['id']} gestartet: {filename} ({upload['size']} Bytes)")
+    return jsonify(upload), 201
+
+
+@api.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Get the received byte ranges of a chunked upload (for resuming)"""
+    try:
+        return jsonify(services().uploads.status(upload_id))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+@api.route('/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """Store one chunk of a chunked upload at ?offset="""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Offset nicht angegeben'}), 400
+
+    try:
+        upload = services().uploads.write_chunk(
+            upload_id, offset, request.stream, request.headers.get('X-Chunk-Sha256')
+        )
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify(upload)
+
+
+@api.route('/uploads/<upload_id>/complete', methods=['POST'])
+@rate_limited
+def complete_upload(upload_id):
+    """Verify the assembled upload and run the regular conversion on it"""
+    uploads = services().uploads
+    try:
+        upload, data_path = uploads.finish(upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    with open(data_path, 'rb') as stream:
+        response = make_response(convert_upload(FileStorage(stream=stream, filename=upload['filename'])))
+    # Bei Fehlern bleibt der Upload für einen erneuten Versuch erhalten
+    if response.status_code < 400:
+        uploads.delete(upload_id)
+    return response
+
+
+@api.route('/jobs', methods=['POST'])
+@rate_limited
+def create_job():
+    """Queue a conversion and return its job id immediately"""
+    shared = services()
+    try:
+        file, target_format, error = validate_conversion_request(request.files.get('file'))
+        if error:
+            return error
+
+        if is_image_file(file.filename):
+            kind = 'image'
+            max_size = parse_max_size(request.form)
+            profile = parse_profile(request.form)
+            run = lambda input_path, output_path: convert_image(input_path, output_path, target_format,
+                                                                max_size, profile)
+        else:
+            kind = 'audio'
+            settings = parse_audio_settings(request.form)
+            run = lambda input_path, output_path: shared.convert_audio(input_path, output_path,
+                                                                       target_format, settings)
+
+        def convert(input_path, output_path):
+            # Jobs laufen im eigenen Executor, zählen aber wie jede Konvertierung gegen die Zulassung
+            with shared.admission.slot(kind):
+                run(input_path, output_path)
+
+        report('upload', filename=file.filename, bytes=request.content_length)
+        job = shared.jobs.submit(
+            file,
+            os.path.splitext(file.filename)[1].lower(),
+            target_format,
+            f"converted_{secure_filename(file.filename)}",
+            convert
+        )
+        logger.info(f"Konvertierungsjob {job['id']} angelegt: {file.filename} -> {target_format}")
+        return jsonify(job), 202
+
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Fehler beim Anlegen des Jobs: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Get the status of a conversion job"""
+    job = services().jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job nicht gefunden'}), 404
+    return jsonify(job)
+
+
+@api.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    """Download the output of a finished conversion job"""
+    jobs = services().jobs
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job nicht gefunden'}), 404
+    if job['status'] != 'done':
+        return jsonify(job), 409
+    return send_output(jobs.result_path(job), job['download_name'], etag=job['id'])
+
+
+@api.route('/cloudconvert/webhook', methods=['POST'])
+def cloudconvert_webhook():
+    """Wake the batch waiting for a finished or failed CloudConvert job"""
+    engine = find_engine(services().audio_engine, CloudConvertEngine.name)
+    if engine is None or not engine.webhook_secret:
+        return jsonify({'error': 'Webhook nicht konfiguriert'}), 404
+
+    from .cloudconvert_client import verify_signature
+    payload = request.get_data()
+    if not verify_signature(payload, request.headers.get('CloudConvert-Signature'), engine.webhook_secret):
+        return jsonify({'error': 'Ungültige Signatur'}), 401
+
+    job = (request.get_json(silent=True) or {}).get('job') or {}
+    if job.get('id'):
+        engine.notify(job['id'])
+    return '', 204
+
+
+@api.route('/process-audio', methods=['POST'])
+@rate_limited
+def process_audio():
+    """Apply volume/speed/fade/normalize/mono effects to an audio file in one FFmpeg pass"""
+    # Immer Audio: der Platz im Pool (oder das 429) kommt vor dem Einlesen des Uploads
+    with services().admission.slot('audio'):
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return jsonify({'error': 'Keine Datei ausgewählt'}), 400
+        return process_audio_upload(file)
+
+
+def process_audio_upload(file):
+    params = {
+        'volume': request.form.get('volume', 0),
+        'speed': request.form.get('speed', 1.0),
+        'fadeIn': request.form.get('fadeIn', 0),
+        'fadeOut': request.form.get('fadeOut', 0),
+        'normalize': request.form.get('normalize', 'false').lower() == 'true',
+        'mono': request.form.get('mono', 'false').lower() == 'true',
+        'format': request.form.get('format'),
+        'bitrate': request.form.get('bitrate')
+    }
+    source, target = metric_labels(file.filename, params['format'] or file_extension(file.filename))
+    return tracked_conversion('process_audio', source, target, file, lambda: run_audio_processing(file, params))
+
+
+def run_audio_processing(file, params):
+    """Stream the upload through the audio engine and send the result"""
+    input_ext = file_extension(secure_filename(file.filename))
+    if input_ext not in ALLOWED_AUDIO_EXTENSIONS:
+        return jsonify({'error': 'Nicht unterstütztes Audioformat'}), 400
+
+    output_ext = (params.get('format') or input_ext).lower()
+    if output_ext not in FFMPEG_FORMATS:
+        return jsonify({'error': 'Nicht unterstütztes Zielformat'}), 400
+
+    # Gestreamt wird nur lokal; mit AUDIO_FALLBACK_ENGINE steckt FFmpeg in der FallbackEngine
+    audio_engine = find_engine(services().audio_engine, FFmpegEngine.name)
+    if audio_engine is None or not audio_engine.available():
+        return jsonify({'error': 'Audioverarbeitung benötigt FFmpeg'}), 500
+
+    try:
+        # Ein einziger FFmpeg-Durchlauf: Upload-Stream -> Filtergraph -> Spool-Puffer
+        settings = parse_audio_settings(params)
+        output = spooled_buffer(services().temp_dir)
+        try:
+            passthrough = audio_engine.convert_stream(file.stream, output, output_ext, settings,
+                                                      input_format=input_ext)
+            response = send_buffer(output, f"output_{uuid.uuid4()}.{output_ext}")
+        except Exception:
+            output.close()
+            raise
+        if passthrough:
+            response.headers['X-Passthrough'] = passthrough
+        return response
+
+    except Exception as e:
+        logger.error(f"Fehler bei der Audioverarbeitung: {str(e)}")
+        return jsonify({'error': 'Interner Serverfehler'}), 500